@@ -5,9 +5,11 @@ order to be executed.
 import abc
 import logging
 import logging.handlers
+import pickle
 import sys
 from _sha256 import sha256
-from os import getpid
+from os import getpid, replace, remove
+from os.path import exists
 from time import time, clock
 from uuid import uuid4
 
@@ -69,14 +71,21 @@ class ExperimentCanceledException(Exception):
 
 
 class LogMemoryUsageLoggerAdapter(logging.LoggerAdapter):
-    """Provides logger with memory usage (VmRSS) information, in Gigabytes."""
+    """
+    Provides logger with memory usage (VmRSS) information, in Gigabytes. To keep logging cheap, the memory usage is
+    read at most every MEMORY_INFO_INTERVAL seconds.
+    """
     propagate = False
+    MEMORY_INFO_INTERVAL = 1
 
     def process(self, msg, kwargs):
-        try:
-            self.extra['memory_gib'] = memory_info()['VmRSS'] / 1024**3
-        except (TypeError, KeyError):
-            self.extra['memory_gib'] = float('nan')
+        now = time()
+        if now - self.extra.get('memory_time', -self.MEMORY_INFO_INTERVAL) >= self.MEMORY_INFO_INTERVAL:
+            try:
+                self.extra['memory_gib'] = memory_info()['VmRSS'] / 1024**3
+            except (TypeError, KeyError):
+                self.extra['memory_gib'] = float('nan')
+            self.extra['memory_time'] = now
         return super().process(msg, kwargs)
 
 
@@ -84,8 +93,15 @@ class Experiment(object):
     """
     This class defines an experiment, mainly consisting of instructions how to run and analyze it (methods run() and
     analyze(), respectively). It can be used with the Experimenter class to run Experiments in parallel.
+
+    Long-running experiments can support checkpoints by implementing checkpoint_state() and restore() and by calling
+    checkpoint() during run() whenever they are in a state that can be resumed. If a checkpoint_path is set (see
+    Experimenter), the state is then saved at most every CHECKPOINT_INTERVAL seconds, and an interrupted experiment
+    is resumed from the saved state when it is executed again.
     """
 
+    CHECKPOINT_INTERVAL = 15 * 60
+
     def __init__(self, progress_log_name, parameters):
         """
         :param progress_log_name: A unique name, used for log path.
@@ -108,6 +124,12 @@ class Experiment(object):
         self.timer = clock if sys.platform == 'win32' else time
         self.measured_time = None
 
+        # Checkpoints, the path is set by the Experimenter if checkpoints are enabled
+        self.checkpoint_path = None
+        self.start_time = None
+        self.resumed_time = 0
+        self.last_checkpoint_time = None
+
     @abc.abstractmethod
     def analyze(self):
         """
@@ -129,6 +151,68 @@ class Experiment(object):
         """
         raise NotImplementedError('users must define run() to use this base class')
 
+    @classmethod
+    def batch(cls, experiments, batch_size):  # pylint: disable=unused-argument
+        """
+        Combines experiments of this class into batches that are executed at once. The execution of a batch yields
+        a list of results, one for each experiment in the batch. By default, experiments are not combined.
+        :param experiments: list of experiments of this class
+        :param batch_size: maximum number of experiments in a batch
+        :return: list of experiments and batches of experiments to be executed
+        """
+        return experiments
+
+    def checkpoint_state(self):
+        """
+        Returns the state of the running experiment that is needed to resume it after prepare(), or None if the
+        experiment cannot be resumed. The state must be picklable. By default, experiments do not support checkpoints.
+        """
+        return None
+
+    def restore(self, state):
+        """
+        Restores a state returned by checkpoint_state, such that the following call of run() resumes the experiment.
+        Called after prepare().
+        :param state: state as returned by checkpoint_state
+        """
+
+    def checkpoint(self, force=False):
+        """
+        Saves the state of the running experiment to checkpoint_path, if a path is set and CHECKPOINT_INTERVAL
+        seconds passed since the experiment started or was last saved. The file is replaced atomically, hence a
+        checkpoint is never left incomplete.
+        :param force: bool. If True, the state is saved regardless of the time since the last checkpoint.
+        """
+        if not self.checkpoint_path or self.start_time is None:
+            return
+        now = self.timer()
+        if not force and now - self.last_checkpoint_time < self.CHECKPOINT_INTERVAL:
+            return
+        state = self.checkpoint_state()  # pylint: disable=assignment-from-none
+        if state is None:
+            return
+        with open(self.checkpoint_path + '.tmp', 'wb') as file:
+            pickle.dump(dict(state=state, measured_time=self.resumed_time + now - self.start_time), file)
+        replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+        self.last_checkpoint_time = now
+        if self.progress_logger:
+            self.progress_logger.debug(f'Saved checkpoint to {self.checkpoint_path}')
+
+    def resume(self):
+        """
+        Restores the state saved at checkpoint_path, if any.
+        :return: bool. True if the experiment was resumed from a checkpoint.
+        """
+        if not self.checkpoint_path or not exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path, 'rb') as file:
+            checkpoint = pickle.load(file)
+        self.restore(checkpoint['state'])
+        self.resumed_time = checkpoint['measured_time']
+        if self.progress_logger:
+            self.progress_logger.debug(f'Resuming from checkpoint {self.checkpoint_path}')
+        return True
+
     def assign_to_gpu(self, gpu_id):
         """
             Set gpu_id. Called by Experimenter to load-balance GPUs
@@ -157,7 +241,10 @@ class Experiment(object):
             if self.progress_log_name:
                 self.progress_logger = LogMemoryUsageLoggerAdapter(logging.getLogger(self.progress_log_name), {})
                 self.progress_logger.setLevel(logging.DEBUG)
-                file_handler = logging.FileHandler('logs/%s.log' % self.progress_log_name, mode='w')
+                # when resuming from a checkpoint, the log written before the interruption is continued
+                resuming = self.checkpoint_path and exists(self.checkpoint_path)
+                file_handler = logging.FileHandler('logs/%s.log' % self.progress_log_name,
+                                                   mode='a' if resuming else 'w')
                 file_handler.setLevel(logging.DEBUG)
                 file_handler.setFormatter(
                     logging.Formatter(fmt='%(asctime)s %(memory_gib).2fGiB %(levelname)-8s %(message)s',
@@ -177,11 +264,12 @@ class Experiment(object):
 
             # run preparations (not timed)
             self.prepare()
+            self.resume()
 
-            # run the actual experiment
-            start_time = self.timer()
+            # run the actual experiment, the run time before resuming is included in the measured time
+            self.start_time = self.last_checkpoint_time = self.timer()
             self.run()
-            self.measured_time = self.timer() - start_time
+            self.measured_time = self.resumed_time + self.timer() - self.start_time
 
             # analyze the result
             self.result = self.analyze()
@@ -191,7 +279,10 @@ class Experiment(object):
                     experiment_pid=getpid(),
                     experiment_class=self.__class__.__name__
                 )
-            self.result_logger.info(str(self.result).replace("\n", ''))
+            for result in self.result if isinstance(self.result, list) else [self.result]:
+                self.result_logger.info(str(result).replace("\n", ''))
+            if self.checkpoint_path and exists(self.checkpoint_path):
+                remove(self.checkpoint_path)
 
             return self.result
         except KeyboardInterrupt:
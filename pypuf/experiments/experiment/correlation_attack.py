@@ -78,6 +78,8 @@ class ExperimentCorrelationAttack(Experiment):
     This Experiment uses the CorrelationAttack learner on an LTFArray PUF simulation.
     """
 
+    PROCESSES = 1  # number of processes that re-learn permuted models concurrently, see CorrelationAttack
+
     def __init__(self, progress_log_prefix, parameters):
         super().__init__(
             progress_log_name='%s.0x%x_0x%x_0_%i_%i_%i_%s_%s' % (
@@ -114,6 +116,19 @@ class ExperimentCorrelationAttack(Experiment):
         self.model = None
         self.training_set = None
         self.validation_set = None
+        self.restored_state = None
+
+    def checkpoint_state(self):
+        """
+        Returns the state of the attack. The instance and the sets are recreated from the seeds when resuming.
+        """
+        return self.learner.checkpoint_state() if self.learner else None
+
+    def restore(self, state):
+        """
+        Keeps the state of the attack, which is restored once run() created the learner.
+        """
+        self.restored_state = state
 
     def run(self):
         self.instance = LTFArray(
@@ -138,7 +153,11 @@ class ExperimentCorrelationAttack(Experiment):
             convergence_decimals=self.convergence_decimals,
             shuffle=self.shuffle,
             logger=self.progress_logger,
+            checkpoint=self.checkpoint,
+            processes=self.PROCESSES,
         )
+        if self.restored_state:
+            self.learner.restore(self.restored_state)
         self.model = self.learner.learn()
 
     def analyze(self):
@@ -9,7 +9,8 @@ from uuid import UUID
 from numpy.random import RandomState
 from numpy.linalg import norm
 from pypuf.experiments.experiment.base import Experiment
-from pypuf.learner.regression.logistic_regression import LogisticRegression
+from pypuf.learner.regression.logistic_regression import LogisticRegression, MultiStartLogisticRegression, \
+    BatchedLogisticRegression
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray, CompoundTransformation
 from pypuf import tools
 
@@ -37,6 +38,30 @@ class Parameters(NamedTuple):
     shuffle: bool
 
 
+class MultiStartParameters(NamedTuple):
+    """
+    Holds parameters for multi-start logistic regression experiments.
+    """
+    # Seeds
+    seed_instance: int
+    seed_model: int
+    seed_challenge: int
+    seed_distance: int
+
+    # LTF array definition
+    n: int
+    k: int
+    transformation: Union[str, CompoundTransformation]
+    combiner: str
+
+    # Learning setup
+    N: int
+    mini_batch_size: int
+    convergence_decimals: float
+    shuffle: bool
+    restarts: int
+
+
 class Result(NamedTuple):
     """
     Holds results from logistic regression experiments.
@@ -58,6 +83,9 @@ class ExperimentLogisticRegression(Experiment):
     This Experiment uses the logistic regression learner on an LTFArray PUF simulation.
     """
 
+    # experiments with at most this many training set bits (N * k * n) are combined into batches, if requested
+    BATCH_MAX_SIZE = 2 * 10**5
+
     def __init__(self, progress_log_prefix, parameters):
         progress_log_name = None if progress_log_prefix is None else '%s.0x%x_0x%x_0_%i_%i_%i_%s_%s' % (
             progress_log_prefix,
@@ -71,13 +99,37 @@ class ExperimentLogisticRegression(Experiment):
             )
         super().__init__(progress_log_name, parameters)
         self.instance = None
+        self.training_set = None
         self.learner = None
         self.model = None
 
-    def prepare(self):
+    @classmethod
+    def batch(cls, experiments, batch_size):
         """
-        Initializes the instance, the training set and the learner to then run the logistic regression
-        with the given parameters.
+        Combines small experiments with equal learning setup into batches that are run with the batched learner.
+        :param experiments: list of experiments of this class
+        :param batch_size: maximum number of experiments in a batch
+        :return: list of experiments and ExperimentBatchedLogisticRegression objects
+        """
+        unbatched = []
+        groups = {}
+        for experiment in experiments:
+            p = experiment.parameters
+            if p.N * p.k * p.n > cls.BATCH_MAX_SIZE:
+                unbatched.append(experiment)
+                continue
+            key = (p.n, p.k, str(p.transformation), p.combiner, p.N, p.mini_batch_size, p.convergence_decimals,
+                   p.shuffle)
+            groups.setdefault(key, []).append(experiment)
+        return unbatched + [
+            ExperimentBatchedLogisticRegression(group[start:start + batch_size])
+            for group in groups.values()
+            for start in range(0, len(group), batch_size)
+        ]
+
+    def prepare_instance(self):
+        """
+        Initializes the instance and the training set with the given parameters.
         """
         self.instance = LTFArray(
             weight_array=LTFArray.normal_weights(
@@ -88,12 +140,20 @@ class ExperimentLogisticRegression(Experiment):
             transform=self.parameters.transformation,
             combiner=self.parameters.combiner,
         )
+        self.training_set = tools.TrainingSet(
+            instance=self.instance,
+            N=self.parameters.N,
+            random_instance=RandomState(self.parameters.seed_challenge)
+        )
+
+    def prepare(self):
+        """
+        Initializes the instance, the training set and the learner to then run the logistic regression
+        with the given parameters.
+        """
+        self.prepare_instance()
         self.learner = LogisticRegression(
-            tools.TrainingSet(
-                instance=self.instance,
-                N=self.parameters.N,
-                random_instance=RandomState(self.parameters.seed_challenge)
-            ),
+            self.training_set,
             self.parameters.n,
             self.parameters.k,
             transformation=self.instance.transform,
@@ -103,8 +163,21 @@ class ExperimentLogisticRegression(Experiment):
             minibatch_size=self.parameters.mini_batch_size,
             convergence_decimals=self.parameters.convergence_decimals or 2,
             shuffle=self.parameters.shuffle,
+            checkpoint=self.checkpoint,
         )
 
+    def checkpoint_state(self):
+        """
+        Returns the state of the learner, the instance and training set are recreated by prepare().
+        """
+        return self.learner.checkpoint_state()
+
+    def restore(self, state):
+        """
+        Restores the state of the learner, which then continues learning when run() is called.
+        """
+        self.learner.restore(state)
+
     def run(self):
         """
         Runs the learner
@@ -135,3 +208,96 @@ class ExperimentLogisticRegression(Experiment):
             transformation_name=self.instance.transform.__name__,
             memory_rss_max=self.max_memory(),
         )
+
+
+class ExperimentMultiStartLogisticRegression(ExperimentLogisticRegression):
+    """
+    This Experiment uses the multi-start logistic regression learner on an LTFArray PUF simulation, i.e. it trains
+    all restarts on a single training set at once and reports the model with the highest training set accuracy.
+    """
+
+    @classmethod
+    def batch(cls, experiments, batch_size):
+        """
+        Multi-start experiments are not combined into batches.
+        """
+        return experiments
+
+    def prepare(self):
+        """
+        Initializes the instance, the training set and the multi-start learner.
+        """
+        self.prepare_instance()
+        self.learner = MultiStartLogisticRegression(
+            self.training_set,
+            self.parameters.n,
+            self.parameters.k,
+            self.parameters.restarts,
+            transformation=self.instance.transform,
+            combiner=self.instance.combiner,
+            weights_prng=RandomState(seed=self.parameters.seed_model),
+            logger=self.progress_logger,
+            minibatch_size=self.parameters.mini_batch_size,
+            convergence_decimals=self.parameters.convergence_decimals or 2,
+            shuffle=self.parameters.shuffle,
+        )
+
+
+class ExperimentBatchedLogisticRegression(Experiment):
+    """
+    This Experiment runs several logistic regression experiments with equal learning setup at once, using the batched
+    logistic regression learner. Each experiment yields the result it would have yielded on its own, except for the
+    measured time, which is split evenly among the experiments of the batch.
+    """
+
+    def __init__(self, experiments):
+        """
+        :param experiments: list of ExperimentLogisticRegression with equal n, k, transformation, combiner, N and
+                            learning setup
+        """
+        super().__init__(None, tuple(experiment.parameters for experiment in experiments))
+        self.experiments = experiments
+        self.learner = None
+
+    def prepare(self):
+        """
+        Initializes the instances and training sets of all experiments and the batched learner.
+        """
+        for experiment in self.experiments:
+            experiment.progress_logger = self.progress_logger
+            experiment.prepare()
+        first = self.experiments[0]
+        self.learner = BatchedLogisticRegression(
+            [experiment.learner.training_set for experiment in self.experiments],
+            first.parameters.n,
+            first.parameters.k,
+            weights_prngs=[experiment.learner.weights_prng for experiment in self.experiments],
+            transformation=first.instance.transform,
+            combiner=first.instance.combiner,
+            logger=self.progress_logger,
+            minibatch_size=first.parameters.mini_batch_size,
+            convergence_decimals=first.parameters.convergence_decimals or 2,
+            shuffle=first.parameters.shuffle,
+        )
+
+    def run(self):
+        """
+        Runs the batched learner
+        """
+        for experiment, model in zip(self.experiments, self.learner.learn()):
+            experiment.model = model
+
+    def analyze(self):
+        """
+        Analyzes the learned results of all experiments.
+        :return: list of Result
+        """
+        results = []
+        for b, experiment in enumerate(self.experiments):
+            experiment.learner.iteration_count = self.learner.problem_iteration_counts[b]
+            experiment.learner.epoch_count = self.learner.problem_iteration_counts[b]
+            experiment.learner.gradient_step_count = self.learner.problem_gradient_step_counts[b]
+            experiment.learner.converged = self.learner.problem_converged[b]
+            experiment.measured_time = self.measured_time / len(self.experiments)
+            results.append(experiment.analyze())
+        return results
@@ -40,7 +40,7 @@ class Experimenter(object):
 
     def __init__(self, result_log_name, cpu_limit=None, gpu_limit=None,
                  auto_multiprocessing=False, update_callback=None,
-                 update_callback_min_pause=0, results_file=None):
+                 update_callback_min_pause=0, results_file=None, checkpoint_dir=None):
         """
         :param result_log_name: A unique file path where to output should be logged.
         :param cpu_limit: Maximum number of parallel processes that run experiments.
@@ -51,6 +51,9 @@ class Experimenter(object):
                 update_callback_min_pause.
         :param update_callback_min_pause: If set, update_callbacks will be delayed to at least the number of seconds
                 given here. If another experiment finishes during the pause, the earlier callback will be canceled.
+        :param checkpoint_dir: If set, experiments that support checkpoints save their state in this directory, in a
+                file named after the experiment's hash. When an interrupted experiment is run again, it is resumed
+                from its last checkpoint.
         """
 
         # Store experiments list
@@ -82,6 +85,11 @@ class Experimenter(object):
                 self.results.to_csv('results/' + self.results_file)
             self.load_results()
 
+        # checkpoints of running experiments
+        self.checkpoint_dir = checkpoint_dir
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
         # Disable automatic multiprocessing
         if not auto_multiprocessing:
             self.disable_auto_multiprocessing()
@@ -108,12 +116,17 @@ class Experimenter(object):
         Add an experiment to the queue.
         """
         self.experiments[experiment.id] = experiment
+        if self.checkpoint_dir:
+            experiment.checkpoint_path = os.path.join(self.checkpoint_dir, experiment.hash + '.pickle')
         self.jobs_total = len(self.experiments)
         return experiment.hash
 
-    def run(self, shuffle=False):
+    def run(self, shuffle=False, batch_size=1):
         """
         Runs all experiments. Blocks until all experiment are finished.
+        :param shuffle: If True, experiments are run in random order.
+        :param batch_size: If larger than one, experiments of the same class may be combined into batches of up to
+                this size that are executed at once, see Experiment.batch.
         """
         # determine cpu type
         from numpy.distutils import cpuinfo
@@ -192,30 +205,33 @@ class Experimenter(object):
             # define callbacks, they are run within the main process, but in separate threads
             def update_status(result=None):
                 from pandas import DataFrame
+                # batches of experiments yield a list of results, one for each experiment
+                results = result if isinstance(result, list) else [result]
                 with result_lock:
-                    self.jobs_finished += 1
+                    self.jobs_finished += len(results)
                     output_status()
-                    if not result:
+                    if not all(results):
                         return
 
-                    row = {}
-                    experiment = self.experiments[result.experiment_id]
-                    row.update({
-                        'experiment_id': result.experiment_id,
-                        'experiment_hash': experiment.hash,
-                        'experiment': experiment.__class__.__name__,
-                        'cpu': cpu,
-                    })
-                    for env_var in [
-                            'PYPUF_CPU_LIMIT',
-                            'OMP_NUM_THREADS',
-                            'NUMEXPR_NUM_THREADS',
-                            'MKL_NUM_THREADS',
-                    ]:
-                        row.update({env_var: os.environ.get(env_var, None)})
-                    row.update(experiment.parameters._asdict())
-                    row.update(result._asdict())
-                    self.results = self.results.append(DataFrame([row]), sort=True)
+                    for result in results:
+                        row = {}
+                        experiment = self.experiments[result.experiment_id]
+                        row.update({
+                            'experiment_id': result.experiment_id,
+                            'experiment_hash': experiment.hash,
+                            'experiment': experiment.__class__.__name__,
+                            'cpu': cpu,
+                        })
+                        for env_var in [
+                                'PYPUF_CPU_LIMIT',
+                                'OMP_NUM_THREADS',
+                                'NUMEXPR_NUM_THREADS',
+                                'MKL_NUM_THREADS',
+                        ]:
+                            row.update({env_var: os.environ.get(env_var, None)})
+                        row.update(experiment.parameters._asdict())
+                        row.update(result._asdict())
+                        self.results = self.results.append(DataFrame([row]), sort=True)
 
                 # If there is already a callback waiting, we will replace it and therefore cancel it
                 if self.next_callback and self.next_callback.is_alive():
@@ -267,6 +283,17 @@ class Experimenter(object):
                     print('Results file %s contains %i results to unknown experiments.' %
                           (self.results_file, len(unknown_experiments)))
 
+            # combine experiments into batches, where supported by the experiment class
+            if batch_size > 1:
+                experiments_by_class = {}
+                for experiment in experiments:
+                    experiments_by_class.setdefault(experiment.__class__, []).append(experiment)
+                experiments = [
+                    batch
+                    for experiment_class, class_experiments in experiments_by_class.items()
+                    for batch in experiment_class.batch(class_experiments, batch_size)
+                ]
+
             # experiment execution
             for experiment in experiments:
                 # Assign experiment to GPU (if used) : might be replaced by more sophisticated load balancer
@@ -2,11 +2,11 @@
 This module provides an attack on XOR Arbiter PUFs that is based off known correlation in sub-challenge generation of
 the input transformation.
 """
-from copy import deepcopy
-from itertools import permutations
-from scipy.io import loadmat
+from copy import copy, deepcopy
+from heapq import heappush, heapreplace
+from multiprocessing import get_context, current_process
 from numpy.random import RandomState
-from numpy import empty, roll, count_nonzero, sign, zeros
+from numpy import empty, roll, count_nonzero, sign, array, array_split, arange, einsum, multiply, int8
 from pypuf.learner.base import Learner
 from pypuf.learner.regression.logistic_regression import LogisticRegression
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
@@ -15,6 +15,20 @@ from collections import namedtuple
 
 PermData = namedtuple('Permutation', ['permutation', 'accuracy'])
 
+# the attack whose restarts are run by forked worker processes, see CorrelationAttack.relearned_models
+_RELEARN_CONTEXT = {}
+
+
+def _relearn(index):
+    """
+    Restarts the LR learner of the attack in _RELEARN_CONTEXT from the index-th high accuracy permutation, on the
+    training features that were prepared before the worker process was forked.
+    :return: tuple of the weight array of the learned model and the number of LR iterations
+    """
+    attack = _RELEARN_CONTEXT['attack']
+    model = attack.relearn(index, features=_RELEARN_CONTEXT['features'])
+    return model.weight_array, attack.lr_learner.iteration_count
+
 
 class CorrelationAttack(Learner):
     """
@@ -27,9 +41,11 @@ class CorrelationAttack(Learner):
     OPTIMIZATION_ACCURACY_LOWER_BOUND = .65
     OPTIMIZATION_ACCURACY_UPPER_BOUND = .95
     OPTIMIZATION_ACCURACY_GOAL = .98
+    PERMUTATION_SEARCH_BLOCKS = 32
 
     def __init__(self, n, k, training_set, validation_set, weights_mu=0, weights_sigma=1, weights_prng=RandomState(),
-                 lr_iteration_limit=1000, mini_batch_size=0, convergence_decimals=2, shuffle=False, logger=None):
+                 lr_iteration_limit=1000, mini_batch_size=0, convergence_decimals=2, shuffle=False, logger=None,
+                 optimizer='rprop', checkpoint=None, processes=1):
         """
         Initialize a Correlation Attack Learner for the specified LTF Array which uses transform_lightweight_secure.
 
@@ -44,6 +60,17 @@ class CorrelationAttack(Learner):
         :param lr_iteration_limit: Iteration limit for a single LR learner run
         :param logger: logging.Logger
                        Logger which is used to log detailed information of learn iterations.
+        :param optimizer: 'rprop' or 'lbfgs'. Model updater of the LR learner, see LogisticRegression.
+        :param checkpoint: None or callable without arguments. If given, it is called whenever the state of the attack
+                           (see checkpoint_state) can be saved, i.e. after each epoch of the LR learner and after each
+                           tried permutation.
+        :param processes: int. If larger than one, the LR learner is restarted from this many permutations
+                          concurrently in forked worker processes, which share the training features prepared by the
+                          parent process. The permutations are still considered in order, hence the result does not
+                          depend on the number of processes; as soon as a restart reaches OPTIMIZATION_ACCURACY_GOAL,
+                          the remaining restarts are canceled. Restarts running in worker processes are not
+                          checkpointed. Daemonic processes, such as the workers of the Experimenter, cannot start
+                          worker processes; in a daemonic process, the restarts run sequentially.
         """
         self.n = n
         self.k = k
@@ -54,6 +81,8 @@ class CorrelationAttack(Learner):
         )
 
         self.logger = logger
+        self.checkpoint = checkpoint
+        self.processes = processes
 
         self.lr_learner = LogisticRegression(
             t_set=training_set,
@@ -68,41 +97,48 @@ class CorrelationAttack(Learner):
             iteration_limit=lr_iteration_limit,
             minibatch_size=mini_batch_size,
             convergence_decimals=convergence_decimals,
-            shuffle=shuffle
+            shuffle=shuffle,
+            optimizer=optimizer,
+            checkpoint=checkpoint,
         )
 
         self.initial_accuracy = .5
         self.initial_lr_iterations = 0
         self.initial_model = None
+        self.initial_updater = None
+        self.high_accuracy_permutations = None
+        self.permutation_index = 0
+        self.best_model = None
         self.total_lr_iterations = 0
         self.best_permutation_iteration = 0
         self.total_permutation_iterations = 0
         self.best_permutation = None
         self.best_accuracy = None
 
-        assert n in (64, 128), 'Correlation attack for %i bit is currently not supported.' % n
+        assert n % 2 == 0, 'Correlation attack is only defined for even n, but n was %i.' % n
         assert validation_set.N >= 1000, 'Validation set should contain at least 1000 challenges.'
 
-        self.correlation_permutations = loadmat(
-            'data/correlation_permutations_lightweight_secure_%i_10.mat' % n
-        )['shiftOverviewData'][:, :, 0].astype('int64')
+        self.correlation_permutations = self.correlation_shifts(n, k)
 
     def learn(self):
         """
         Compute a model according to the given LTF Array parameters and training set.
-        Note that this function can take long to return.
+        Note that this function can take long to return. If a state was restored, learning continues from there.
         :return: pypuf.simulation.arbiter_based.LTFArray
                  The computed model.
         """
-        self.initial_model = initial_model = self.lr_learner.learn()
-        self.logger.debug('initial weights for corr attack:')
-        self.logger.debug(','.join(map(str, initial_model.weight_array.flatten())))
-        self.initial_accuracy = self.approx_accuracy(initial_model, self.validation_set_efba.block_subset(0, 2))
-        self.initial_lr_iterations = self.lr_learner.iteration_count
-        self.total_lr_iterations = self.initial_lr_iterations
-        initial_updater = self.lr_learner.updater
-
-        self.best_accuracy = self.initial_accuracy
+        if self.initial_model is None:
+            self.initial_model = self.lr_learner.learn()
+            self.logger.debug('initial weights for corr attack:')
+            self.logger.debug(','.join(map(str, self.initial_model.weight_array.flatten())))
+            self.initial_accuracy = self.approx_accuracy(self.initial_model,
+                                                         self.validation_set_efba.block_subset(0, 2))
+            self.initial_lr_iterations = self.lr_learner.iteration_count
+            self.total_lr_iterations = self.initial_lr_iterations
+            self.initial_updater = self.lr_learner.updater
+            self.best_accuracy = self.initial_accuracy
+            self.best_model = self.initial_model
+        initial_model = self.initial_model
 
         self.logger.debug('Initial accuracy is %.4f' % self.initial_accuracy)
 
@@ -115,23 +151,26 @@ class CorrelationAttack(Learner):
             return initial_model
 
         # Try all permutations with high initial accuracy and see if any of them lead to a good final result
-        high_accuracy_permutations = self.find_high_accuracy_weight_permutations(
-            initial_model.weight_array,
-            # allow some accuracy loss by permuting
-            # the higher the initial accuracy, the higher the loss we allow
-            # result will never be below 0.925
-            1.2 * self.best_accuracy - .2
-        )
+        if self.high_accuracy_permutations is None:
+            self.high_accuracy_permutations = self.find_high_accuracy_weight_permutations(
+                initial_model.weight_array,
+                # allow some accuracy loss by permuting
+                # the higher the initial accuracy, the higher the loss we allow
+                # result will never be below 0.925
+                1.2 * self.best_accuracy - .2
+            )
+            if self.checkpoint:
+                self.checkpoint()
 
-        best_model = initial_model
-        self.logger.debug('Trying %i permuted weights.' % len(high_accuracy_permutations))
-        for (iteration, perm_data) in enumerate(high_accuracy_permutations):
+        self.logger.debug('Trying %i permuted weights.' % (len(self.high_accuracy_permutations) -
+                                                           self.permutation_index))
+        results = self.relearned_models(self.permutation_index)
+        for model, lr_iterations in results:
+            iteration = self.permutation_index
+            perm_data = self.high_accuracy_permutations[iteration]
+            self.total_lr_iterations += lr_iterations
             self.total_permutation_iterations += 1
-            weights = self.adopt_weights(initial_model.weight_array, perm_data.permutation)
-            self.lr_learner.updater = deepcopy(initial_updater)
-            self.lr_learner.updater.step_size *= 10
-            model = self.lr_learner.learn(init_weight_array=weights, refresh_updater=False)
-            self.total_lr_iterations += self.lr_learner.iteration_count
+            self.permutation_index += 1
             accuracy = self.approx_accuracy(model, self.validation_set_efba.block_subset(1, 2))
             self.logger.debug(
                 'With permutation no %d=%s, after restarting the learning we achieved accuracy %.4f -> %.4f!' %
@@ -141,7 +180,7 @@ class CorrelationAttack(Learner):
                 # demand some "substantial" improvement of accuracy
                 # what substantial means becomes weaker as we approach
                 # perfect accuracy
-                best_model = model
+                self.best_model = model
                 self.best_accuracy = accuracy
                 self.best_permutation_iteration = iteration + 1
                 self.best_permutation = perm_data.permutation
@@ -151,33 +190,211 @@ class CorrelationAttack(Learner):
             if accuracy > self.OPTIMIZATION_ACCURACY_GOAL:
                 self.logger.debug('Found a model with accuracy better than %.2f. Terminating' %
                                   self.OPTIMIZATION_ACCURACY_GOAL)
+                results.close()
                 return model
 
+            if self.checkpoint:
+                self.checkpoint()
+
         self.logger.debug('After trying all permutations, we found a model with acc. %.2f.' % self.best_accuracy)
-        return best_model
+        return self.best_model
+
+    def relearn(self, index, features=None):
+        """
+        Restarts the LR learner from the initial model, permuted according to the index-th high accuracy permutation.
+        :param index: int
+        :param features: None or prepared training features, see LogisticRegression.learn
+        :return: pypuf.simulation.arbiter_based.LTFArray
+        """
+        permutation = self.high_accuracy_permutations[index].permutation
+        weights = self.adopt_weights(self.initial_model.weight_array, permutation)
+        self.lr_learner.updater = deepcopy(self.initial_updater)
+        if isinstance(self.initial_updater, LogisticRegression.RPropModelUpdate):
+            self.lr_learner.updater.step_size *= 10
+        return self.lr_learner.learn(init_weight_array=weights, refresh_updater=False, features=features)
+
+    def relearned_models(self, start):
+        """
+        Restarts the LR learner from the high accuracy permutations beginning with the start-th one, see relearn.
+        The restarts run concurrently if processes is larger than one, but the models are yielded in order of the
+        permutations in any case. Closing the generator cancels the remaining restarts.
+        :param start: int
+        :return: iterator of tuples of the learned model and the number of LR iterations
+        """
+        indices = range(start, len(self.high_accuracy_permutations))
+        sequential = self.processes == 1
+        if not sequential and current_process().daemon:
+            # daemonic processes, e.g. the workers of the Experimenter, are not allowed to have children
+            self.logger.warning('Cannot start worker processes from a daemonic process, restarting the LR learner '
+                                'sequentially instead.')
+            sequential = True
+        if sequential:
+            for index in indices:
+                model = self.relearn(index)
+                yield model, self.lr_learner.iteration_count
+            return
+
+        # prepare the training features once, the forked workers share them copy-on-write
+        self.lr_learner.prepare_features()
+        _RELEARN_CONTEXT.update(attack=self, features=self.lr_learner.efba_sub_challenges)
+        checkpoint, self.lr_learner.checkpoint = self.lr_learner.checkpoint, None
+        pool = get_context('fork').Pool(self.processes)
+        try:
+            for weight_array, lr_iterations in pool.imap(_relearn, indices):
+                yield self.model(weight_array), lr_iterations
+        finally:
+            pool.terminate()
+            pool.join()
+            _RELEARN_CONTEXT.clear()
+            self.lr_learner.checkpoint = checkpoint
+            self.lr_learner.efba_sub_challenges = None
+
+    @staticmethod
+    def model(weight_array):
+        """
+        Creates a model of the attacked LTF Array with the given weights, including the bias.
+        :param weight_array: array of float of shape (k, n+1)
+        :return: pypuf.simulation.arbiter_based.LTFArray
+        """
+        return LTFArray(weight_array=weight_array[:, :-1], transform=LTFArray.transform_lightweight_secure,
+                        combiner=LTFArray.combiner_xor, bias=weight_array[:, -1:])
+
+    def checkpoint_state(self):
+        """
+        Returns the state of the attack, i.e. the initial model and updater, the permutations tried so far, the best
+        model and the counters, as well as the state of the LR learner if it is interrupted while learning.
+        :return: dict
+        """
+        def weights(model):
+            return None if model is None else model.weight_array.copy()
+
+        initial_updater = copy(self.initial_updater)
+        if initial_updater is not None:
+            initial_updater.model = None
+            if isinstance(initial_updater, LogisticRegression.LBFGSModelUpdate):
+                initial_updater.loss = None
+        return dict(
+            initial_model=weights(self.initial_model),
+            initial_updater=deepcopy(initial_updater),
+            initial_accuracy=self.initial_accuracy,
+            initial_lr_iterations=self.initial_lr_iterations,
+            high_accuracy_permutations=None if self.high_accuracy_permutations is None else
+            [tuple(perm_data) for perm_data in self.high_accuracy_permutations],
+            permutation_index=self.permutation_index,
+            best_model=weights(self.best_model),
+            best_accuracy=self.best_accuracy,
+            best_permutation_iteration=self.best_permutation_iteration,
+            best_permutation=self.best_permutation,
+            total_lr_iterations=self.total_lr_iterations,
+            total_permutation_iterations=self.total_permutation_iterations,
+            lr_learner=self.lr_learner.checkpoint_state() if self.lr_learner.learning else None,
+        )
+
+    def restore(self, state):
+        """
+        Restores a state obtained by checkpoint_state, such that the next call of learn() continues from there.
+        :param state: dict
+        """
+        def model(weight_array):
+            return None if weight_array is None else self.model(weight_array)
+
+        self.initial_model = model(state['initial_model'])
+        self.initial_updater = deepcopy(state['initial_updater'])
+        self.initial_accuracy = state['initial_accuracy']
+        self.initial_lr_iterations = state['initial_lr_iterations']
+        self.high_accuracy_permutations = None if state['high_accuracy_permutations'] is None else \
+            [PermData(*perm_data) for perm_data in state['high_accuracy_permutations']]
+        self.permutation_index = state['permutation_index']
+        self.best_model = model(state['best_model'])
+        self.best_accuracy = state['best_accuracy']
+        self.best_permutation_iteration = state['best_permutation_iteration']
+        self.best_permutation = state['best_permutation']
+        self.total_lr_iterations = state['total_lr_iterations']
+        self.total_permutation_iterations = state['total_permutation_iterations']
+        if state['lr_learner'] is not None:
+            self.lr_learner.restore(state['lr_learner'])
 
     def find_high_accuracy_weight_permutations(self, weights, threshold):
         """
         Gives permutations for the weight-array resulting in the highest model accuracies.
+
+        This is a depth-first search on a table of chain responses with early exit at the leaves. The permutations
+        are enumerated in the order of itertools.permutations, where level l of the search fixes the position of
+        chain l. Each level multiplies one row of the chain response table (see chain_response_table) into the
+        product of the responses of the chains fixed so far, such that the responses of each complete permutation
+        cost a single product. The agreement of a complete permutation with the validation set is counted block by
+        block and abandoned as soon as it can neither reach the threshold nor enter the list of best permutations
+        found so far. Internal nodes are not pruned, as the responses of the chains not yet fixed can turn any
+        partial product into any agreement; each internal node costs one product over the whole validation set.
         :param weights: The original weight-array
         :param threshold: Minimum accuracy to consider
         :return: The 5k permutations with the highest accuracy
         """
-        high_accuracy_permutations = []
-        adopted_instance = LTFArray(
-            weight_array=zeros((self.k, self.n)),
-            transform=LTFArray.transform_lightweight_secure,
-            combiner=LTFArray.combiner_xor
-        )
-        for permutation in list(permutations(range(self.k)))[1:]:
-            adopted_instance.weight_array = self.adopt_weights(weights, permutation)
-            accuracy = self.approx_accuracy(adopted_instance)
-            self.logger.debug('For permutation %s, we have accuracy %.4f' % (permutation, accuracy))
-            if accuracy >= threshold:
-                high_accuracy_permutations.append(PermData(permutation, accuracy))
+        k, N = self.k, self.validation_set_efba.N
+        table = self.chain_response_table(weights)
+        limit = 5 * k
+        blocks = [(block[0], block[-1] + 1) for block in array_split(arange(N), min(self.PERMUTATION_SEARCH_BLOCKS, N))]
+        identity = tuple(range(k))
 
-        high_accuracy_permutations.sort(key=lambda x: -x.accuracy)
-        return high_accuracy_permutations[:5 * self.k]
+        # products[l] holds the validation set responses times the responses of chains 0, ..., l-1 at their positions
+        products = empty((k, N), dtype=table.dtype)
+        products[0] = self.validation_set_efba.responses
+
+        best = []  # heap of (count, -index, permutation), i.e. the worst of the best permutations comes first
+        counts = dict(enumerated=0, evaluated=0)
+
+        def search(chain, permutation):
+            for position in range(k):
+                if position in permutation:
+                    continue
+                if chain < k - 1:
+                    multiply(products[chain], table[chain, position], out=products[chain + 1])
+                    search(chain + 1, permutation + (position,))
+                    continue
+
+                # complete permutation, count its agreement with the validation set
+                index = counts['enumerated']
+                counts['enumerated'] += 1
+                if permutation + (position,) == identity:
+                    continue
+                worst = best[0][0] if len(best) == limit else -1
+                count, remaining = 0, N
+                for lo, hi in blocks:
+                    count += count_nonzero(products[chain, lo:hi] * table[chain, position, lo:hi] == 1)
+                    remaining -= hi - lo
+                    if (count + remaining) / N < threshold or count + remaining <= worst:
+                        break
+                else:
+                    counts['evaluated'] += 1
+                    if len(best) < limit:
+                        heappush(best, (count, -index, permutation + (position,)))
+                    else:
+                        heapreplace(best, (count, -index, permutation + (position,)))
+
+        search(0, ())
+        self.logger.debug('Searched %i permutations, %i of them were evaluated completely.' %
+                          (counts['enumerated'] - 1, counts['evaluated']))
+        return [
+            PermData(permutation, count / N)
+            for count, _, permutation in sorted(best, key=lambda entry: (-entry[0], -entry[1]))
+        ]
+
+    def chain_response_table(self, weights):
+        """
+        Computes the response signs of all chains of the given weight-array at all positions on the validation set.
+        The chain l at position p is the chain l rolled as in adopt_weights, evaluated on the p-th sub-challenges.
+        :param weights: A weight-array of an LTFArray
+        :return: array of int8 of shape (k, k, N), indexed by chain, position and challenge
+        """
+        challenges = self.validation_set_efba.challenges
+        table = empty((self.k, self.k, self.validation_set_efba.N), dtype=int8)
+        for position in range(self.k):
+            rolled_weights = array([
+                roll(weights[l, :], self.correlation_permutations[l, position]) for l in range(self.k)
+            ])
+            table[:, position, :] = sign(einsum('ji,...i->j...', rolled_weights, challenges[:, position, :],
+                                                optimize=True))
+        return table
 
     def approx_accuracy(self, instance, efba_set=None):
         """
@@ -192,6 +409,19 @@ class CorrelationAttack(Learner):
         responses = sign(instance.combiner(instance.core_eval(efba_set.challenges)))
         return count_nonzero(responses == efba_set.responses) / size
 
+    @staticmethod
+    def correlation_shifts(n, k):
+        """
+        Returns the shifts that relate the chains of an LTF Array using transform_lightweight_secure. A chain l moved
+        to position p of a permuted model is rolled by the entry [l, p], see adopt_weights. Moving a chain by one
+        position corresponds to rolling its n+1 weights, including the bias, by n/2.
+        :param n: int. Input length, must be even.
+        :param k: int. Number of chains.
+        :return: array of int of shape (k, k)
+        """
+        chains, positions = arange(k).reshape(k, 1), arange(k).reshape(1, k)
+        return ((positions - chains) * (n // 2)) % (n + 1)
+
     def adopt_weights(self, weights, permutation):
         """
         Adopts the weights with the given permutation exploiting the correlations of the lightweight-secure transform.
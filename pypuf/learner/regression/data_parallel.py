@@ -0,0 +1,187 @@
+"""
+Data-parallel gradient computation for the Logistic Regression learner.
+
+The training features are placed in shared memory and a number of worker processes is forked. For each gradient
+step, the blocks of the current minibatch are distributed among the workers, which compute partial gradients and
+training set statistics on their blocks. The parent process collects the partial results in block order and reduces
+them, such that the result is identical to the single-process computation.
+"""
+from multiprocessing import get_context
+from multiprocessing.sharedctypes import RawArray
+
+from numpy import memmap, copyto, frombuffer, prod, int64, array_split, dtype as np_dtype
+
+from pypuf.simulation.arbiter_based.ltfarray import LTFArray
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:  # Python < 3.8
+    SharedMemory = None
+
+
+class SharedArray:
+    """
+    A numpy array in memory that is shared with forked child processes. Uses multiprocessing.shared_memory if
+    available and falls back to an anonymous shared memory map otherwise.
+    """
+
+    def __init__(self, shape, dtype):
+        """
+        :param shape: tuple of int
+        :param dtype: numpy.dtype
+        """
+        count = int(prod(shape))
+        nbytes = max(1, count * np_dtype(dtype).itemsize)
+        if SharedMemory is not None:
+            self.memory = SharedMemory(create=True, size=nbytes)
+            buffer = self.memory.buf
+        else:
+            self.memory = None
+            buffer = RawArray('b', nbytes)
+        self.array = frombuffer(buffer, dtype=dtype, count=count).reshape(shape)
+
+    @classmethod
+    def copy_of(cls, source):
+        """
+        Creates a shared copy of the given array. Until the source is released, both copies are held in memory.
+        :param source: array
+        :return: SharedArray
+        """
+        shared = cls(source.shape, source.dtype)
+        copyto(shared.array, source)
+        return shared
+
+    def close(self):
+        """
+        Releases the shared memory. The array must not be used afterwards. With multiprocessing.shared_memory, all
+        other views of the array must have been released before, otherwise the memory cannot be closed.
+        """
+        self.array = None
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+
+
+def _work(learner, connection, challenges, responses, order):
+    """
+    Main loop of a worker process. Receives tasks of the form (weights, lo, hi, starts), computes the partial
+    gradients of the blocks at the given starts within the minibatch [lo, hi) and sends the partial results back.
+    A task of None terminates the worker.
+    """
+    transform = learner.feature_mode == 'lazy'
+    while True:
+        task = connection.recv()
+        if task is None:
+            connection.close()
+            return
+        weights, lo, hi, starts = task
+        try:
+            model = LTFArray(weight_array=weights[:, :-1], transform=learner.transformation,
+                             combiner=learner.combiner, bias=weights[:, -1:])
+            if order is None:
+                batch_challenges = challenges[:, lo:hi] if learner.chain_major else challenges[lo:hi]
+                batch_responses, indices = responses[lo:hi], None
+            else:
+                batch_challenges, batch_responses, indices = challenges, responses, order.array[lo:hi]
+            connection.send([
+                learner.block_gradient(model, *learner.block(batch_challenges, batch_responses, start,
+                                                             learner.block_size, transform, indices))
+                for start in starts
+            ])
+        except Exception as exception:  # pylint: disable=broad-except
+            connection.send(exception)
+
+
+class GradientProcessPool:
+    """
+    A pool of forked worker processes that compute the gradient of a LogisticRegression learner on shared
+    training features. The processes are forked on creation, hence the learner must have prepared its features.
+    Features that are not memory-mapped are copied into shared memory, which temporarily doubles their memory
+    footprint. The worker processes are daemonic and can therefore not be started from a daemonic process.
+    """
+
+    def __init__(self, learner, processes):
+        """
+        :param learner: pypuf.learner.regression.logistic_regression.LogisticRegression
+                        Learner with prepared features in efba_sub_challenges.
+        :param processes: int. Number of worker processes.
+        """
+        self.learner = learner
+        self.processes = processes
+        self.N = learner.training_set.N
+        self.shared = []
+
+        # place features and responses in shared memory, memory maps are already shared through the file system
+        challenges, responses = learner.efba_sub_challenges, learner.training_set.responses
+        if not isinstance(challenges, memmap):
+            self.shared.append(SharedArray.copy_of(challenges))
+            challenges = learner.efba_sub_challenges = self.shared[-1].array
+        if not isinstance(responses, memmap):
+            self.shared.append(SharedArray.copy_of(responses))
+            responses = self.shared[-1].array
+        self.order = SharedArray((self.N,), int64) if learner.shuffle else None
+        if self.order is not None:
+            self.shared.append(self.order)
+
+        context = get_context('fork')
+        self.connections = []
+        self.workers = []
+        for _ in range(processes):
+            parent_connection, child_connection = context.Pipe()
+            worker = context.Process(target=_work, args=(learner, child_connection, challenges, responses,
+                                                         self.order), daemon=True)
+            worker.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.workers.append(worker)
+
+    def batch_bounds(self, number_of_batches, batch):
+        """
+        Returns the positions of the given minibatch, using the same division as numpy.array_split.
+        :param number_of_batches: int
+        :param batch: int
+        :return: tuple of int (lo, hi)
+        """
+        size, extra = divmod(self.N, number_of_batches)
+        lo = batch * size + min(batch, extra)
+        return lo, lo + size + (1 if batch < extra else 0)
+
+    def set_order(self, order):
+        """
+        Sets the order in which the examples are visited, shared with all workers.
+        :param order: array of int of shape (N,)
+        """
+        copyto(self.order.array, order)
+
+    def gradient(self, model, lo, hi):
+        """
+        Computes the gradient of the given model on the minibatch at positions [lo, hi).
+        :param model: pypuf.simulation.arbiter_based.LTFArray
+        :param lo: int
+        :param hi: int
+        :return: array of float
+        """
+        starts = range(0, hi - lo, self.learner.block_size)
+        for connection, worker_starts in zip(self.connections, array_split(starts, self.processes)):
+            connection.send((model.weight_array, lo, hi, worker_starts))
+        worker_results = [connection.recv() for connection in self.connections]
+        partial_results = []
+        for results in worker_results:
+            if isinstance(results, Exception):
+                raise results
+            partial_results.extend(results)
+        return self.learner.reduce_gradient(partial_results, len(starts))
+
+    def close(self):
+        """
+        Terminates the worker processes and releases the shared memory. The caller must release all views of the
+        shared features before, e.g. minibatches obtained from learner.efba_sub_challenges.
+        """
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for worker in self.workers:
+            worker.join()
+        self.learner.efba_sub_challenges = None
+        for shared in self.shared:
+            shared.close()
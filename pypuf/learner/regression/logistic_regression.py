@@ -4,16 +4,24 @@ Heavily based on the work of Rührmair, Ulrich, et al. "Modeling attacks on phys
 of the 17th ACM conference on Computer and communications security. ACM, 2010.
 """
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
 from math import ceil
+from multiprocessing import current_process
+from threading import get_ident
+from time import time
 
 from numpy import abs as np_abs, zeros, count_nonzero, average, absolute
-from numpy import dtype, sign, dot, exp, array, seterr, minimum, full, amin, amax, array_split
+from numpy import dtype, sign, exp, array, seterr, minimum, maximum, multiply, full, array_split, einsum, copyto
+from numpy import broadcast_to, empty, swapaxes, arange, ones, argmax, geterr, errstate, logaddexp, vdot, nan
 from numpy.linalg import norm
 from numpy.random import RandomState
 
 from pypuf.learner.base import Learner
-from pypuf.simulation.arbiter_based.ltfarray import LTFArray
-from pypuf.tools import compare_functions, approx_dist_nonrandom, ChallengeResponseSet
+from pypuf.learner.regression.data_parallel import GradientProcessPool
+from pypuf.simulation.arbiter_based.ltfarray import LTFArray, Combiner
+from pypuf.tools import compare_functions, ChallengeResponseSet
 
 
 class LogisticRegression(Learner):
@@ -44,16 +52,24 @@ class LogisticRegression(Learner):
             """
             return -.3 * gradient
 
+        def restart(self):
+            """
+            Called when learning continues with this updater on a model or training set that changed since the last
+            update. Does nothing by default.
+            """
+
     class RPropModelUpdate(ModelUpdate):
         """
         Model update according to the Resilient Backpropagation algorithm. For details, see update() method.
         """
 
-        def __init__(self, model, bias=False, eta_minus=0.5, eta_plus=1.2):
+        def __init__(self, model, bias=False, eta_minus=0.5, eta_plus=1.2, restarts=None):
             """
             :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
             :param eta_minus: float
             :param eta_plus: float
+            :param restarts: None or int. If given, the updater keeps an independent state for this many models,
+                             i.e. gradients and steps are of shape (restarts, k, n[+1]).
             """
             self.n = n = model.n
             self.k = k = model.k
@@ -62,10 +78,11 @@ class LogisticRegression(Learner):
             self.eta_plus = eta_plus
             self.delta_min = 10 ** -4
             self.delta_max = 10 ** +1
-            self.last_gradient = full((k, n + 1 if bias else n), 1.0)
-            self.last_step_size = full((k, n + 1 if bias else n), 0.0)
-            self.step_size = full((k, n + 1 if bias else n), 1.0)
-            self.step = full((k, n + 1 if bias else n), 0.0)
+            shape = (k, n + 1 if bias else n) if restarts is None else (restarts, k, n + 1 if bias else n)
+            self.last_gradient = full(shape, 1.0)
+            self.last_step_size = full(shape, 0.0)
+            self.step_size = full(shape, 1.0)
+            self.step = full(shape, 0.0)
             self.step_size_max = full(self.n + 1 if bias else n, self.delta_max, dtype('float64'))
             self.step_size_min = full(self.n + 1 if bias else n, self.delta_min, dtype('float64'))
 
@@ -88,26 +105,130 @@ class LogisticRegression(Learner):
             :param gradient array of float
             :return: array of float
             """
-            for l, grad_l in enumerate(gradient):
-                step_indicator = sign(grad_l * self.last_gradient[l])
+            step_indicator = sign(gradient * self.last_gradient)
+            increase = step_indicator > 0
+            decrease = step_indicator < 0
+            keep = step_indicator == 0
 
-                self.step_size[l][step_indicator > 0] *= self.eta_plus
-                self.step_size[l][step_indicator < 0] *= self.eta_minus
+            multiply(self.step_size, self.eta_plus, out=self.step_size, where=increase)
+            multiply(self.step_size, self.eta_minus, out=self.step_size, where=decrease)
 
-                self.step_size[l] = amin((self.step_size[l], self.step_size_max), 0)
-                self.step_size[l] = amax((self.step_size[l], self.step_size_min), 0)
+            minimum(self.step_size, self.step_size_max, out=self.step_size)
+            maximum(self.step_size, self.step_size_min, out=self.step_size)
 
-                self.step[l][step_indicator > 0] = -(
-                    self.step_size[l][step_indicator > 0] * sign(grad_l[step_indicator > 0])
-                )
-                self.step[l][step_indicator < 0] = -self.last_step_size[l][step_indicator < 0]
-                self.step[l][step_indicator == 0] = -self.step_size[l][step_indicator == 0] * sign(
-                    grad_l[step_indicator == 0])
+            # where the gradient changed its sign, the last step is reverted; entries with undefined step indicator
+            # (i.e. NaN gradients) keep their previous step
+            copyto(self.step, -(self.step_size * sign(gradient)), where=increase | keep)
+            copyto(self.step, -self.last_step_size, where=decrease)
+
+            copyto(self.last_gradient, gradient)
+            self.last_gradient[decrease] = 0
+            copyto(self.last_step_size, self.step)
+
+            return self.step
+
+    class LBFGSModelUpdate(ModelUpdate):
+        """
+        Model update according to the limited-memory BFGS quasi-Newton method. For details, see update() method.
+        """
+
+        def __init__(self, model, loss, bias=False, memory=10, initial_step_length=1.0, sufficient_decrease=10**-4,
+                     backtracking_factor=0.5):
+            """
+            :param model: pypuf.simulation.arbiter_based.ltfarray.LTFArray
+            :param loss: callable without arguments that returns the loss of the model at the point where the
+                         gradient given to update() was computed.
+            :param memory: int. Number of recent curvature pairs used to approximate the inverse Hessian.
+            :param initial_step_length: float. Length of the first step, which goes along the steepest descent.
+            :param sufficient_decrease: float. Constant of the Armijo condition used in the line search.
+            :param backtracking_factor: float. Factor by which a rejected step is shortened.
+            """
+            self.n = n = model.n
+            self.k = k = model.k
+
+            self.loss = loss
+            self.initial_step_length = initial_step_length
+            self.sufficient_decrease = sufficient_decrease
+            self.backtracking_factor = backtracking_factor
+            self.history = deque(maxlen=memory)
+            self.accepted_loss = None
+            self.accepted_gradient = None
+            self.displacement = None
+            self.step = full((k, n + 1 if bias else n), 0.0)
+            # norm of the last quasi-Newton direction, which is not shortened by the line search, see update()
+            self.direction_norm = 0.0
+
+            super().__init__(model)
+
+        def restart(self):
+            """
+            Forgets the last accepted point, as the loss is not comparable anymore. The curvature history is kept.
+            """
+            self.accepted_loss = None
+            self.accepted_gradient = None
+            self.displacement = None
+
+        def direction(self, gradient):
+            """
+            Computes the search direction from the current gradient using the two-loop recursion, see
+            Nocedal, Jorge, and Stephen J. Wright. "Numerical optimization." Springer, 2006, Algorithm 7.4.
+            :param gradient: array of float
+            :return: array of float
+            """
+            q = gradient.copy()
+            alphas = []
+            for s, y, rho in reversed(self.history):
+                alpha = rho * vdot(s, q)
+                q -= alpha * y
+                alphas.append(alpha)
+            if self.history:
+                s, y, _ = self.history[-1]
+                q *= vdot(s, y) / vdot(y, y)
+            else:
+                q *= self.initial_step_length / norm(q)
+            for (s, y, rho), alpha in zip(self.history, reversed(alphas)):
+                beta = rho * vdot(y, q)
+                q += (alpha - beta) * s
+            return -q
 
-                self.last_gradient[l] = grad_l
-                self.last_gradient[l][step_indicator < 0] = 0
-                self.last_step_size[l] = self.step[l]
+        def update(self, gradient):
+            """
+            Compute update step according to the L-BFGS method with a backtracking line search. As the learner
+            evaluates the model exactly once per gradient computation, the line search is spread over subsequent
+            updates: if the loss at the current point does not fulfill the Armijo condition with respect to the last
+            accepted point, the step is reverted partially, i.e. the model is moved back towards the last accepted
+            point along the search direction. Otherwise, the current point is accepted, the curvature pair is
+            recorded and the next step is taken along the quasi-Newton direction.
 
+            Note that the line search assumes that the loss and gradient are computed on the same examples in each
+            update, i.e. the learner should not use minibatches. As backtracking shortens the steps, the size of
+            the steps does not indicate convergence. Instead, the norm of the last quasi-Newton direction is kept in
+            direction_norm.
+            :param gradient: array of float
+            :return: array of float
+            """
+            loss = self.loss()
+            if self.accepted_loss is not None and loss > self.accepted_loss + self.sufficient_decrease * vdot(
+                    self.accepted_gradient, self.displacement):
+                self.step = (self.backtracking_factor - 1) * self.displacement
+                self.displacement = self.backtracking_factor * self.displacement
+                return self.step
+
+            if self.accepted_loss is not None:
+                y = gradient - self.accepted_gradient
+                sy = vdot(self.displacement, y)
+                if sy > 10**-10:  # skip pairs that violate the curvature condition to keep the approximation positive
+                    self.history.append((self.displacement, y, 1 / sy))
+
+            self.accepted_loss, self.accepted_gradient = loss, gradient.copy()
+            direction = self.direction(gradient)
+            if vdot(direction, gradient) >= 0:
+                # not a descent direction due to numerical issues, start over with steepest descent
+                self.history.clear()
+                direction = self.direction(gradient)
+            self.step = direction
+            self.displacement = direction.copy()
+            self.direction_norm = norm(direction)
             return self.step
 
     def __init__(self, t_set: ChallengeResponseSet, n, k, transformation=LTFArray.transform_id,
@@ -115,7 +236,9 @@ class LogisticRegression(Learner):
                  weights_sigma=1, weights_prng=RandomState(), logger=None, iteration_limit=10000, minibatch_size=None,
                  convergence_decimals=2, shuffle=False, test_set: ChallengeResponseSet = None, bias=False,
                  target_test_accuracy=None, test_accuracy_patience=None, test_accuracy_improvement=None,
-                 min_iterations=0):
+                 min_iterations=0, out_of_core=False, block_size=10**6, float_type='float64', feature_mode='eager',
+                 chain_major=False, test_every_steps=1, test_every_seconds=None, workers=1, processes=1,
+                 optimizer='rprop', trace=None, log_every_steps=1, log_weights=True, checkpoint=None):
         """
         Initialize a LTF Array Logistic Regression Learner for the specified LTF Array.
 
@@ -132,6 +255,49 @@ class LogisticRegression(Learner):
                        Logger which is used to log detailed information of learn iterations.
         :param target_test_accuracy: None or float. If test accuracy exceeds this value, the learning is aborted.
         :param min_iterations: int. Number of iterations the learner does before converging.
+        :param out_of_core: bool. If True, the training set is not transformed up front. Instead, the challenges are
+                            read block by block (e.g. from a memory-mapped ChallengeResponseSet), transformed and
+                            efba'ed on the fly, while the next block is prefetched on a background thread.
+        :param block_size: int. Number of examples the gradient is computed on at once.
+        :param float_type: str or numpy.dtype. Floating point type used to compute the model responses, the
+                           combined responses, the sigmoid derivative and the gradient contraction. The features
+                           are upcast block by block, the weights and the RPROP state remain in float64. Using
+                           'float32' roughly halves time and memory of each epoch at the cost of precision.
+        :param feature_mode: 'eager', 'shared' or 'lazy'. Determines how the training features are kept in memory.
+                             'eager' transforms the whole training set up front into an (N, k, n) array. 'shared'
+                             stores the sub-challenges only once, which requires a transformation that feeds the
+                             same sub-challenge into all chains (id or atf), and broadcasts them to all chains.
+                             'lazy' keeps the (N, n) challenges and transforms them block by block on the fly,
+                             trading memory for compute. Learning out of core implies 'lazy'.
+        :param chain_major: bool. If True, eager features are stored in chain-major layout (k, N, n[+1]), such that
+                            all sub-challenges of one chain are contiguous in memory.
+        :param test_every_steps: None or int. The test set accuracy is evaluated every this many gradient steps.
+        :param test_every_seconds: None or float. The test set accuracy is evaluated if at least this many seconds
+                                   passed since the last evaluation. Note that test_accuracy_patience is counted in
+                                   evaluations of the test set accuracy rather than in gradient steps.
+        :param workers: int. Number of threads that compute the gradient on disjoint blocks concurrently.
+        :param processes: int. If larger than one, the training features are placed in shared memory and the gradient
+                          blocks of each minibatch are distributed among this many forked worker processes, see
+                          pypuf.learner.regression.data_parallel. The result does not depend on the number of
+                          processes. Note that copying the features into shared memory temporarily doubles their
+                          memory footprint, unless the training set is memory-mapped. Daemonic processes, such as the
+                          workers of the Experimenter, cannot start worker processes; in a daemonic process, the
+                          gradient is computed in the process itself.
+        :param optimizer: 'rprop' or 'lbfgs'. Determines the model updater, RPROP (see RPropModelUpdate) or L-BFGS
+                          with a line search on the training set loss (see LBFGSModelUpdate). L-BFGS requires that
+                          the gradient is computed on the whole training set, i.e. no minibatches. Unlike RPROP,
+                          L-BFGS depends on the scale of the initial model: for XOR Arbiter PUFs with larger k,
+                          the combined responses of a model with unit weights_sigma are far in the saturated region
+                          of the sigmoid, and L-BFGS is drawn towards the all-zero model. A weights_sigma of about
+                          n**-.5 avoids this.
+        :param trace: None or pypuf.learner.training_trace.TrainingTrace. If given, the state of the learner is
+                      recorded after each gradient step.
+        :param log_every_steps: None or int. The state of the learner is logged every this many gradient steps.
+        :param log_weights: bool. If True, the model weights are included in each log message, unless n exceeds 1024.
+                            Note that for large models, this makes logging expensive; use a trace with weight
+                            snapshots instead. If False, the weights column is omitted from the log messages.
+        :param checkpoint: None or callable without arguments. If given, it is called after each epoch, e.g. to save
+                           the state of the learner obtained by checkpoint_state.
         """
         self.iteration_count = 0
         self.epoch_count = 0
@@ -156,11 +322,37 @@ class LogisticRegression(Learner):
         self.shuffle = shuffle
         self.training_set_dist = -1
         self.training_set_dist_sign = -1
+        self.training_set_loss = None
         self.test_set_dist = -1
         self.bias = bias
         self.target_test_accuracy = target_test_accuracy
         self.test_accuracy_patience = test_accuracy_patience
         self.test_accuracy_improvement = test_accuracy_improvement
+        self.out_of_core = out_of_core
+        self.block_size = block_size
+        self.float_type = dtype(float_type)
+        assert feature_mode in ('eager', 'shared', 'lazy'), 'Unknown feature mode %s.' % feature_mode
+        self.feature_mode = 'lazy' if out_of_core else feature_mode
+        assert not chain_major or self.feature_mode == 'eager', 'Chain-major layout requires eager features.'
+        self.chain_major = chain_major
+        self.buffers = {}
+        self.test_every_steps = test_every_steps
+        self.test_every_seconds = test_every_seconds
+        self.workers = workers
+        self.executor = None
+        self.processes = processes
+        assert optimizer in ('rprop', 'lbfgs'), 'Unknown optimizer %s.' % optimizer
+        assert optimizer != 'lbfgs' or not minibatch_size, 'L-BFGS does not support minibatches.'
+        self.optimizer = optimizer
+        self.trace = trace
+        self.log_every_steps = log_every_steps
+        self.log_weights = log_weights
+        self.checkpoint = checkpoint
+        self.model = None
+        self.learning = False
+        self.first_epoch = 0
+        self.test_set_accuracies = []
+        self.resume_state = None
 
     @property
     def training_set(self):
@@ -179,150 +371,387 @@ class LogisticRegression(Learner):
         # pylint: disable-msg=W0201
         self.__training_set = val
 
-    def gradient(self, model, challenges, responses, block_size=10**6):
+    def checkpoint_state(self):
+        """
+        Returns the state of the learner, consisting of the model weights, the model updater and the counters. If
+        called during learn(), e.g. from the checkpoint callback, the state allows to continue the interrupted call,
+        see restore. The training set is not part of the state.
+        :return: dict
+        """
+        updater = copy(self.updater)
+        if updater is not None:
+            # the model and the loss are rebound by learn()
+            updater.model = None
+            if isinstance(updater, self.LBFGSModelUpdate):
+                updater.loss = None
+        return dict(
+            weight_array=None if self.model is None else self.model.weight_array.copy(),
+            updater=deepcopy(updater),
+            learning=self.learning,
+            iteration_count=self.iteration_count,
+            epoch_count=self.epoch_count,
+            first_epoch=self.first_epoch,
+            gradient_step_count=self.gradient_step_count,
+            test_set_accuracies=list(self.test_set_accuracies),
+            test_set_dist=self.test_set_dist,
+        )
+
+    def restore(self, state):
+        """
+        Restores a state obtained by checkpoint_state. If the state was obtained during learn(), the next call of
+        learn() continues the interrupted call with the same model, updater, counters and order of examples, ignoring
+        its arguments. Otherwise, the updater and counters are restored, such that learning can be continued with
+        refresh_updater=False.
+        :param state: dict
+        """
+        self.updater = deepcopy(state['updater'])
+        self.epoch_count = state['epoch_count']
+        self.gradient_step_count = state['gradient_step_count']
+        self.test_set_dist = state['test_set_dist']
+        self.resume_state = state if state['learning'] else None
+
+    def features(self, challenges, k=None):
+        """
+        Computes the features the model is trained on, i.e. the transformed and, if the learner is bias-aware,
+        efba'ed sub-challenges.
+        :param challenges: array of shape (N, n)
+        :param k: number of sub-challenges to generate per challenge, defaults to the learner's k
+        :return: array of shape (N, k, n) or (N, k, n+1)
+        """
+        sub_challenges = self.transformation(array(challenges), k or self.k)
+        return LTFArray.efba_bit(sub_challenges) if self.bias else sub_challenges
+
+    def chain_major_features(self, challenges):
+        """
+        Computes the features of the given challenges in chain-major layout. To avoid holding two copies of the
+        features in memory, the challenges are transformed block by block.
+        :param challenges: array of shape (N, n)
+        :return: array of shape (k, N, n) or (k, N, n+1)
+        """
+        N = len(challenges)
+        features = None
+        for start in range(0, N, self.block_size):
+            block_features = self.features(challenges[start:start + self.block_size])
+            if features is None:
+                features = empty((self.k, N, block_features.shape[2]), dtype=block_features.dtype)
+            features[:, start:start + self.block_size] = swapaxes(block_features, 0, 1)
+        return features
+
+    def gather(self, challenges, indices, axis=0):
+        """
+        Gathers the examples with given indices along the given axis into a buffer that is reused for all gathers of
+        the same shape by the current thread. The result is hence only valid until the thread's next gather of the
+        same shape.
+        :param challenges: array of features or challenges
+        :param indices: array of int
+        :param axis: axis along which the examples are stored
+        :return: array of the same shape as challenges, except for the number of examples
+        """
+        shape = challenges.shape[:axis] + (len(indices),) + challenges.shape[axis + 1:]
+        key = (shape, challenges.dtype, get_ident())
+        if key not in self.buffers:
+            self.buffers[key] = empty(shape, dtype=challenges.dtype)
+        return challenges.take(indices, axis=axis, out=self.buffers[key], mode='clip')
+
+    def blocks(self, challenges, responses, block_size, transform=False, indices=None):
+        """
+        Iterates over the given examples in blocks of the given size.
+        If transform is True, the challenges are assumed to be raw challenges of shape (N, n) that will be read and
+        transformed into features block by block. Then, the next block is prepared on a background thread while the
+        current block is being processed.
+        Features of shape (N, 1, n[+1]) are shared among all chains and broadcast to (N, k, n[+1]) without copying.
+        If the learner uses chain-major layout, features are expected in shape (k, N, n[+1]) and blocks are taken
+        along the second axis.
+        If indices are given, only the examples with these indices are used, in the given order. They are then
+        gathered block by block.
+        :param challenges: features of shape (N, k, n[+1]) or (N, 1, n[+1]) or, if transform is True, raw challenges
+                           of shape (N, n)
+        :param responses: responses of shape (N,)
+        :param block_size: maximum number of examples per block
+        :param transform: bool
+        :param indices: None or array of int
+        :return: iterator of tuples (features, responses)
+        """
+        starts = self.block_starts(challenges, block_size, indices)
+        if not transform:
+            for start in starts:
+                yield self.block(challenges, responses, start, block_size, indices=indices)
+            return
+
+        def load(start):
+            # blocks are prefetched, hence buffers cannot be reused
+            return self.block(challenges, responses, start, block_size, True, indices, reuse_buffer=False)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            prefetched = None
+            for start in starts:
+                upcoming = executor.submit(load, start)
+                if prefetched:
+                    yield prefetched.result()
+                prefetched = upcoming
+            if prefetched:
+                yield prefetched.result()
+
+    def block_starts(self, challenges, block_size, indices=None):
+        """
+        Returns the positions of the blocks that the given examples are divided into.
+        :param challenges: features or challenges, as for blocks
+        :param block_size: maximum number of examples per block
+        :param indices: None or array of int
+        :return: range
+        """
+        return range(0, challenges.shape[1 if self.chain_major else 0] if indices is None else len(indices),
+                     block_size)
+
+    def block(self, challenges, responses, start, block_size, transform=False, indices=None, reuse_buffer=True):
+        """
+        Returns a single block of examples, see blocks.
+        :param challenges: features or challenges, as for blocks
+        :param responses: responses of shape (N,)
+        :param start: position of the first example of the block
+        :param block_size: maximum number of examples per block
+        :param transform: bool
+        :param indices: None or array of int
+        :param reuse_buffer: if True, gathered examples are stored in a buffer that is reused by the current thread
+        :return: tuple (features, responses)
+        """
+        axis = 1 if self.chain_major else 0
+        if indices is None:
+            block = slice(start, start + block_size)
+            block_challenges = challenges[:, block] if self.chain_major else challenges[block]
+            block_responses = responses[block]
+        else:
+            block_indices = indices[start:start + block_size]
+            block_challenges = self.gather(challenges, block_indices, axis) if reuse_buffer else \
+                challenges.take(block_indices, axis=axis)
+            block_responses = responses.take(block_indices)
+
+        if transform:
+            return self.features(block_challenges), array(block_responses)
+        if not self.chain_major and block_challenges.shape[1] == 1 < self.k:
+            block_challenges = broadcast_to(block_challenges, (len(block_challenges), self.k,
+                                                               block_challenges.shape[2]))
+        return block_challenges, block_responses
+
+    def test_set_distance(self, model, test_features):
+        """
+        Computes the distance of the model to the test set, like pypuf.tools.approx_dist_nonrandom, but on
+        precomputed test set features.
+        :param model: pypuf.simulation.arbiter_based.LTFArray
+        :param test_features: features of the test set challenges of shape (N, k, n) or (N, k, n+1)
+        :return: float
+        """
+        N = self.test_set.N
+        correct = 0
+        for start in range(0, N, self.block_size):
+            block = slice(start, start + self.block_size)
+            correct += count_nonzero(
+                sign(self.combiner(model.core_eval(test_features[block], float_type=self.float_type)))
+                == self.test_set.responses[block]
+            )
+        return (N - correct) / N
+
+    def combiner_derivative(self, combined_model_responses, model_responses):
+        """
+        Calculates the derivative of the combined responses with respect to the responses of all chains.
+        :param combined_model_responses: combined model responses of shape (N,)
+        :param model_responses: model responses of all chains of shape (N, k)
+        :return array of float of shape (N, k)
+        """
+        if isinstance(self.combiner, Combiner):
+            return self.combiner.derivative(combined_model_responses, model_responses)
+
+        raise Exception('No gradient function known for combiner %s' % self.combiner)
+
+    def gradient(self, model, challenges, responses, block_size=None, transform=False, indices=None):
         """
         Compute the gradient of the given model.
+        If the learner uses more than one worker, disjoint blocks are processed concurrently by a thread pool, each
+        yielding a partial gradient. The partial results are reduced in block order, such that the result does not
+        depend on the number of workers.
         :param model: pypuf.simulation.arbiter_based.LTFArray
         :param challenges: list of challenges to work on
         :param responses: list of responses to work on
-        :param block_size: the gradient will be computed in blocks of this size
+        :param block_size: the gradient will be computed in blocks of this size, defaults to the learner's block size
+        :param transform: if True, challenges are raw (N, n) challenges that are transformed block by block
+        :param indices: if given, the gradient is computed only on the examples with these indices
         :return: array of float
         """
+        block_size = block_size or self.block_size
+        block_num_total = ceil((len(responses) if indices is None else len(indices)) / block_size)
 
-        # define derivative depending on combiner function
-        def model_gradient_xor(_l, _combined_model_responses, _model_responses):
-            """
-            Caculates the gradient of the xored response at index l.
-            :param _l int
-                     Index for weight array and challange array.
-            :param _combined_model_responses: challenges to work on
-            :param _model_responses: responses to work on
-            :return array of float
-            """
-            #         Prod_i < w_i x_i >    /  < w_l x_l >          = Prod_(i \neq j)  < w_i x_i >
-            return _combined_model_responses / _model_responses[:, _l]
+        if self.workers > 1:
+            error_state = geterr()  # numpy's floating point error handling is thread-local
 
-        def model_gradient_ip_mod2(_l, _combined_model_responses, _model_responses):
-            """
-            Caculates the gradient of the ip_mod2 combined responses at index l.
-            :param _l int
-                     Index for weight array and challange array.
-            :param _combined_model_responses: challenges to work on
-            :param _model_responses: responses to work on
-            :return array of float
-            """
-            if _l % 2 == 0:  # for even l, the min operation takes place with the next value
-                neighbor = _model_responses[:, _l + 1]
-            else:  # for odd l, the min operation takes place with the previous value
-                neighbor = _model_responses[:, _l - 1]
+            def block_gradient(start):
+                with errstate(**error_state):
+                    return self.block_gradient(
+                        model, *self.block(challenges, responses, start, block_size, transform, indices)
+                    )
 
-            maximum = amax((_model_responses[:, _l], neighbor), 0)
+            # learn() keeps a thread pool, such that the gather buffers of its threads are reused
+            executor = self.executor or ThreadPoolExecutor(max_workers=self.workers)
+            try:
+                partial_results = list(executor.map(block_gradient,
+                                                    self.block_starts(challenges, block_size, indices)))
+            finally:
+                if executor is not self.executor:
+                    executor.shutdown()
+                    self.buffers = {key: buffer for key, buffer in self.buffers.items() if key[2] == get_ident()}
+        else:
+            partial_results = (
+                self.block_gradient(model, block_challenges, block_responses)
+                for block_challenges, block_responses in self.blocks(challenges, responses, block_size, transform,
+                                                                     indices)
+            )
 
-            return array([
-                0
-                if maximum[i] == neighbor[i] else
-                _combined_model_responses[i] / maximum[i]
-                for i in range(len(_model_responses))
-            ])
+        return self.reduce_gradient(partial_results, block_num_total)
 
+    def reduce_gradient(self, partial_results, block_num_total):
+        """
+        Sums up partial gradients in the given order and records the training set accuracy statistics and loss.
+        :param partial_results: iterable of tuples as returned by block_gradient
+        :param block_num_total: total number of blocks, used for logging only
+        :return: array of float
+        """
         result = zeros(shape=(self.k, self.n + 1 if self.bias else self.n))
         self.logger.debug(f'result shape {result.shape}, size {result.nbytes / 1024**3:.4f}GiB')
-        block_num = 0
-        block_num_total = ceil(len(challenges) / block_size)
         training_set_dist_sign = []
         training_set_dist = []
-        for start in range(0, len(challenges), block_size):
+        training_set_loss = 0
+        for block_num, (partial_gradient, block_dist_sign, block_dist, block_loss) in enumerate(partial_results):
             if block_num <= 10:
-                self.logger.debug(f'computing block {block_num} of {block_num_total} '
+                self.logger.debug(f'reduced block {block_num} of {block_num_total} '
                                   f'({block_num/block_num_total:.2f}) ...')
-            block_num += 1
-            block_challenges = challenges[start:start+block_size]
-            block_responses = responses[start:start+block_size]
-
-            # compute model responses
-            model_responses = model.core_eval(block_challenges)
-            combined_model_responses = self.combiner(model_responses)
-            combined_model_responses_sign = sign(combined_model_responses)
-            training_set_dist_sign.append(
-                count_nonzero(combined_model_responses_sign == block_responses) / len(block_responses)
-            )
-            training_set_dist.append(average(absolute(combined_model_responses - block_responses)) / 2)
-
-            # cap the absolute value of this to avoid overflow errors
-            max_response_abs_value = 50
-            max_response_abs_value_array = full(len(combined_model_responses), max_response_abs_value, dtype('float64'))
-            combined_model_responses = combined_model_responses_sign * minimum(max_response_abs_value_array,
-                                                                               np_abs(combined_model_responses))
-
-            # compute the derivative from
-            # the (-1,+1)-interval-sigmoid of combined model response on the all inputs
-            # and the training set responses
-            sigmoid_derivative = .5 * (2 / (1 + exp(-combined_model_responses)) - 1 - block_responses)
-            # equivalent to self.set.responses * (1 - 1/(1 + exp(-self.set.responses * combined_model_responses)))
-
-            # in a multiprocessing scenario the object references would not be the same!
-            if compare_functions(self.combiner, LTFArray.combiner_xor):
-                model_gradient = model_gradient_xor
-            elif compare_functions(self.combiner, LTFArray.combiner_ip_mod2):
-                model_gradient = model_gradient_ip_mod2
-            else:
-                raise Exception('No gradient function known for combiner %s' % self.combiner)
-
-            for l in range(self.k):
-                # sum over all challenges to the l-th Arbiter chain
-                # requires additional memory usage for intermediate results
-                gradient = sigmoid_derivative * model_gradient(l, combined_model_responses, model_responses)  # gradient
-                result[l] += dot(
-                    gradient,
-                    block_challenges[:, l]  # all challenges to the l-th Arbiter chain
-                )
+            result += partial_gradient
+            training_set_dist_sign.append(block_dist_sign)
+            training_set_dist.append(block_dist)
+            training_set_loss += block_loss
 
         self.training_set_dist = average(training_set_dist)
         self.training_set_dist_sign = average(training_set_dist_sign)
+        self.training_set_loss = training_set_loss
         return result
 
-    def learn(self, init_weight_array=None, eta_minus=0.5, eta_plus=1.2, refresh_updater=True):
+    def block_gradient(self, model, block_challenges, block_responses):
+        """
+        Compute the gradient of the given model on a single block of examples.
+        :param model: pypuf.simulation.arbiter_based.LTFArray
+        :param block_challenges: features of the block
+        :param block_responses: responses of the block
+        :return: tuple of the partial gradient, the training accuracy, the training distance and the logistic loss
+                 on this block
+        """
+        # compute model responses
+        model_responses = model.core_eval(block_challenges, chain_major=self.chain_major, float_type=self.float_type)
+        combined_model_responses = self.combiner(model_responses)
+        combined_model_responses_sign = sign(combined_model_responses)
+        block_dist_sign = count_nonzero(combined_model_responses_sign == block_responses) / len(block_responses)
+        block_dist = average(absolute(combined_model_responses - block_responses)) / 2
+
+        # the logistic loss summed over the block, whose derivative is computed below; it is computed before capping
+        # the combined responses, as the loss would be constant in the capped region otherwise
+        with errstate(under='ignore'):
+            block_loss = float(logaddexp(0, -block_responses * combined_model_responses).sum())
+
+        # cap the absolute value of this to avoid overflow errors
+        max_response_abs_value = 50
+        max_response_abs_value_array = full(len(combined_model_responses), max_response_abs_value, self.float_type)
+        combined_model_responses = combined_model_responses_sign * minimum(max_response_abs_value_array,
+                                                                           np_abs(combined_model_responses))
+
+        # compute the derivative from
+        # the (-1,+1)-interval-sigmoid of combined model response on the all inputs
+        # and the training set responses
+        sigmoid_derivative = .5 * (2 / (1 + exp(-combined_model_responses)) - 1 - block_responses)
+        # equivalent to self.set.responses * (1 - 1/(1 + exp(-self.set.responses * combined_model_responses)))
+
+        # sum over all challenges to each Arbiter chain in a single contraction, such that each block of
+        # features is read only once
+        gradient = sigmoid_derivative[:, None] * self.combiner_derivative(combined_model_responses, model_responses)
+        partial_gradient = einsum('nk,kni->ki' if self.chain_major else 'nk,nki->ki',
+                                  gradient.astype(self.float_type, copy=False), block_challenges,
+                                  dtype=self.float_type)
+        return partial_gradient, block_dist_sign, block_dist, block_loss
+
+    def prepare_features(self):
+        """
+        Prepares the features of the training set according to the learner's feature mode and stores them in
+        efba_sub_challenges.
+        """
+        self.logger.debug(f'Challenge bit type {self.training_set.challenges.dtype}')
+        if self.feature_mode == 'lazy':
+            self.logger.debug(f'Challenges will be transformed using {self.transformation.__name__} for k={self.k} '
+                              f'in blocks of {self.block_size}')
+            self.efba_sub_challenges = self.training_set.challenges
+        elif self.feature_mode == 'shared':
+            assert any(compare_functions(self.transformation, transformation)
+                       for transformation in (LTFArray.transform_id, LTFArray.transform_atf)), \
+                'Shared features are only supported for transformations that feed the same sub-challenge ' \
+                'into all chains.'
+            self.logger.debug(f'Transforming {len(self.training_set.challenges)} given {self.n}-bit challenges '
+                              f'using {self.transformation.__name__} once for all {self.k} chains')
+            self.efba_sub_challenges = self.features(self.training_set.challenges, k=1)
+        elif self.chain_major:
+            self.logger.debug(f'Transforming {len(self.training_set.challenges)} given {self.n}-bit '
+                              f'challenges using {self.transformation.__name__} for k={self.k} into chain-major '
+                              f'layout ...')
+            self.efba_sub_challenges = self.chain_major_features(self.training_set.challenges)
+        else:
+            self.logger.debug(f'Transforming {len(self.training_set.challenges)} given {self.n}-bit '
+                              f'challenges using {self.transformation.__name__} for k={self.k} ...')
+            transformed_challenges = self.transformation(self.training_set.challenges, self.k)
+            if self.bias:
+                self.logger.debug(f'Efba\'ing {len(self.training_set.challenges)} given {self.n}-bit challenges')
+                self.efba_sub_challenges = LTFArray.efba_bit(transformed_challenges)
+            else:
+                self.logger.debug(f'Not efba\'ing {len(self.training_set.challenges)} challenges, '
+                                  f'assuming unbiased target')
+                self.efba_sub_challenges = transformed_challenges
+
+    def learn(self, init_weight_array=None, eta_minus=0.5, eta_plus=1.2, refresh_updater=True, features=None):
         """
         Compute a model according to the given LTF Array parameters and training set.
         Note that this function can take long to return.
+        :param features: None or features of the training set as prepared by prepare_features, e.g. to share them
+                         with forked processes. If None, the features are prepared from the training set.
         :return: pypuf.simulation.arbiter_based.LTFArray
                  The computed model.
         """
         self.logger.debug('LR learner started')
-        test_set_accuracies = []
+        resume, self.resume_state = self.resume_state, None
+        if not resume:
+            self.test_set_dist = -1
+        self.test_set_accuracies = test_set_accuracies = list(resume['test_set_accuracies']) if resume else []
 
         # log format
         def log_state(step_size):
             """
             This method is used to log a snapshot of learning variables while running.
             """
-            if self.logger is None:
+            if self.logger is None or not self.log_every_steps or self.gradient_step_count % self.log_every_steps:
                 return
             self.logger.debug(
-                '%i\t%s\t%f\t%f\t%f\t%s' % (
+                '%i\t%s\t%f\t%f\t%f%s' % (
                     self.iteration_count,
                     f'{self.test_set_dist:.4f}' if self.test_set else '<no test set given>',
                     self.training_set_dist_sign,
                     self.training_set_dist,
                     step_size,
-                    ','.join(map(str, model.weight_array.flatten())) if self.n <= 1024 else '<weight array too large>',
+                    '' if not self.log_weights else '\t' + (
+                        ','.join(map(str, model.weight_array.flatten())) if self.n <= 1024
+                        else '<weight array too large>'
+                    ),
                 )
             )
 
         # let numpy raise exceptions
         seterr(all='raise')
 
-        # Prepare challenges
-        self.logger.debug(f'Challenge bit type {self.training_set.challenges.dtype}')
-        self.logger.debug(f'Transforming {len(self.training_set.challenges)} given {self.n}-bit '
-                          f'challenges using {self.transformation.__name__} for k={self.k} ...')
-        transformed_challenges = self.transformation(self.training_set.challenges, self.k)
-        if self.bias:
-            self.logger.debug(f'Efba\'ing {len(self.training_set.challenges)} given {self.n}-bit challenges')
-            self.efba_sub_challenges = LTFArray.efba_bit(transformed_challenges)
+        if features is None:
+            self.prepare_features()
         else:
-            self.logger.debug(f'Not efba\'ing {len(self.training_set.challenges)} challenges, assuming unbiased target')
-            self.efba_sub_challenges = transformed_challenges
+            self.efba_sub_challenges = features
 
         # we start with a random model
         self.logger.debug(f'Initializing random unbiased model')
@@ -336,73 +765,451 @@ class LogisticRegression(Learner):
 
         if init_weight_array is not None:
             model.weight_array = init_weight_array
+        if resume:
+            model.weight_array = resume['weight_array'].copy()
+        self.model = model
 
-        if refresh_updater:
+        # transform the test set once, model bias is only included if the model actually has a bias
+        test_features = None
+        if self.test_set and self.test_set.N:
+            test_features = self.transformation(self.test_set.challenges, self.k)
+            if self.bias or (model.weight_array[:, -1] != 0).any():
+                test_features = LTFArray.efba_bit(test_features)
+        last_test_step, last_test_time = self.gradient_step_count, time()
+
+        if resume:
+            self.updater = deepcopy(resume['updater'])
+        elif refresh_updater and self.optimizer == 'lbfgs':
+            self.updater = self.LBFGSModelUpdate(model, lambda: self.training_set_loss, bias=self.bias)
+        elif refresh_updater:
             self.updater = self.RPropModelUpdate(model, bias=self.bias, eta_minus=eta_minus, eta_plus=eta_plus)
+        else:
+            self.updater.restart()
+        self.updater.model = model
+        if isinstance(self.updater, self.LBFGSModelUpdate):
+            self.updater.loss = lambda: self.training_set_loss
         converged = False
-        self.iteration_count = 0
+        self.learning = True
+        self.iteration_count = resume['iteration_count'] if resume else 0
+        self.first_epoch = resume['first_epoch'] if resume else self.epoch_count
         log_state(0)
         number_of_batches = ceil(self.training_set.N / (self.minibatch_size or self.training_set.N))
         self.logger.debug(f'using {self.training_set.N} examples with batches of size '
                           f'{self.minibatch_size}, i.e. {number_of_batches} batches')
-        efba_challenge_batches = []
-        response_batches = []
-        if not self.shuffle:
-            efba_challenge_batches = array_split(self.efba_sub_challenges, number_of_batches)
-            response_batches = array_split(self.training_set.responses, number_of_batches)
-
-        self.logger.debug(f'Starting learning loop!')
-        self.logger.debug(f'stopping when step size smaller than {10**-self.convergence_decimals} or '
-                          f'{self.iteration_limit} epochs')
-        while not converged and self.iteration_count < self.iteration_limit:
-            self.iteration_count += 1
-            self.epoch_count += 1
-
+        processes = self.processes
+        if processes > 1 and current_process().daemon:
+            # daemonic processes, e.g. the workers of the Experimenter, are not allowed to have children
+            self.logger.warning('Cannot start worker processes from a daemonic process, computing the gradient in '
+                                'this process instead.')
+            processes = 1
+        pool = GradientProcessPool(self, processes) if processes > 1 else None
+        self.executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 and not pool else None
+        efba_challenge_batches, response_batches = None, None
+        try:
             if self.shuffle:
-                if self.epoch_count > 1:
-                    RandomState(seed=self.epoch_count).shuffle(self.efba_sub_challenges)
-                    RandomState(seed=self.epoch_count).shuffle(self.training_set.responses)
-                efba_challenge_batches = array_split(self.efba_sub_challenges, number_of_batches)
+                # instead of moving the examples around, the examples are visited in the order given by an index array
+                # that is permuted each epoch; the examples of each minibatch are then gathered block by block
+                order = arange(self.training_set.N)
+                for epoch in range(max(self.first_epoch + 1, 2), self.epoch_count + 1):
+                    # when resuming, replay the permutations of the epochs that were already done
+                    order = order[RandomState(seed=epoch).permutation(self.training_set.N)]
+                efba_challenge_batches = [self.efba_sub_challenges] * number_of_batches
+                response_batches = [self.training_set.responses] * number_of_batches
+            else:
+                order = None
+                efba_challenge_batches = array_split(self.efba_sub_challenges, number_of_batches,
+                                                     axis=1 if self.chain_major else 0)
                 response_batches = array_split(self.training_set.responses, number_of_batches)
+            index_batches = [None] * number_of_batches
+
+            self.logger.debug(f'Starting learning loop!')
+            self.logger.debug(f'stopping when step size smaller than {10**-self.convergence_decimals} or '
+                              f'{self.iteration_limit} epochs')
+            while not converged and self.iteration_count < self.iteration_limit:
+                self.iteration_count += 1
+                self.epoch_count += 1
+
+                if self.shuffle:
+                    if self.epoch_count > 1:
+                        order = order[RandomState(seed=self.epoch_count).permutation(self.training_set.N)]
+                    index_batches = array_split(order, number_of_batches)
+                    if pool:
+                        pool.set_order(order)
+
+                # compute gradient & update model
+                for batch in range(number_of_batches):
+                    if pool:
+                        gradient = pool.gradient(model, *pool.batch_bounds(number_of_batches, batch))
+                    else:
+                        gradient = self.gradient(model, efba_challenge_batches[batch], response_batches[batch],
+                                                 transform=self.feature_mode == 'lazy', indices=index_batches[batch])
+                    if self.bias:
+                        model.weight_array += self.updater.update(gradient)
+                    else:
+                        model.weight_array[:, :-1] += self.updater.update(gradient)
+                    self.gradient_step_count += 1
+
+                    # check convergence, the test set criteria apply only to steps that evaluated the test set
+                    if isinstance(self.updater, self.LBFGSModelUpdate):
+                        current_step_size = self.updater.direction_norm
+                    else:
+                        current_step_size = norm(self.updater.step)
+                    test_accuracy = nan
+                    tested = test_features is not None and (
+                        (self.test_every_steps and self.gradient_step_count - last_test_step >= self.test_every_steps)
+                        or (self.test_every_seconds and time() - last_test_time >= self.test_every_seconds)
+                    )
+                    if tested:
+                        self.test_set_dist = self.test_set_distance(model, test_features)
+                        test_set_accuracies.append(1 - self.test_set_dist)
+                        test_accuracy = test_set_accuracies[-1]
+                        last_test_step, last_test_time = self.gradient_step_count, time()
+                    converged = (
+                        current_step_size < 10**-self.convergence_decimals
+                        or (tested and self.target_test_accuracy and 1 - self.test_set_dist > self.target_test_accuracy)
+                        or (
+                            tested
+                            and self.test_accuracy_improvement
+                            and self.test_accuracy_patience
+                            and len(test_set_accuracies) >= self.test_accuracy_patience
+                            and (
+                                abs(
+                                    min(test_set_accuracies[-self.test_accuracy_patience:])
+                                    - max(test_set_accuracies[-self.test_accuracy_patience:])
+                                ) < self.test_accuracy_improvement
+                            )
+                        )
+                    ) and (
+                        self.iteration_count > self.min_iterations
+                    )
+
+                    # log
+                    log_state(current_step_size)
+                    if self.trace:
+                        self.trace.record(
+                            step=self.gradient_step_count,
+                            epoch=self.iteration_count,
+                            step_size=current_step_size,
+                            training_accuracy=self.training_set_dist_sign,
+                            test_accuracy=test_accuracy,
+                            loss=nan if self.training_set_loss is None else self.training_set_loss,
+                            weights=model.weight_array,
+                        )
+
+                    if converged:
+                        break
+
+                if self.checkpoint and not converged:
+                    self.checkpoint()
+        finally:
+            if pool:
+                # the shared memory can only be released once no views of it are left
+                efba_challenge_batches, response_batches = None, None
+                pool.close()
+            if self.executor:
+                self.executor.shutdown()
+                self.executor = None
+            self.buffers = {}
+        if self.trace:
+            self.trace.flush()
+        self.efba_sub_challenges = None  # del ref to training set memory to allow GC if the t-set is also dereferenced
+        self.converged = converged
+        self.learning = False
+        return model
+
+
+class MultiStartLogisticRegression(LogisticRegression):
+    """
+    Learn an LTF Array with Logistic Regression from several random initializations at once.
+
+    All restarts are trained on the same training set, which is passed over only once per gradient step for all
+    restarts. Restarts that converged or that are considered hopeless are retired and do not take part in further
+    gradient computations.
+    """
+
+    def __init__(self, t_set: ChallengeResponseSet, n, k, restarts, hopeless_iterations=None, hopeless_accuracy=.6,
+                 **kwargs):
+        """
+        Initialize a multi-start LTF Array Logistic Regression Learner. For further parameters, see
+        LogisticRegression.
+        :param restarts: int. Number of models that are trained simultaneously. The initial model of the r-th
+                         restart is the r-th draw from weights_prng.
+        :param hopeless_iterations: None or int. If given, restarts whose training set accuracy is below
+                                    hopeless_accuracy after this many iterations are retired.
+        :param hopeless_accuracy: float
+        :raises ValueError: if test_set, trace, checkpoint, workers or processes are given, which multi-start learning
+                            does not support.
+        """
+        super().__init__(t_set, n, k, **kwargs)
+        unsupported = [name for name in ('test_set', 'trace', 'checkpoint') if getattr(self, name) is not None] + \
+            [name for name in ('workers', 'processes') if getattr(self, name) > 1]
+        if unsupported:
+            raise ValueError('Multi-start learning does not support %s.' % ', '.join(unsupported))
+        assert not self.chain_major, 'Multi-start learning does not support chain-major layout.'
+        assert self.optimizer == 'rprop', 'Multi-start learning supports RPROP only.'
+        self.restarts = restarts
+        self.hopeless_iterations = hopeless_iterations
+        self.hopeless_accuracy = hopeless_accuracy
+        self.models = []
+        self.restart_converged = zeros(restarts, dtype=bool)
+        self.restart_iteration_counts = zeros(restarts, dtype=int)
+        self.restart_accuracies = zeros(restarts)
+
+    def multi_gradient(self, weights, challenges, responses, block_size=None, transform=False, indices=None):
+        """
+        Compute the gradients of several models in a single pass over the training set.
+        :param weights: array of shape (R, k, n+1), weights of R models
+        :param challenges: list of challenges to work on
+        :param responses: list of responses to work on
+        :param block_size: the gradient will be computed in blocks of this size, defaults to the learner's block size
+        :param transform: if True, challenges are raw (N, n) challenges that are transformed block by block
+        :param indices: if given, the gradients are computed only on the examples with these indices
+        :return: tuple of gradients of shape (R, k, n[+1]) and training set accuracies of shape (R,)
+        """
+        R = len(weights)
+        weights = weights if self.bias else weights[:, :, :-1]
+        result = zeros(shape=weights.shape)
+        correct = zeros(R)
+        block_size = block_size or self.block_size
+        for block_challenges, block_responses in self.blocks(challenges, responses, block_size, transform, indices):
+            N = len(block_responses)
+
+            # compute the delays of all chains of all models in a single contraction
+            model_responses = einsum('nki,rki->nrk', block_challenges, weights.astype(self.float_type, copy=False),
+                                     optimize=True).reshape(N * R, self.k)
+            combined_model_responses = self.combiner(model_responses)
+            correct += count_nonzero(sign(combined_model_responses).reshape(N, R) == block_responses[:, None], axis=0)
+
+            # cap the absolute value of this to avoid overflow errors
+            capped_responses = sign(combined_model_responses) * minimum(50, np_abs(combined_model_responses))
+            sigmoid_derivative = .5 * (2 / (1 + exp(-capped_responses.reshape(N, R))) - 1 - block_responses[:, None])
+            gradient = sigmoid_derivative[:, :, None] * self.combiner_derivative(
+                capped_responses, model_responses).reshape(N, R, self.k)
+            result += einsum('nrk,nki->rki', gradient.astype(self.float_type, copy=False), block_challenges,
+                             dtype=self.float_type)
+
+        return result, correct / (len(responses) if indices is None else len(indices))
+
+    def learn(self, init_weight_array=None, eta_minus=0.5, eta_plus=1.2, refresh_updater=True):
+        """
+        Compute models for all restarts according to the given LTF Array parameters and training set.
+        Note that this function can take long to return.
+        :param init_weight_array: None or array of shape (k, n+1) or (R, k, n+1) of initial weights
+        :return: pypuf.simulation.arbiter_based.LTFArray
+                 The model with the highest training set accuracy. All models are stored in self.models.
+        """
+        self.logger.debug(f'Multi-start LR learner started with {self.restarts} restarts')
+        seterr(all='raise')
+        self.prepare_features()
+
+        R, N = self.restarts, self.training_set.N
+        weights = zeros((R, self.k, self.n + 1))
+        for r in range(R):
+            weights[r, :, :-1] = LTFArray.normal_weights(self.n, self.k, self.weights_mu, self.weights_sigma,
+                                                         self.weights_prng)
+        if init_weight_array is not None:
+            weights[:] = init_weight_array
+
+        if refresh_updater:
+            template = LTFArray(weights[0, :, :-1], self.transformation, self.combiner)
+            self.updater = self.RPropModelUpdate(template, bias=self.bias, eta_minus=eta_minus, eta_plus=eta_plus,
+                                                 restarts=R)
+
+        active = ones(R, dtype=bool)
+        self.restart_converged = zeros(R, dtype=bool)
+        self.restart_iteration_counts = zeros(R, dtype=int)
+        self.restart_accuracies = zeros(R)
+        self.iteration_count = 0
+        number_of_batches = ceil(N / (self.minibatch_size or N))
+        order = arange(N)
+
+        while active.any() and self.iteration_count < self.iteration_limit:
+            self.iteration_count += 1
+            self.epoch_count += 1
+            if self.shuffle and self.epoch_count > 1:
+                order = order[RandomState(seed=self.epoch_count).permutation(N)]
+            index_batches = array_split(order, number_of_batches)
 
-            # compute gradient & update model
             for batch in range(number_of_batches):
-                gradient = self.gradient(model, efba_challenge_batches[batch], response_batches[batch])
+                gradient = zeros(self.updater.step.shape)
+                gradient[active], self.restart_accuracies[active] = self.multi_gradient(
+                    weights[active], self.efba_sub_challenges, self.training_set.responses,
+                    transform=self.feature_mode == 'lazy', indices=index_batches[batch],
+                )
+                # retired restarts have zero gradient and hence take zero steps
                 if self.bias:
-                    model.weight_array += self.updater.update(gradient)
+                    weights += self.updater.update(gradient)
                 else:
-                    model.weight_array[:, :-1] += self.updater.update(gradient)
+                    weights[:, :, :-1] += self.updater.update(gradient)
                 self.gradient_step_count += 1
 
-                # check convergence
-                current_step_size = norm(self.updater.step)
-                if self.test_set and self.test_set.N:
-                    self.test_set_dist = approx_dist_nonrandom(model, self.test_set)
-                    test_set_accuracies.append(1 - self.test_set_dist)
-                converged = (
-                    current_step_size < 10**-self.convergence_decimals
-                    or (self.target_test_accuracy and 1 - self.test_set_dist > self.target_test_accuracy)
-                    or (
-                        self.test_accuracy_improvement
-                        and self.test_accuracy_patience
-                        and len(test_set_accuracies) >= self.test_accuracy_patience
-                        and (
-                            abs(
-                                min(test_set_accuracies[-self.test_accuracy_patience:])
-                                - max(test_set_accuracies[-self.test_accuracy_patience:])
-                            ) < self.test_accuracy_improvement
-                        )
+                # check convergence of each restart
+                step_sizes = norm(self.updater.step.reshape(R, -1), axis=1)
+                converged = active & (step_sizes < 10**-self.convergence_decimals) & \
+                    (self.iteration_count > self.min_iterations)
+                hopeless = active & (self.restart_accuracies < self.hopeless_accuracy) if \
+                    self.hopeless_iterations and self.iteration_count >= self.hopeless_iterations else \
+                    zeros(R, dtype=bool)
+                self.restart_converged |= converged
+                self.restart_iteration_counts[active] = self.iteration_count
+                active &= ~(converged | hopeless)
+
+                self.logger.debug(
+                    '%i\t%i\t%s' % (
+                        self.iteration_count,
+                        count_nonzero(active),
+                        ','.join(f'{accuracy:.4f}' for accuracy in self.restart_accuracies),
                     )
-                ) and (
-                    self.iteration_count > self.min_iterations
                 )
+                if not active.any():
+                    break
+
+        self.efba_sub_challenges = None  # del ref to training set memory to allow GC if the t-set is also dereferenced
+        self.buffers = {}
+        self.models = [
+            LTFArray(weight_array=weights[r, :, :-1], transform=self.transformation, combiner=self.combiner,
+                     bias=weights[r, :, -1:])
+            for r in range(R)
+        ]
+        best = int(argmax(self.restart_accuracies))
+        self.converged = self.restart_converged[best]
+        self.training_set_dist_sign = self.restart_accuracies[best]
+        return self.models[best]
+
 
-                # log
-                log_state(current_step_size)
+class BatchedLogisticRegression(LogisticRegression):
+    """
+    Learn several LTF Arrays with Logistic Regression on independent training sets at once.
 
-                if converged:
+    All problems must have the same n, k and training set size N. The features of all problems are stacked into a
+    single array of shape (B, N, k, n) and all B RPROP optimizations run in lockstep, i.e. each gradient step is
+    computed for all problems in a few large operations. Problems that converged are retired and do not take part in
+    further gradient computations. This avoids the per-iteration overhead that dominates the run time of small
+    problems.
+    """
+
+    def __init__(self, t_sets, n, k, weights_prngs=None, **kwargs):
+        """
+        Initialize a batched LTF Array Logistic Regression Learner. For further parameters, see LogisticRegression.
+        :param t_sets: list of B training sets of equal size
+        :param weights_prngs: None or list of B PRNGs to draw the initial models from. If None, all initial models
+                              are drawn from weights_prng in order.
+        """
+        super().__init__(t_sets[0], n, k, **kwargs)
+        assert all(t_set.N == self.training_set.N for t_set in t_sets), 'All training sets must have the same size.'
+        assert self.feature_mode == 'eager' and not self.chain_major, 'Batched learning requires eager features.'
+        assert self.optimizer == 'rprop', 'Batched learning supports RPROP only.'
+        assert not self.test_set, 'Batched learning does not support test sets.'
+        self.training_sets = t_sets
+        self.weights_prngs = weights_prngs or [self.weights_prng] * len(t_sets)
+        self.models = []
+        self.problem_converged = zeros(len(t_sets), dtype=bool)
+        self.problem_iteration_counts = zeros(len(t_sets), dtype=int)
+        self.problem_gradient_step_counts = zeros(len(t_sets), dtype=int)
+        self.problem_accuracies = zeros(len(t_sets))
+
+    def batch_gradient(self, weights, features, responses):
+        """
+        Compute the gradients of several models, each on its own training set.
+        :param weights: array of shape (B, k, n[+1]), weights of B models
+        :param features: array of shape (B, N, k, n[+1]), features of the B training sets
+        :param responses: array of shape (B, N), responses of the B training sets
+        :return: tuple of gradients of shape (B, k, n[+1]) and training set accuracies of shape (B,)
+        """
+        B, N = responses.shape
+        model_responses = einsum('bnki,bki->bnk', features, weights.astype(self.float_type, copy=False),
+                                 optimize=True).reshape(B * N, self.k)
+        combined_model_responses = self.combiner(model_responses)
+        accuracies = count_nonzero(sign(combined_model_responses).reshape(B, N) == responses, axis=1) / N
+
+        # cap the absolute value of this to avoid overflow errors
+        capped_responses = sign(combined_model_responses) * minimum(50, np_abs(combined_model_responses))
+        sigmoid_derivative = .5 * (2 / (1 + exp(-capped_responses.reshape(B, N))) - 1 - responses)
+        gradient = sigmoid_derivative[:, :, None] * self.combiner_derivative(
+            capped_responses, model_responses).reshape(B, N, self.k)
+        return einsum('bnk,bnki->bki', gradient.astype(self.float_type, copy=False), features,
+                      dtype=self.float_type), accuracies
+
+    def learn(self, init_weight_array=None, eta_minus=0.5, eta_plus=1.2, refresh_updater=True):
+        """
+        Compute models for all problems according to the given LTF Array parameters and training sets.
+        Note that this function can take long to return.
+        :param init_weight_array: None or array of shape (k, n+1) or (B, k, n+1) of initial weights
+        :return: list of pypuf.simulation.arbiter_based.LTFArray
+                 The computed models, which are also stored in self.models.
+        """
+        self.logger.debug(f'Batched LR learner started with {len(self.training_sets)} problems')
+        seterr(all='raise')
+
+        B, N = len(self.training_sets), self.training_set.N
+        features = array([self.features(t_set.challenges) for t_set in self.training_sets], dtype=self.float_type)
+        responses = array([t_set.responses for t_set in self.training_sets])
+        weights = zeros((B, self.k, self.n + 1))
+        for b in range(B):
+            weights[b, :, :-1] = LTFArray.normal_weights(self.n, self.k, self.weights_mu, self.weights_sigma,
+                                                         self.weights_prngs[b])
+        if init_weight_array is not None:
+            weights[:] = init_weight_array
+
+        if refresh_updater:
+            template = LTFArray(weights[0, :, :-1], self.transformation, self.combiner)
+            self.updater = self.RPropModelUpdate(template, bias=self.bias, eta_minus=eta_minus, eta_plus=eta_plus,
+                                                 restarts=B)
+
+        active = ones(B, dtype=bool)
+        self.problem_converged = zeros(B, dtype=bool)
+        self.problem_iteration_counts = zeros(B, dtype=int)
+        self.problem_gradient_step_counts = zeros(B, dtype=int)
+        self.problem_accuracies = zeros(B)
+        self.iteration_count = 0
+        number_of_batches = ceil(N / (self.minibatch_size or N))
+        order = arange(N)
+
+        while active.any() and self.iteration_count < self.iteration_limit:
+            self.iteration_count += 1
+            self.epoch_count += 1
+            if self.shuffle and self.epoch_count > 1:
+                order = order[RandomState(seed=self.epoch_count).permutation(N)]
+            index_batches = array_split(order, number_of_batches)
+
+            for batch in range(number_of_batches):
+                # only gather the examples of the minibatch and the problems still active if necessary
+                batch_features, batch_responses = features, responses
+                if number_of_batches > 1:
+                    batch_features = features[:, index_batches[batch]]
+                    batch_responses = responses[:, index_batches[batch]]
+                if not active.all():
+                    batch_features, batch_responses = batch_features[active], batch_responses[active]
+
+                gradient = zeros(self.updater.step.shape)
+                gradient[active], self.problem_accuracies[active] = self.batch_gradient(
+                    weights[active] if self.bias else weights[active, :, :-1], batch_features, batch_responses,
+                )
+                # retired problems have zero gradient and hence take zero steps
+                if self.bias:
+                    weights += self.updater.update(gradient)
+                else:
+                    weights[:, :, :-1] += self.updater.update(gradient)
+                self.gradient_step_count += 1
+                self.problem_gradient_step_counts[active] += 1
+                self.problem_iteration_counts[active] = self.iteration_count
+
+                # check convergence of each problem
+                step_sizes = norm(self.updater.step.reshape(B, -1), axis=1)
+                converged = active & (step_sizes < 10**-self.convergence_decimals) & \
+                    (self.iteration_count > self.min_iterations)
+                self.problem_converged |= converged
+                active &= ~converged
+
+                self.logger.debug(f'{self.iteration_count}\t{count_nonzero(active)}')
+                if not active.any():
                     break
 
-        self.efba_sub_challenges = None  # del ref to training set memory to allow GC if the t-set is also dereferenced
-        self.converged = converged
-        return model
+        self.buffers = {}
+        self.models = [
+            LTFArray(weight_array=weights[b, :, :-1], transform=self.transformation, combiner=self.combiner,
+                     bias=weights[b, :, -1:])
+            for b in range(B)
+        ]
+        self.converged = self.problem_converged.all()
+        return self.models
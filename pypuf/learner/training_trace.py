@@ -0,0 +1,133 @@
+"""
+This module provides a structured, binary record of the progress of iterative learners. Instead of formatting the
+learner's state into a log message on every step, the learner records a few numbers per step into a preallocated
+ring buffer, which is periodically flushed into a numpy .npz archive.
+"""
+from math import ceil
+from time import time
+from zipfile import ZipFile, ZIP_STORED
+
+from numpy import full, empty, nan, int64, float64, concatenate, roll, load as np_load
+from numpy.lib.format import write_array
+
+
+class TrainingTrace:
+    """
+    Records step number, epoch, time, step size, loss, training and test accuracy of each step of a learner and,
+    optionally, snapshots of the model weights every few steps.
+
+    If a path is given, the buffer is flushed to the .npz archive at this path whenever it is full, at least every
+    flush_seconds seconds if given, and when the learner finishes. Each flush appends one part per field to the
+    archive, use TrainingTrace.load to obtain the complete trace. Without a path, the buffer keeps the most recent
+    records only.
+    """
+
+    FIELDS = [
+        ('step', int64),
+        ('epoch', int64),
+        ('time', float64),
+        ('step_size', float64),
+        ('loss', float64),
+        ('training_accuracy', float64),
+        ('test_accuracy', float64),
+    ]
+
+    def __init__(self, path=None, capacity=10**4, weights_every=None, flush_seconds=None):
+        """
+        :param path: None or str. Path of the .npz archive the trace is written to.
+        :param capacity: int. Number of steps that are held in memory.
+        :param weights_every: None or int. If given, the model weights are recorded every this many steps.
+        :param flush_seconds: None or float. If given, the buffer is flushed if this many seconds passed since the
+                              last flush.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.weights_every = weights_every
+        self.weights_capacity = ceil(capacity / weights_every) if weights_every else 0
+        self.flush_seconds = flush_seconds
+        self.buffers = {field: full(capacity, nan if field_type is float64 else -1, field_type)
+                        for field, field_type in self.FIELDS}
+        self.weights = None
+        self.weights_step = empty(self.weights_capacity, int64)
+        self.count = 0
+        self.weights_count = 0
+        self.parts = 0
+        self.start_time = self.last_flush_time = time()
+
+    def record(self, step, epoch, step_size, training_accuracy, test_accuracy=nan, loss=nan, weights=None):
+        """
+        Records the state of the learner after a step.
+        :param step: int. Number of the gradient step.
+        :param epoch: int. Number of the epoch.
+        :param step_size: float
+        :param training_accuracy: float
+        :param test_accuracy: float, nan if the test accuracy was not evaluated in this step
+        :param loss: float, nan if not available
+        :param weights: None or array of float. Model weights, recorded if the step is a multiple of weights_every.
+        """
+        position = self.count % self.capacity
+        values = dict(step=step, epoch=epoch, time=time() - self.start_time, step_size=step_size, loss=loss,
+                      training_accuracy=training_accuracy, test_accuracy=test_accuracy)
+        for field, _ in self.FIELDS:
+            self.buffers[field][position] = values[field]
+
+        if self.weights_every and weights is not None and step % self.weights_every == 0:
+            if self.weights is None:
+                self.weights = empty((self.weights_capacity,) + weights.shape, weights.dtype)
+            weights_position = self.weights_count % self.weights_capacity
+            self.weights[weights_position] = weights
+            self.weights_step[weights_position] = step
+            self.weights_count += 1
+
+        self.count += 1
+        if self.path and (
+                self.count == self.capacity
+                or self.weights_count == self.weights_capacity > 0
+                or (self.flush_seconds and time() - self.last_flush_time >= self.flush_seconds)
+        ):
+            self.flush()
+
+    def records(self):
+        """
+        Returns the records held in memory, i.e. the records since the last flush, in order of recording.
+        :return: dict mapping field names to arrays, including 'weights' and 'weights_step' if weights are recorded
+        """
+        def ordered(buffer, count, capacity):
+            if count <= capacity:
+                return buffer[:count].copy()
+            return roll(buffer, -(count % capacity), axis=0)
+
+        result = {field: ordered(self.buffers[field], self.count, self.capacity) for field, _ in self.FIELDS}
+        if self.weights is not None:
+            result['weights'] = ordered(self.weights, self.weights_count, self.weights_capacity)
+            result['weights_step'] = ordered(self.weights_step, self.weights_count, self.weights_capacity)
+        return result
+
+    def flush(self):
+        """
+        Appends the records held in memory to the archive and empties the buffer. Does nothing if no path is given.
+        """
+        if not self.path or not self.count:
+            return
+        with ZipFile(self.path, mode='a' if self.parts else 'w', compression=ZIP_STORED, allowZip64=True) as archive:
+            for field, records in self.records().items():
+                with archive.open('%s.%05i.npy' % (field, self.parts), mode='w', force_zip64=True) as file:
+                    write_array(file, records, allow_pickle=False)
+        self.parts += 1
+        self.count = 0
+        self.weights_count = 0
+        self.last_flush_time = time()
+
+    @staticmethod
+    def load(path):
+        """
+        Loads a trace written by TrainingTrace.
+        :param path: str. Path of the .npz archive.
+        :return: dict mapping field names to arrays
+        """
+        parts = {}
+        with np_load(path) as archive:
+            for name in sorted(archive.files):
+                field, _ = name.rsplit('.', 1)
+                parts.setdefault(field, []).append(archive[name])
+        return {field: concatenate(field_parts) for field, field_parts in parts.items()}
@@ -6,6 +6,8 @@ from numpy import min as np_min
 from numpy import max as np_max
 from numpy import sum as np_sum
 
+from pypuf.tools import pack_responses, popcount
+
 
 class PropertyTest(object):
     """
@@ -117,13 +119,12 @@ class PropertyTest(object):
                  Uniqueness in percent.
         """
         # If we get simulations with response length > 1 then change response extraction.
-        responses = array([instance.eval(challenge)[0] for instance in instances])
+        responses = pack_responses(array([instance.eval(challenge)[0] for instance in instances]))
         m = len(instances)
-        distance_sum = 0
-        for u in range(m - 1):
-            for v in range(u + 1, m):
-                # If we get simulations with response length > 1 then change the calculation of the distance.
-                distance_sum = distance_sum + (responses[u] != responses[v])
+        # Each pair of instances with unequal responses consists of one instance with response -1
+        # and one with response +1.
+        weight = popcount(responses)
+        distance_sum = weight * (m - weight)
         # Arithmetic mean of the sum of response distances
         return 2 / (m * (m - 1)) * distance_sum
 
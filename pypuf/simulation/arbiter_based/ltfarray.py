@@ -2,8 +2,9 @@
 This module provides several different implementations of arbiter PUF simulations. The linear threshold function array
 model is the core of each simulation class.
 """
-from numpy import prod, shape, sign, array, transpose, concatenate, swapaxes, sqrt, amax, append, empty, ceil
-from numpy import sum as np_sum, ones, ndarray, zeros, reshape, broadcast_to, einsum
+from numpy import prod, shape, sign, array, transpose, concatenate, swapaxes, sqrt, append, empty, ceil
+from numpy import sum as np_sum, ones, ndarray, zeros, reshape, broadcast_to, einsum, maximum, divide, partition, \
+    argpartition, arange
 from numpy.random import RandomState
 
 from pypuf import tools
@@ -47,41 +48,145 @@ class CompoundTransformation:
         return self.build().__name__
 
 
-class LTFArray(Simulation):
+class Combiner:
     """
-    Class that simulates k LTFs with n bits and a constant term each
-    and constant bias added.
+    Combines the responses of the k chains of an LTF array into a single response.
+    Combiners are called like functions on an array of chain responses. For learning, they additionally provide the
+    derivative of the combined response with respect to the response of each chain.
     """
 
-    @classmethod
-    def combiner_xor(cls, responses):
+    # name of the combiner like the name of a combiner function, i.e. the name of the LTFArray attribute
+    NAME = 'combiner'
+
+    def __call__(self, responses):
         """
-        combines output responses with the XOR operation
-        :param responses: Array of int of float with shape(N,k,n)
-                          An Array with a number of vectors of single LTF results
-        :return: array of float or int shape(N)
-                 Array of responses for the N different challenges.
+        Combines the chain responses.
+        :param responses: array of float or int of shape (..., k)
+        :return: array of float or int of shape (...)
         """
-        return prod(responses, axis=1)
+        raise NotImplementedError()
 
-    @classmethod
-    def combiner_ip_mod2(cls, responses):
+    def derivative(self, combined_responses, responses):
         """
-        combines output responses with the inner product mod 2 operation
-        :param responses: a array with a number of vectors of single LTF results
-        :return: array of float or int shape(N)
-                 Array of responses for the N different challenges.
+        Computes the derivative of the combined responses with respect to the response of each chain.
+        :param combined_responses: array of float of shape (N,), as computed by this combiner from responses
+        :param responses: array of float of shape (N, k)
+        :return: array of float of shape (N, k)
         """
-        n = len(responses[0])
-        assert n % 2 == 0, 'IP mod 2 is only defined for even n.'
-        return prod(
-            transpose(
-                [
-                    amax((responses[:, i], responses[:, i + 1]), 0)
-                    for i in range(0, n, 2)
-                ]),
-            1
-        )
+        raise NotImplementedError()
+
+    @property
+    def __name__(self):
+        return self.NAME
+
+    def __repr__(self):
+        return self.__name__
+
+
+class XORCombiner(Combiner):
+    """
+    Combines the chain responses with the XOR operation, i.e. the product of the responses.
+    """
+
+    NAME = 'combiner_xor'
+
+    def __call__(self, responses):
+        return prod(responses, axis=-1)
+
+    def derivative(self, combined_responses, responses):
+        #         Prod_i < w_i x_i >    /  < w_l x_l >          = Prod_(i \neq j)  < w_i x_i >
+        return combined_responses[:, None] / responses
+
+
+class IPMod2Combiner(Combiner):
+    """
+    Combines the chain responses with the inner product mod 2 operation. Requires even k.
+    """
+
+    NAME = 'combiner_ip_mod2'
+
+    def __call__(self, responses):
+        k = responses.shape[-1]
+        assert k % 2 == 0, 'IP mod 2 is only defined for even k.'
+        # the maximum of each pair of chains corresponds to the AND of the pair in 0/1-notation
+        return responses.reshape(responses.shape[:-1] + (k // 2, 2)).max(axis=-1).prod(axis=-1)
+
+    def derivative(self, combined_responses, responses):
+        # for even l, the max operation takes place with the next value, for odd l with the previous value
+        N, k = responses.shape
+        neighbors = responses.reshape(N, k // 2, 2)[:, :, ::-1].reshape(N, k)
+        maxima = maximum(responses, neighbors)
+        # if the l-th chain does not determine the maximum, the derivative w.r.t. the l-th chain vanishes,
+        # otherwise it is the product of all other pairs' maxima
+        return divide(combined_responses[:, None], maxima, out=zeros(maxima.shape, dtype=maxima.dtype),
+                      where=maxima != neighbors)
+
+
+class ThresholdCombiner(Combiner):
+    """
+    Combines the chain responses with a threshold function, i.e. the combined response is 1 if and only if at least
+    `threshold` chains respond 1. The combined response is the threshold-th largest chain response, which has this
+    sign.
+    """
+
+    NAME = 'combiner_threshold'
+
+    def __init__(self, threshold):
+        """
+        :param threshold: int. Number of chains that need to respond 1 for the combined response to be 1.
+        """
+        self.threshold = threshold
+
+    def position(self, k):
+        """
+        Position of the deciding chain response in the ascending order of the k chain responses.
+        :param k: int
+        :return: int
+        """
+        assert 1 <= self.threshold <= k, 'Threshold must be between 1 and k.'
+        return k - self.threshold
+
+    def __call__(self, responses):
+        position = self.position(responses.shape[-1])
+        return partition(responses, position, axis=-1)[..., position]
+
+    def derivative(self, combined_responses, responses):
+        # the combined response equals the deciding chain's response, the derivative w.r.t. all others vanishes
+        k = responses.shape[1]
+        deciding = argpartition(responses, self.position(k), axis=-1)[:, self.position(k)]
+        return (arange(k) == deciding[:, None]).astype(responses.dtype)
+
+    def __repr__(self):
+        return '%s(%i)' % (self.__name__, self.threshold)
+
+
+class MajorityCombiner(ThresholdCombiner):
+    """
+    Combines the chain responses with the majority function, i.e. the combined response is 1 if and only if more
+    than half of the chains respond 1.
+    """
+
+    NAME = 'combiner_majority'
+
+    def __init__(self):
+        super().__init__(None)
+
+    def position(self, k):
+        return k - (k // 2 + 1)
+
+    def __repr__(self):
+        return self.__name__
+
+
+class LTFArray(Simulation):
+    """
+    Class that simulates k LTFs with n bits and a constant term each
+    and constant bias added.
+    """
+
+    combiner_xor = XORCombiner()
+    combiner_ip_mod2 = IPMod2Combiner()
+    combiner_majority = MajorityCombiner()
 
     @classmethod
     def transform_id(cls, challenges, k):
@@ -677,12 +782,14 @@ class LTFArray(Simulation):
         The input array will be overwritten.
         :param sub_challenges: array of shape (N, k, n), where N is the total number of
         sub-challenge tuples, k is the number of sub-challenges per master-challenge, and
-        n is the number of bits per sub-challenge.
-        :return: transformed array of sub-challenges, shape (N, k, n)
+        n is the number of bits per sub-challenge. As the transform only acts on the last
+        axis, any other layout with sub-challenges along the last axis, e.g. (N, n) or the
+        chain-major (k, N, n), is supported as well.
+        :return: transformed array of sub-challenges, same shape as the input
         """
-        (_, _, n) = sub_challenges.shape
+        n = sub_challenges.shape[-1]
         for i in range(n - 2, -1, -1):
-            sub_challenges[:, :, i] *= sub_challenges[:, :, i + 1]
+            sub_challenges[..., i] *= sub_challenges[..., i + 1]
         return sub_challenges
 
     @classmethod
@@ -705,9 +812,9 @@ class LTFArray(Simulation):
         n is the number of bits per sub-challenge.
         :return: transformed array of sub-challenges, shape (N, k, n)
         """
-        (_, _, n) = sub_challenges.shape
+        n = sub_challenges.shape[-1]
         for i in range(n - 1):
-            sub_challenges[:, :, i] *= sub_challenges[:, :, i + 1]
+            sub_challenges[..., i] *= sub_challenges[..., i + 1]
         return sub_challenges
 
     @classmethod
@@ -834,22 +941,28 @@ class LTFArray(Simulation):
         else:
             return self.core_eval(self.efba_bit(sub_challenges))
 
-    def core_eval(self, efba_sub_challenges):
+    def core_eval(self, efba_sub_challenges, chain_major=False, float_type=None):
         """
         The core function that evaluates the LTFArray.
         :param efba_sub_challenges: (Extended for bias awareness sub challenges). Pre-processed challenges, i.e.
         sub-challenges that have an extra 1-bit at the end.
         Typically, this array is generated by processing a number of master-challenges with an input transformation
         into a list of sub-challenge arrays and then processing it with efba_bit.
-        :return: The result of the LTFArray evaluation for each given array of "efba" sub-challenges
+        :param chain_major: If True, the sub-challenges are given in chain-major layout (k, N, n) or (k, N, n+1),
+        i.e. all sub-challenges of one chain are contiguous in memory.
+        :param float_type: If given, the weights are converted to this floating point type before evaluation, e.g.
+        to evaluate in single precision.
+        :return: The result of the LTFArray evaluation for each given array of "efba" sub-challenges, shape (N, k)
         """
         assert self.weight_array.shape == (self.k, self.n + 1), \
             'LTFArray\'s weight array was expected have shape (k, n+1) = {}, ' \
             'but had shape {} when core_eval was called.'.format((self.k, self.n + 1), self.weight_array.shape)
-        if efba_sub_challenges.shape[2] == self.n + 1:
-            return einsum('ji,...ji->...j', self.weight_array, efba_sub_challenges, optimize=True)
-        elif efba_sub_challenges.shape[2] == self.n:
-            return einsum('ji,...ji->...j', self.weight_array[:, :-1], efba_sub_challenges, optimize=True)
+        subscripts = 'ji,j...i->...j' if chain_major else 'ji,...ji->...j'
+        weight_array = self.weight_array if float_type is None else self.weight_array.astype(float_type, copy=False)
+        if efba_sub_challenges.shape[-1] == self.n + 1:
+            return einsum(subscripts, weight_array, efba_sub_challenges, optimize=True)
+        elif efba_sub_challenges.shape[-1] == self.n:
+            return einsum(subscripts, weight_array[:, :-1], efba_sub_challenges, optimize=True)
         else:
             raise ValueError(f'Challenges given to LTFArray.core_eval must be of shape (N, k, n) for bias-unaware '
                              f'evaluation, and of shape (N, k, n+1) for bias-aware evaluation. This LTFArray has '
@@ -3,7 +3,7 @@ Simulations of a Physically Unclonable Functions (PUFs).
 """
 import abc
 
-from numpy import ndarray
+from numpy import ndarray, uint8
 
 
 class Simulation(object, metaclass=abc.ABCMeta):
@@ -41,3 +41,15 @@ class Simulation(object, metaclass=abc.ABCMeta):
         where m must match Simulation.response_length.
         """
         raise NotImplementedError()
+
+    def eval_packed(self, challenges: ndarray, packed_type=uint8) -> ndarray:
+        """
+        Evaluate the PUF on a list of given challenges and return the responses as packed bit array, which uses
+        eight times less memory than the default representation. Only defined for simulations with response length 1.
+        See pypuf.tools.pack_responses for the format.
+        :param challenges: List of challenges to evaluate on, see eval.
+        :param packed_type: numpy.uint8 or numpy.uint64
+        :return ndarray of packed_type
+        """
+        from pypuf.tools import pack_responses
+        return pack_responses(self.eval(challenges), packed_type)
@@ -27,6 +27,8 @@ class Study:
 
     EXPERIMENTER_CALLBACK_MIN_PAUSE = 5 * 60
     SHUFFLE = False
+    BATCH_SIZE = 1
+    CHECKPOINTS = False
     COMPRESSION = False
     STUDY_MODULE_PREFIX = 'pypuf.studies.'
 
@@ -49,6 +51,7 @@ class Study:
             cpu_limit=cpu_limit,
             gpu_limit=gpu_limit,
             results_file=self.name() + ('.csv.gz' if self.COMPRESSION else '.csv'),
+            checkpoint_dir='checkpoints/' + self.name() if self.CHECKPOINTS else None,
         )
 
     def name(self):
@@ -88,7 +91,7 @@ class Study:
 
         # Run experiments
         if experiments[start:end]:
-            self.experimenter.run(shuffle=self.SHUFFLE)
+            self.experimenter.run(shuffle=self.SHUFFLE, batch_size=self.BATCH_SIZE)
 
             # Plot results
             self.plot()
@@ -16,7 +16,7 @@ from pypuf.experiments.experiment.base import Experiment
 from pypuf.simulation.arbiter_based.arbiter_puf import XORArbiterPUF
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
 from pypuf.studies.base import Study
-from pypuf.tools import random_inputs
+from pypuf.tools import random_inputs, packed_dist
 
 
 class Parameters(NamedTuple):
@@ -74,8 +74,9 @@ class BiasExperiment(Experiment):
         inputs = random_inputs(self.parameters.n, self.parameters.N, RandomState(self.parameters.seed))
         self.responses = self.instance.val(inputs)
         self.uniqueness = zeros(shape=(self.parameters.k, self.parameters.k))
-        for (idx1, i1), (idx2, i2) in combinations(enumerate(self.individual_instances), 2):
-            self.uniqueness[idx1, idx2] = average(i1.eval(inputs) * i2.eval(inputs))
+        packed_responses = [instance.eval_packed(inputs) for instance in self.individual_instances]
+        for (idx1, r1), (idx2, r2) in combinations(enumerate(packed_responses), 2):
+            self.uniqueness[idx1, idx2] = 1 - 2 * packed_dist(r1, r2, self.parameters.N)
 
     def analyze(self):
         p = sp80022suite.frequency(bytes(((1 - sign(self.responses)) / 2).astype(int8)))
@@ -24,7 +24,8 @@ from pypuf.simulation.arbiter_based.arbiter_puf import InterposePUF, XORArbiterP
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
 from pypuf.simulation.base import Simulation
 from pypuf.studies.base import Study
-from pypuf.tools import ChallengeResponseSet, TrainingSet, approx_dist, approx_dist_nonrandom, BIT_TYPE, random_inputs
+from pypuf.tools import ChallengeResponseSet, TrainingSet, approx_dist, approx_dist_nonrandom, BIT_TYPE, \
+    random_inputs, EvaluationCache
 
 
 class Parameters(NamedTuple):
@@ -77,8 +78,18 @@ class NoTrainingSetException(BaseException):
 class SplitAttack(Experiment):
     """
     Executes a Divide-and-Conquer attack according to given parameters.
+
+    The attack proceeds in steps: training the first down model (possibly several times), then alternately
+    training the up and the down model. A checkpoint holds the state of the attack at the beginning of the current
+    step and, if interrupted while learning, the state of the running learner. When resuming, the current step is
+    repeated with the learner continuing where it was interrupted. All randomness of the attack is derived from
+    the seed, hence the training sets are recreated identically.
     """
 
+    OPTIMIZER = 'rprop'  # model updater of the LR learners, 'rprop' or 'lbfgs', see LogisticRegression
+    RECORDS = ['training_set_up_accuracy', 'training_set_down_accuracy', 'training_set_down_flipped_accuracy',
+               'training_set_up_sizes', 'accuracies', 'accuracies_up', 'accuracies_down', 'accuracies_down_flipped']
+
     simulation: InterposePUF
     simulation_noise_free: InterposePUF
     training_set: ChallengeResponseSet
@@ -98,6 +109,7 @@ class SplitAttack(Experiment):
     iterations: int
     learner_up: LogisticRegression
     learner_down: LogisticRegression
+    evaluation_cache: EvaluationCache
 
     def __init__(self, progress_log_name, parameters):
         super().__init__(progress_log_name, parameters)
@@ -115,6 +127,10 @@ class SplitAttack(Experiment):
         self.first_rounds = 0
         self.iterations = 0
         self.learner_up = None
+        self.learner_down = None
+        self.step = 'first_down'
+        self.step_state = None
+        self.restored_learner = None
         self.max_rounds = 5 if max(self.parameters.k_down, self.parameters.k_up) < 5 else 1
 
     def prepare(self):
@@ -134,11 +150,42 @@ class SplitAttack(Experiment):
             **simulation_parameters,
         )
         self.progress_logger.debug('Split Attack starting ...')
+        # accuracies are repeatedly approximated on the same challenges, noisy simulations must be re-evaluated
+        self.evaluation_cache = EvaluationCache(cache_references=self.parameters.noisiness == 0)
         self.training_set = TrainingSet(self.simulation, self.parameters.N, RandomState(self.parameters.seed))
         self.test_set = TrainingSet(self.simulation, 10**4, RandomState(self.parameters.seed + 1))
         self.progress_logger.debug(f'Training set size: {self.training_set.challenges.nbytes / 1024**3:.2f}GiB')
 
     def run(self):
+        if self.step == 'first_down':
+            self._run_first_model_down()
+
+        # iteratively train up, down, up, down, ...
+        while self.step in ('up', 'down'):
+            self._begin_step()
+            if self.step == 'up':
+                try:
+                    self.model_up = self._get_model_up()
+                except NoTrainingSetException:
+                    self.progress_logger.debug('WARNING: could not create large enough training set for upper '
+                                               'layer. Aborting!')
+                    if not getattr(self, 'model_up', None):
+                        # use random model
+                        self.model_up = XORArbiterPUF(n=self.parameters.n, k=self.parameters.k_up,
+                                                      seed=self.parameters.seed + 27182)
+                        self.accuracies_up.append(-1)
+                    self._update_model()
+                    self.step = 'done'
+                    break
+                self._update_model()
+                self.step = 'done' if self._done() else 'down'
+            else:
+                self._get_next_model_down()
+                self._update_model()
+                self.rounds += 1
+                self.step = 'done' if self._done() else 'up'
+
+    def _run_first_model_down(self):
         self.progress_logger.debug('Creating initial training set down')
         training_set_down = self._interpose_crp_set_pm1(self.training_set)
         test_set_down = self._interpose_crp_set_pm1(self.test_set)
@@ -148,6 +195,7 @@ class SplitAttack(Experiment):
         self._att(test_set_down.challenges)
 
         while True:
+            self._begin_step()
             self.progress_logger.debug('computing first down model')
             self.model_down = self._get_first_model_down(xt_set=training_set_down, xtest_set=test_set_down)
 
@@ -163,7 +211,8 @@ class SplitAttack(Experiment):
             test_set_accuracy = 1 - approx_dist_nonrandom(model_ipuf, self.test_set)
 
             # analysis: initial total accuracy
-            self.accuracies.append(1 - approx_dist(model_ipuf, self.simulation, 10 ** 4, RandomState(1)))
+            self.accuracies.append(1 - approx_dist(model_ipuf, self.simulation, 10 ** 4, RandomState(1),
+                                                   self.evaluation_cache))
 
             # analysis: down model accuracy
             self.progress_logger.debug('inital accuracy:')
@@ -189,34 +238,105 @@ class SplitAttack(Experiment):
             self.accuracies_up.append(-1)
             self._update_model()
             self.rounds = 0
-            return
+            self.step = 'done'
+        else:
+            self.step = 'up'
 
-        # iteratively train up, down, up, down, ...
-        while True:
-            def done():
-                return self.rounds > self.max_rounds or 1 - approx_dist_nonrandom(self.model, self.test_set) >= .95
-
-            try:
-                self.model_up = self._get_model_up()
-            except NoTrainingSetException:
-                self.progress_logger.debug('WARNING: could not create large enough training set for upper layer. '
-                                           'Aborting!')
-                if not getattr(self, 'model_up', None):
-                    # use random model
-                    self.model_up = XORArbiterPUF(n=self.parameters.n, k=self.parameters.k_up,
-                                                  seed=self.parameters.seed + 27182)
-                    self.accuracies_up.append(-1)
-                self._update_model()
-                break
-            self._update_model()
-            if done():
-                break
+    def _done(self):
+        return self.rounds > self.max_rounds or 1 - approx_dist_nonrandom(self.model, self.test_set) >= .95
 
-            self._get_next_model_down()
-            self._update_model()
-            self.rounds += 1
-            if done():
-                break
+    def _begin_step(self):
+        """
+        Takes a snapshot of the state of the attack, from which the current step can be repeated, and saves a
+        checkpoint if due.
+        """
+        def weights(model):
+            return None if model is None else model.weight_array.copy()
+
+        self.step_state = dict(
+            step=self.step,
+            rounds=self.rounds,
+            first_rounds=self.first_rounds,
+            iterations=self.iterations,
+            model_up=weights(getattr(self, 'model_up', None)),
+            model_down=weights(getattr(self, 'model_down', None)),
+            learner_up=self.learner_up.checkpoint_state() if self.learner_up else None,
+            learner_down=self.learner_down.checkpoint_state() if self.learner_down else None,
+            **{name: list(getattr(self, name)) for name in self.RECORDS},
+        )
+        self.checkpoint()
+
+    def checkpoint_state(self):
+        if self.step_state is None:
+            return None
+        running = [learner for learner in (self.learner_up, self.learner_down) if learner and learner.learning]
+        return dict(self.step_state, learner=running[0].checkpoint_state() if running else None)
+
+    def restore(self, state):
+        def model(weight_array):
+            if weight_array is None:
+                return None
+            return LTFArray(weight_array=weight_array[:, :-1], transform=LTFArray.transform_atf,
+                            combiner=LTFArray.combiner_xor, bias=weight_array[:, -1:])
+
+        self.step = state['step']
+        self.rounds = state['rounds']
+        self.first_rounds = state['first_rounds']
+        self.iterations = state['iterations']
+        for name in self.RECORDS:
+            setattr(self, name, list(state[name]))
+        if state['model_up'] is not None:
+            self.model_up = model(state['model_up'])
+        if state['model_down'] is not None:
+            self.model_down = model(state['model_down'])
+        if state['learner_up'] is not None:
+            self.learner_up = self._learner_up(None, None)
+            self.learner_up.restore(state['learner_up'])
+        if state['learner_down'] is not None:
+            self.learner_down = self._learner_down(None, None)
+            self.learner_down.restore(state['learner_down'])
+        self.restored_learner = state['learner']
+
+    def _learn(self, learner, **kwargs):
+        """
+        Runs the given learner, which continues from the restored state if it was interrupted in this step.
+        """
+        if self.restored_learner is not None:
+            learner.restore(self.restored_learner)
+            self.restored_learner = None
+        return learner.learn(**kwargs)
+
+    def _learner_down(self, xt_set, xtest_set):
+        return LogisticRegression(
+            t_set=xt_set,
+            n=self.parameters.n + 1,
+            k=self.parameters.k_down,
+            transformation=LTFArray.transform_id,  # note that we transformed the training set ourselves
+            weights_prng=RandomState(self.parameters.seed + 271828 + self.first_rounds),
+            logger=self.progress_logger,
+            shuffle=False,
+            test_set=xtest_set,
+            target_test_accuracy=.74,
+            min_iterations=10,
+            optimizer=self.OPTIMIZER,
+            checkpoint=self.checkpoint,
+        )
+
+    def _learner_up(self, training_set_up, test_set_up):
+        return LogisticRegression(
+            t_set=training_set_up,
+            n=self.parameters.n,
+            k=self.parameters.k_up,
+            transformation=LTFArray.transform_id,
+            weights_prng=RandomState(self.parameters.seed + 43),
+            logger=self.progress_logger,
+            shuffle=False,
+            test_set=test_set_up,
+            convergence_decimals=2,
+            min_iterations=10,
+            optimizer=self.OPTIMIZER,
+            checkpoint=self.checkpoint,
+        )
 
     def _update_model(self):
         self.model = InterposePUF(
@@ -229,7 +349,8 @@ class SplitAttack(Experiment):
         self.model.down = self.model_down
 
         # analysis: model accuracy
-        self.accuracies.append(1 - approx_dist(self.model, self.simulation, 10**4, RandomState(1)))
+        self.accuracies.append(
+            1 - approx_dist(self.model, self.simulation, 10**4, RandomState(1), self.evaluation_cache))
         self.progress_logger.debug(f'current accuracy up: {self.accuracies_up[-1]:.2f}, '
                                    f'down: {self.accuracies_down[-1]:.2f}, '
                                    f'down flipped: {self.accuracies_down_flipped[-1]:.2f}, '
@@ -237,19 +358,8 @@ class SplitAttack(Experiment):
 
     def _get_first_model_down(self, xt_set, xtest_set):
         self.progress_logger.debug('initially training down model')
-        self.learner_down = LogisticRegression(
-            t_set=xt_set,
-            n=self.parameters.n + 1,
-            k=self.parameters.k_down,
-            transformation=LTFArray.transform_id,  # note that we transformed the training set ourselves
-            weights_prng=RandomState(self.parameters.seed + 271828 + self.first_rounds),
-            logger=self.progress_logger,
-            shuffle=False,
-            test_set=xtest_set,
-            target_test_accuracy=.74,
-            min_iterations=10,
-        )
-        model = self.learner_down.learn()
+        self.learner_down = self._learner_down(xt_set, xtest_set)
+        model = self._learn(self.learner_down)
         self.learner_down.training_set = None
         self.learner_down.test_set = None
         self.iterations += self.learner_down.iteration_count
@@ -279,7 +389,8 @@ class SplitAttack(Experiment):
         self.learner_down.training_set = training_set
         self._att(training_set.challenges)  # transform training set in-situ to save memory
         self._att(test_set.challenges)
-        self.model_down = self.learner_down.learn(init_weight_array=self.model_down.weight_array, refresh_updater=False)
+        self.model_down = self._learn(self.learner_down, init_weight_array=self.model_down.weight_array,
+                                      refresh_updater=False)
         self.learner_down.training_set = None
         self.learner_down.test_set = None
         self.model_down.transform = LTFArray.transform_atf  # note that we transformed the training set ourselves
@@ -378,27 +489,18 @@ class SplitAttack(Experiment):
         self._att(training_set_up.challenges)
         self._att(test_set_up.challenges)
         if not self.learner_up:
-            self.learner_up = LogisticRegression(
-                t_set=training_set_up,
-                n=self.parameters.n,
-                k=self.parameters.k_up,
-                transformation=LTFArray.transform_id,
-                weights_prng=RandomState(self.parameters.seed + 43),
-                logger=self.progress_logger,
-                shuffle=False,
-                test_set=test_set_up,
-                convergence_decimals=2,
-                min_iterations=10,
-            )
-            model_up = self.learner_up.learn()
+            self.learner_up = self._learner_up(training_set_up, test_set_up)
+            model_up = self._learn(self.learner_up)
         else:
             self.learner_up.training_set = training_set_up
             self.learner_up.test_set = test_set_up
-            model_up = self.learner_up.learn(init_weight_array=self.model_up.weight_array, refresh_updater=False)
+            model_up = self._learn(self.learner_up, init_weight_array=self.model_up.weight_array,
+                                   refresh_updater=False)
         self.learner_up.training_set = None
         self.learner_up.test_set = None
         model_up.transform = LTFArray.transform_atf
-        self.accuracies_up.append(1 - approx_dist(model_up, self.simulation.up, 10 ** 4, RandomState(1)))
+        self.accuracies_up.append(
+            1 - approx_dist(model_up, self.simulation.up, 10 ** 4, RandomState(1), self.evaluation_cache))
         self.progress_logger.debug(f'new up model accuracy: {self.accuracies_up[-1]:.2f}')
         self.iterations += self.learner_up.iteration_count
 
@@ -472,9 +574,11 @@ class SplitAttack(Experiment):
         )
 
     def _record_down_accuracy(self):
-        self.accuracies_down.append(1 - approx_dist(self.model_down, self.simulation.down, 10 ** 4, RandomState(1)))
+        self.accuracies_down.append(
+            1 - approx_dist(self.model_down, self.simulation.down, 10 ** 4, RandomState(1), self.evaluation_cache))
         self.accuracies_down_flipped.append(
-            1 - approx_dist(self._flip_model(self.model_down), self.simulation.down, 10 ** 4, RandomState(1)))
+            1 - approx_dist(self._flip_model(self.model_down), self.simulation.down, 10 ** 4, RandomState(1),
+                            self.evaluation_cache))
         self.progress_logger.debug(f'down model accuracy: {self.accuracies_down[-1]:.2f} / flipped: '
                                    f'{self.accuracies_down_flipped[-1]:.2f}')
 
@@ -498,9 +602,7 @@ class SplitAttack(Experiment):
         Transformes the given challenges of shape (N, n) IN-SITU with the ATT transform.
         Also see LTFArray.att.
         """
-        N, n = challenges.shape
-        sub_challenges = challenges.reshape(N, 1, n)
-        LTFArray.att(sub_challenges)
+        LTFArray.att(challenges)
 
 
 class SplitAttackStudy(Study):
@@ -510,6 +612,7 @@ class SplitAttackStudy(Study):
 
     SHUFFLE = True
     COMPRESSION = True
+    CHECKPOINTS = True
 
     @staticmethod
     def _noise_levels(n, k_up, k_down):
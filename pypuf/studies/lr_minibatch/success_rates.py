@@ -19,6 +19,7 @@ class LRMiniBatchSuccessRate(Study):
     Studies the impact of mini batches on logistic regression learning.
     """
     SAMPLES_PER_POINT = 20
+    BATCH_SIZE = 100
 
     DEFINITIONS = [
         (64, 1, [5, 10, 30, 50, 70, 90, 100, 150, 200]),
@@ -0,0 +1,144 @@
+"""
+Passes to Convergence and Run Time of Logistic Regression with RPROP and L-BFGS
+
+This study compares the logistic regression learner using the RPROP updater with the learner using the L-BFGS updater.
+As both learners compute exactly one full gradient (and loss) per epoch, the number of epochs equals the number of
+passes over the training set. Both learners are run on identical instances and training sets. As L-BFGS depends on
+the scale of the initial model, the initial weights for L-BFGS are drawn with standard deviation n**-.5, while RPROP
+uses the usual unit standard deviation.
+"""
+from os import getpid
+from typing import NamedTuple
+from uuid import UUID
+
+from matplotlib.pyplot import subplots
+from numpy.random import RandomState
+from seaborn import barplot
+
+from pypuf.experiments.experiment.base import Experiment
+from pypuf.learner.regression.logistic_regression import LogisticRegression
+from pypuf.simulation.arbiter_based.ltfarray import LTFArray
+from pypuf.studies.base import Study
+from pypuf.tools import TrainingSet, approx_dist
+
+
+class Parameters(NamedTuple):
+    """
+    Experiment parameters for the LR optimizer benchmark.
+    """
+    n: int
+    k: int
+    N: int
+    optimizer: str
+    weights_sigma: float
+    seed_instance: int
+    seed_model: int
+    seed_challenge: int
+    seed_distance: int
+
+
+class Result(NamedTuple):
+    """
+    Experiment result of the LR optimizer benchmark.
+    """
+    experiment_id: UUID
+    pid: int
+    measured_time: float
+    epoch_count: int
+    converged: bool
+    accuracy: float
+    memory_rss_max: int
+
+
+class ExperimentLROptimizer(Experiment):
+    """
+    Learns an XOR Arbiter PUF with the logistic regression learner using the given optimizer.
+    """
+
+    def __init__(self, progress_log_prefix, parameters):
+        super().__init__(progress_log_prefix, parameters)
+        self.instance = None
+        self.learner = None
+        self.model = None
+
+    def prepare(self):
+        self.instance = LTFArray(
+            weight_array=LTFArray.normal_weights(self.parameters.n, self.parameters.k,
+                                                 random_instance=RandomState(self.parameters.seed_instance)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        self.learner = LogisticRegression(
+            t_set=TrainingSet(self.instance, self.parameters.N, RandomState(self.parameters.seed_challenge)),
+            n=self.parameters.n,
+            k=self.parameters.k,
+            transformation=LTFArray.transform_atf,
+            weights_sigma=self.parameters.weights_sigma,
+            weights_prng=RandomState(self.parameters.seed_model),
+            logger=self.progress_logger,
+            optimizer=self.parameters.optimizer,
+        )
+
+    def run(self):
+        self.model = self.learner.learn()
+
+    def analyze(self):
+        return Result(
+            experiment_id=self.id,
+            pid=getpid(),
+            measured_time=self.measured_time,
+            epoch_count=self.learner.epoch_count,
+            converged=self.learner.converged,
+            accuracy=1 - approx_dist(self.instance, self.model, 10 ** 5, RandomState(self.parameters.seed_distance)),
+            memory_rss_max=self.max_memory(),
+        )
+
+
+class LROptimizerBenchmark(Study):
+    """
+    Compares passes to convergence, run time and accuracy of logistic regression with RPROP and L-BFGS.
+    """
+
+    SAMPLES_PER_POINT = 20
+    DEFINITIONS = [
+        (64, 2, 5000),
+        (64, 4, 50000),
+        (64, 5, 300000),
+        (64, 6, 2000000),
+    ]
+    OPTIMIZERS = ['rprop', 'lbfgs']
+
+    def experiments(self):
+        return [
+            ExperimentLROptimizer(
+                progress_log_prefix=None,
+                parameters=Parameters(
+                    n=n,
+                    k=k,
+                    N=N,
+                    optimizer=optimizer,
+                    weights_sigma=1 if optimizer == 'rprop' else n ** -.5,
+                    seed_instance=314159 + i,
+                    seed_model=265358 + i,
+                    seed_challenge=979323 + i,
+                    seed_distance=846264 + i,
+                ),
+            )
+            for (n, k, N) in self.DEFINITIONS
+            for i in range(self.SAMPLES_PER_POINT)
+            for optimizer in self.OPTIMIZERS
+        ]
+
+    def plot(self):
+        data = self.experimenter.results
+        if data.empty:
+            return
+
+        fig, axes = subplots(1, 3)
+        fig.set_size_inches(18, 5)
+        for ax, column, label in zip(axes, ['accuracy', 'epoch_count', 'measured_time'],
+                                     ['Accuracy', 'Passes over the Training Set', 'Run Time [s]']):
+            barplot(x='k', y=column, hue='optimizer', hue_order=self.OPTIMIZERS, data=data, ax=ax)
+            ax.set_ylabel(label)
+        fig.suptitle('Logistic Regression with RPROP and L-BFGS')
+        fig.savefig('figures/%s.pdf' % self.name(), bbox_inches='tight', pad_inches=.5)
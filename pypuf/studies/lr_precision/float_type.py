@@ -0,0 +1,141 @@
+"""
+Accuracy and Run Time of Logistic Regression in Single and Double Precision
+
+This study compares the logistic regression learner computing in float64 with the learner computing model responses,
+sigmoid derivative and gradient in float32. Both learners are run on identical instances, training sets and
+initial models, so that the resulting accuracies can be compared directly, as well as the run time and the memory
+used per epoch.
+"""
+from os import getpid
+from typing import NamedTuple
+from uuid import UUID
+
+from matplotlib.pyplot import subplots
+from numpy.random import RandomState
+from seaborn import barplot
+
+from pypuf.experiments.experiment.base import Experiment
+from pypuf.learner.regression.logistic_regression import LogisticRegression
+from pypuf.simulation.arbiter_based.ltfarray import LTFArray
+from pypuf.studies.base import Study
+from pypuf.tools import TrainingSet, approx_dist
+
+
+class Parameters(NamedTuple):
+    """
+    Experiment parameters for the LR precision benchmark.
+    """
+    n: int
+    k: int
+    N: int
+    float_type: str
+    seed_instance: int
+    seed_model: int
+    seed_challenge: int
+    seed_distance: int
+
+
+class Result(NamedTuple):
+    """
+    Experiment result of the LR precision benchmark.
+    """
+    experiment_id: UUID
+    pid: int
+    measured_time: float
+    epoch_count: int
+    time_per_epoch: float
+    accuracy: float
+    memory_rss_max: int
+
+
+class ExperimentLRFloatType(Experiment):
+    """
+    Learns an XOR Arbiter PUF with the logistic regression learner using the given floating point type.
+    """
+
+    def __init__(self, progress_log_prefix, parameters):
+        super().__init__(progress_log_prefix, parameters)
+        self.instance = None
+        self.learner = None
+        self.model = None
+
+    def prepare(self):
+        self.instance = LTFArray(
+            weight_array=LTFArray.normal_weights(self.parameters.n, self.parameters.k,
+                                                 random_instance=RandomState(self.parameters.seed_instance)),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        self.learner = LogisticRegression(
+            t_set=TrainingSet(self.instance, self.parameters.N, RandomState(self.parameters.seed_challenge)),
+            n=self.parameters.n,
+            k=self.parameters.k,
+            transformation=LTFArray.transform_atf,
+            weights_prng=RandomState(self.parameters.seed_model),
+            logger=self.progress_logger,
+            float_type=self.parameters.float_type,
+        )
+
+    def run(self):
+        self.model = self.learner.learn()
+
+    def analyze(self):
+        return Result(
+            experiment_id=self.id,
+            pid=getpid(),
+            measured_time=self.measured_time,
+            epoch_count=self.learner.epoch_count,
+            time_per_epoch=self.measured_time / self.learner.epoch_count,
+            accuracy=1 - approx_dist(self.instance, self.model, 10 ** 5, RandomState(self.parameters.seed_distance)),
+            memory_rss_max=self.max_memory(),
+        )
+
+
+class LRFloatTypeBenchmark(Study):
+    """
+    Compares accuracy, run time and memory usage of logistic regression in float64 and float32.
+    """
+
+    SAMPLES_PER_POINT = 20
+    DEFINITIONS = [
+        (64, 1, 1000),
+        (64, 2, 5000),
+        (64, 4, 50000),
+        (64, 5, 400000),
+        (64, 6, 2000000),
+    ]
+    FLOAT_TYPES = ['float64', 'float32']
+
+    def experiments(self):
+        return [
+            ExperimentLRFloatType(
+                progress_log_prefix=None,
+                parameters=Parameters(
+                    n=n,
+                    k=k,
+                    N=N,
+                    float_type=float_type,
+                    seed_instance=314159 + i,
+                    seed_model=265358 + i,
+                    seed_challenge=979323 + i,
+                    seed_distance=846264 + i,
+                ),
+            )
+            for (n, k, N) in self.DEFINITIONS
+            for i in range(self.SAMPLES_PER_POINT)
+            for float_type in self.FLOAT_TYPES
+        ]
+
+    def plot(self):
+        data = self.experimenter.results
+        if data.empty:
+            return
+
+        fig, axes = subplots(1, 3)
+        fig.set_size_inches(18, 5)
+        for ax, column, label in zip(axes, ['accuracy', 'time_per_epoch', 'memory_rss_max'],
+                                     ['Accuracy', 'Run Time per Epoch [s]', 'Max. Memory [bytes]']):
+            barplot(x='k', y=column, hue='float_type', hue_order=self.FLOAT_TYPES, data=data, ax=ax)
+            ax.set_ylabel(label)
+        fig.suptitle('Logistic Regression in Single and Double Precision')
+        fig.savefig('figures/%s.pdf' % self.name(), bbox_inches='tight', pad_inches=.5)
@@ -3,21 +3,31 @@ This module provides a set of different functions which can be used e.g. for cha
 or polynomial division. The spectrum is rich and the functions are used in many different modules. Its a kind of a
 helper module.
 """
-import itertools
+from collections import OrderedDict
+from hashlib import sha256
 from importlib import import_module
 from inspect import getmembers, isclass
-from math import ceil, log
+from math import ceil, log, sqrt
 from random import sample
+from weakref import ref
 
 from numpy import abs as np_abs, absolute
 from numpy import count_nonzero, array, append, zeros, vstack, mean, prod, ones, dtype, full, shape, copy, int8, \
-    multiply, empty, average
+    multiply, empty, average, save, load, arange, ndarray, uint8, uint64, packbits, unpackbits, bitwise_xor, \
+    concatenate, asarray, nonzero
+from numpy.lib.format import open_memmap
 from numpy import sum as np_sum
 from numpy.random import RandomState
 
+try:
+    from numpy.random import default_rng
+except ImportError:  # numpy < 1.17 does not provide the Generator interface
+    default_rng = RandomState
+
 from pypuf.simulation.base import Simulation
 
 BIT_TYPE = int8
+POPCOUNT_TABLE = array([bin(i).count('1') for i in range(256)], dtype=uint8)
 
 
 def random_input(n, random_instance=RandomState()):
@@ -42,7 +52,40 @@ def all_inputs(n):
     :returns: array of int8
               An array with all possible different {-1,1}-vectors of length `n`.
     """
-    return (array(list(itertools.product((-1, +1), repeat=n)))).astype(BIT_TYPE)
+    return next(all_inputs_blocks(n, block_size=2 ** n))
+
+
+def all_inputs_blocks(n, block_size=10**6, packed=False):
+    """
+    Lazily enumerates all {-1,1}-vectors of length `n` in blocks, in the same order as all_inputs. The i-th vector
+    is computed from the binary representation of the integer i, most significant bit first, where 0 denotes -1
+    and 1 denotes +1. Hence, only one block is held in memory at a time.
+    :param n: int
+              Length of a n bit vector, less than 64, such that 2**n - 1 fits into uint64
+    :param block_size: int
+                       Number of vectors per block
+    :param packed: bool
+                   If True, blocks are given in 0,1 notation (cf. transform_challenge_11_to_01) with eight bits
+                   packed into each byte, as numpy.packbits would do.
+    :returns: iterator of arrays of int8 with shape (block_size, n) or, if packed, of uint8 with shape
+              (block_size, ceil(n / 8)); the last block may be shorter.
+    """
+    assert n < 64, 'Challenge enumeration is only supported for n < 64.'
+    num_bytes = (n + 7) // 8
+    for start in range(0, 2 ** n, block_size):
+        integers = arange(start, min(start + block_size, 2 ** n), dtype=uint64)
+        if packed:
+            # in 0,1 notation, bit 1 denotes -1, so the packed vector is the one's complement of i,
+            # aligned to the most significant bit of the first byte
+            bits_01 = (uint64(2 ** n - 1) - integers) << uint64(8 * num_bytes - n)
+            yield bits_01.astype('>u8').view(uint8).reshape(len(integers), 8)[:, 8 - num_bytes:]
+        else:
+            block = empty(shape=(len(integers), n), dtype=BIT_TYPE)
+            for i in range(n):
+                block[:, i] = (integers >> uint64(n - 1 - i)) & uint64(1)
+            block *= 2
+            block -= 1
+            yield block
 
 
 def random_inputs(n, num, random_instance=RandomState()):
@@ -61,6 +104,24 @@ def random_inputs(n, num, random_instance=RandomState()):
     return 2 * random_instance.randint(0, 2, (num, n), dtype=BIT_TYPE) - 1
 
 
+def sample_indices(N, num, random_instance=None):
+    """
+    Draws `num` distinct indices from range(N) in random order.
+    If a `numpy.random.Generator` is given (or, if none is given and numpy >= 1.17 provides it, a fresh one), the
+    sampling costs O(num) if `num` is small compared to N. With a `numpy.random.RandomState`, which is used by
+    default on older numpy versions, the sampling permutes the whole range and hence costs O(N).
+    :param N: int
+              Size of the index range
+    :param num: int
+                Number of indices to draw, must not exceed N
+    :param random_instance: numpy.random.Generator or numpy.random.RandomState
+                            The PRNG which is used to draw the indices.
+    :return: array of int of shape (num,)
+    """
+    random_instance = random_instance or default_rng()
+    return random_instance.choice(N, num, replace=False)
+
+
 def sample_inputs(n, num, random_instance=RandomState()):
     """
     This function generates an iterator for either random samples of {-1,1}-vectors of length `n` if `num` < 2^n,
@@ -102,7 +163,80 @@ def append_last(arr, item):
     return append(arr, item_arr, axis=axis)
 
 
-def approx_dist(instance1: Simulation, instance2: Simulation, num, random_instance=RandomState()):
+class EvaluationCache:
+    """
+    Cache for repeated distance approximations with fixed seeds, see approx_dist.
+    Challenges are cached keyed by (n, num, PRNG state), where the PRNG state is determined by seed and
+    previous usage. On a cache hit, the PRNG is advanced as if the challenges had been generated.
+    Responses of the reference simulation are cached keyed by (simulation identity, challenges). Hence,
+    the reference simulation must not change while the cache is used. For noisy references, where repeated
+    evaluation yields different responses, caching of reference responses can be disabled.
+    Both caches are LRU caches with bounded number of entries.
+    """
+
+    def __init__(self, max_entries=32, cache_references=True):
+        """
+        :param max_entries: int
+                            Maximum number of challenge sets and maximum number of reference response sets
+                            held in the cache.
+        :param cache_references: bool
+                                 If False, only challenges will be cached, reference simulations are
+                                 evaluated on every call.
+        """
+        self.max_entries = max_entries
+        self.cache_references = cache_references
+        self.challenges = OrderedDict()
+        self.responses = OrderedDict()
+
+    @staticmethod
+    def _state_key(random_instance):
+        _, keys, pos, has_gauss, cached_gaussian = random_instance.get_state()
+        return sha256(keys.tobytes()).hexdigest(), pos, has_gauss, cached_gaussian
+
+    def _store(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def inputs(self, n, num, random_instance):
+        """
+        Returns num random challenges of length n, as random_inputs would do for the given PRNG.
+        :param n: int
+        :param num: int
+        :param random_instance: numpy.random.RandomState
+        :return: tuple of cache key and array of int8 with shape (num, n)
+        """
+        key = (n, num, self._state_key(random_instance))
+        if key in self.challenges:
+            self.challenges.move_to_end(key)
+            challenges, state = self.challenges[key]
+            random_instance.set_state(state)
+        else:
+            challenges = random_inputs(n, num, random_instance=random_instance)
+            self._store(self.challenges, key, (challenges, random_instance.get_state()))
+        return key, challenges
+
+    def eval(self, reference, challenges_key, challenges):
+        """
+        Returns the responses of the reference simulation to the challenges identified by challenges_key.
+        :param reference: pypuf.simulation.base.Simulation
+        :param challenges_key: key as returned by inputs()
+        :param challenges: challenges as returned by inputs()
+        :return: array of responses
+        """
+        if not self.cache_references:
+            return reference.eval(challenges)
+        key = (id(reference), challenges_key)
+        if key in self.responses and self.responses[key][0]() is reference:
+            self.responses.move_to_end(key)
+            return self.responses[key][1]
+        responses = reference.eval(challenges)
+        self._store(self.responses, key, (ref(reference), responses))
+        return responses
+
+
+def approx_dist(instance1: Simulation, instance2: Simulation, num, random_instance=RandomState(),
+                cache: EvaluationCache = None):
     """
     Approximate the distance of two Simulations instance1, instance2 by evaluating a random set of inputs.
     The image of instance1 and instance2 needs to be {-1,1}, and they must have identical challenge_length().
@@ -112,16 +246,78 @@ def approx_dist(instance1: Simulation, instance2: Simulation, num, random_instan
                 Number of n bit vector
     :param random_instance: numpy.random.RandomState
                             The PRNG which is used to generate the input arrays.
+    :param cache: EvaluationCache
+                  If given, the input arrays are taken from the cache and instance2 is treated as unchanging
+                  reference, i.e. its responses are taken from the cache as well.
     :return: float
              Probability (randomly uniform x) for instance1.eval(x) != instance2.eval(x)
     """
     assert instance1.challenge_length() == instance2.challenge_length(), \
         'Cannot compare instances with different challenge spaces of dimension %i and %i, respectively.' \
         % (instance1.challenge_length(), instance2.challenge_length())
+    if cache:
+        key, inputs = cache.inputs(instance1.challenge_length(), num, random_instance)
+        return (num - count_nonzero(instance1.eval(inputs) == cache.eval(instance2, key, inputs))) / num
     inputs = random_inputs(instance1.challenge_length(), num, random_instance=random_instance)
     return (num - count_nonzero(instance1.eval(inputs) == instance2.eval(inputs))) / num
 
 
+def approx_dist_sequential(instance1: Simulation, instance2: Simulation, tolerance=.01, confidence=.95,
+                           threshold=None, random_instance=RandomState(), block_size=1000, max_num=10**6,
+                           interval='wilson'):
+    """
+    Approximate the distance of two Simulations like approx_dist, but evaluate random inputs in blocks of growing
+    size and stop as soon as the confidence interval of the estimate is narrower than `tolerance` or, if a
+    `threshold` is given, as soon as the interval lies entirely above or below the threshold.
+    Note that the confidence level applies to each individual check, not to the sequence of checks.
+    :param instance1: pypuf.simulation.arbiter_based.base.Simulation
+    :param instance2: pypuf.simulation.arbiter_based.base.Simulation
+    :param tolerance: float
+                      Desired width of the confidence interval.
+    :param confidence: float
+                       Confidence level of the interval.
+    :param threshold: None or float
+                      If given, the approximation stops once the distance is known to be above or below this value.
+    :param random_instance: numpy.random.RandomState
+                            The PRNG which is used to generate the input arrays.
+    :param block_size: int
+                       Number of inputs in the first block; each further block is twice as large as the previous.
+    :param max_num: int
+                    Maximum number of inputs to evaluate.
+    :param interval: 'wilson' or 'hoeffding'
+                     Type of confidence interval.
+    :return: tuple of float and int
+             Approximated distance and number of inputs that were actually evaluated.
+    """
+    assert instance1.challenge_length() == instance2.challenge_length(), \
+        'Cannot compare instances with different challenge spaces of dimension %i and %i, respectively.' \
+        % (instance1.challenge_length(), instance2.challenge_length())
+    assert interval in ('wilson', 'hoeffding'), 'Unknown confidence interval type %s.' % interval
+    from scipy.stats import norm  # scipy.stats is slow to import and only needed here
+    z = norm.ppf(1 - (1 - confidence) / 2)
+    num, unequal = 0, 0
+    while num < max_num:
+        block_num = min(block_size, max_num - num)
+        inputs = random_inputs(instance1.challenge_length(), block_num, random_instance=random_instance)
+        unequal += block_num - count_nonzero(instance1.eval(inputs) == instance2.eval(inputs))
+        num += block_num
+        block_size *= 2
+
+        estimate = unequal / num
+        if interval == 'wilson':
+            denominator = 1 + z ** 2 / num
+            center = (estimate + z ** 2 / (2 * num)) / denominator
+            half_width = z * sqrt(estimate * (1 - estimate) / num + z ** 2 / (4 * num ** 2)) / denominator
+        else:
+            center = estimate
+            half_width = sqrt(log(2 / (1 - confidence)) / (2 * num))
+        if 2 * half_width < tolerance:
+            break
+        if threshold is not None and (center - half_width > threshold or center + half_width < threshold):
+            break
+    return unequal / num, num
+
+
 def approx_dist_real(instance1: Simulation, instance2: Simulation, num, random_instance=RandomState()):
     """
     Approximate the distance of two Simulations instance1, instance2 by evaluating a random set of inputs.
@@ -157,6 +353,67 @@ def approx_dist_nonrandom(instance, test_set):
     return (test_set.N - count_nonzero(instance.eval(test_set.challenges) == test_set.responses)) / test_set.N
 
 
+def pack_responses(responses, packed_type=uint8):
+    """
+    Packs {-1,1} responses into a bit array in 0,1 notation, i.e. -1 is stored as bit 1, +1 as bit 0. The bit
+    order follows numpy.packbits. If a wider packed_type than uint8 is requested, the array is padded with zero
+    bits to a multiple of its size.
+    :param responses: array of shape (N,)
+    :param packed_type: numpy.uint8 or numpy.uint64
+    :return: array of packed_type with shape (ceil(N / bits per packed_type),)
+    """
+    packed = packbits(responses < 0)
+    padding = -len(packed) % dtype(packed_type).itemsize
+    if padding:
+        packed = concatenate((packed, zeros(padding, dtype=uint8)))
+    return packed.view(packed_type)
+
+
+def unpack_responses(packed, N):
+    """
+    Reverts pack_responses.
+    :param packed: packed bit array as returned by pack_responses
+    :param N: int
+              Number of responses in the packed array
+    :return: array of int8 with shape (N,) in {-1,1} notation
+    """
+    return 1 - 2 * unpackbits(packed.view(uint8))[:N].astype(BIT_TYPE)
+
+
+def popcount(packed):
+    """
+    Counts the number of set bits in an array of unsigned integers. For packed responses as returned by
+    pack_responses, this is the number of -1 responses.
+    :param packed: array of uint8 or uint64
+    :return: int
+    """
+    return int(np_sum(POPCOUNT_TABLE[packed.view(uint8)], dtype='int64'))
+
+
+def packed_bias(packed, N):
+    """
+    The average response of N packed {-1,1} responses.
+    :param packed: packed bit array as returned by pack_responses
+    :param N: int
+              Number of responses in the packed array
+    :return: float
+    """
+    return 1 - 2 * popcount(packed) / N
+
+
+def packed_dist(packed1, packed2, N):
+    """
+    Relative Hamming distance of two packed response arrays, computed with XOR and popcount.
+    :param packed1: packed bit array as returned by pack_responses
+    :param packed2: packed bit array as returned by pack_responses
+    :param N: int
+              Number of responses in the packed arrays
+    :return: float
+             Ratio of unequal responses
+    """
+    return popcount(bitwise_xor(packed1, packed2)) / N
+
+
 def approx_fourier_coefficient(s, training_set):
     """
     Approximate the Fourier coefficient of a function on the subset `s`
@@ -375,15 +632,40 @@ class ChallengeResponseSet:
         assert len(self.challenges) == len(self.responses)
         self.N = len(self.challenges)
 
-    def random_subset(self, N):
+    def random_subset(self, N, random_instance=None):
         """
-        Gives a random subset of this challenge response set.
+        Gives a random subset of this challenge response set. The subset is a view, the challenges and responses
+        will only be copied when they are accessed.
+        If no PRNG is given, the subset is drawn using python's `random` module in O(N) time, where N is the size
+        of the subset. If a PRNG is given, the subset is drawn using sample_indices, which costs O(N) in the size of
+        the whole set for a `numpy.random.RandomState`, e.g. on numpy < 1.17.
         :param N: Either a relative (to the total number) or absolute number of challenges.
+        :param random_instance: None or PRNG to choose the subset with, see sample_indices.
         :return: A random subset samples from this challenge response set.
         """
         if N < 1:
             N = int(self.N * N)
-        return self.subset(sample(range(self.N), N))
+        if random_instance is None:
+            return self.subset(sample(range(self.N), N))
+        return self.subset(sample_indices(self.N, N, random_instance))
+
+    def shuffled(self, random_instance=None):
+        """
+        Gives this challenge response set in random order. The result is a view, see random_subset.
+        :param random_instance: None or PRNG to choose the order with, see random_subset.
+        :return: A challenge response set.
+        """
+        return self.random_subset(self.N, random_instance)
+
+    def split(self, N):
+        """
+        Splits this challenge response set into two consecutive parts without copying.
+        :param N: Either a relative (to the total number) or absolute number of challenges in the first part.
+        :return: Two challenge response sets.
+        """
+        if N < 1:
+            N = int(self.N * N)
+        return self.subset(slice(0, N)), self.subset(slice(N, self.N))
 
     def block_subset(self, i, total):
         """
@@ -399,16 +681,106 @@ class ChallengeResponseSet:
 
     def subset(self, subset_slice):
         """
-        Gives the subset of this challenge response set defined by the slice given.
-        :param subset_slice: A python array slice
+        Gives the subset of this challenge response set defined by the slice or index array given.
+        The subset is a ChallengeResponseSetView, i.e. creating it does not copy any challenges or responses.
+        :param subset_slice: A python array slice or an array of indices
         :return: A challenge response set defined accordingly
         """
-        return ChallengeResponseSet(
-            challenges=self.challenges[subset_slice],
-            responses=self.responses[subset_slice]
+        return ChallengeResponseSetView(self, subset_slice)
+
+    def save(self, path):
+        """
+        Stores this challenge response set on disk as two numpy files, `path.challenges.npy` and
+        `path.responses.npy`. The files can be loaded memory-mapped using ChallengeResponseSet.load.
+        :param path: Path prefix of the files to be written.
+        """
+        save(path + '.challenges.npy', self.challenges)
+        save(path + '.responses.npy', self.responses)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Loads a challenge response set that was stored with ChallengeResponseSet.save or store_training_set.
+        By default, the arrays are memory-mapped, i.e. the data is only read from disk when accessed and
+        the set can be larger than the available main memory.
+        :param path: Path prefix of the files to be read.
+        :param mmap_mode: Memory-map mode as accepted by numpy.load; use None to read the whole set into memory.
+        :return: A challenge response set backed by the given files.
+        """
+        return cls(
+            challenges=load(path + '.challenges.npy', mmap_mode=mmap_mode),
+            responses=load(path + '.responses.npy', mmap_mode=mmap_mode),
         )
 
 
+class ChallengeResponseSetView(ChallengeResponseSet):
+    """
+    A subset of a challenge response set, defined by a slice or an index array into the parent set.
+    Challenges and responses are only materialized when accessed for the first time. For slices, this
+    results in numpy views into the parent's arrays, index arrays result in a copy of the selected examples.
+    Views of views refer directly to the underlying set, hence the parent is never materialized.
+    """
+
+    def __init__(self, parent, index):
+        """
+        :param parent: ChallengeResponseSet the view is defined on
+        :param index: A python array slice, or a list or array of indices or a boolean mask into parent
+        """
+        # pylint: disable=W0231
+        if not isinstance(index, slice):
+            index = asarray(index)
+            index = nonzero(index)[0] if index.dtype == bool else index.astype(int, copy=False)
+        if isinstance(parent, ChallengeResponseSetView) and parent.materialized is None:
+            index = self._compose(parent.index, index, parent.parent.N)
+            parent = parent.parent
+        self.parent = parent
+        self.index = index
+        self.N = len(range(*index.indices(parent.N))) if isinstance(index, slice) else len(index)
+        self.materialized = None
+
+    @staticmethod
+    def _compose(outer, inner, N):
+        """
+        Returns an index that selects parent[outer][inner] from a parent of size N.
+        """
+        if isinstance(outer, slice) and isinstance(inner, slice):
+            selected = range(*outer.indices(N))[inner]
+            if selected.step > 0:
+                return slice(selected.start, selected.stop, selected.step)
+        outer = arange(*outer.indices(N)) if isinstance(outer, slice) else outer
+        return outer[inner]
+
+    def _materialize(self):
+        if self.materialized is None:
+            self.materialized = ChallengeResponseSet(
+                challenges=self.parent.challenges[self.index],
+                responses=self.parent.responses[self.index],
+            )
+        return self.materialized
+
+    @property
+    def challenges(self) -> ndarray:
+        """
+        The challenges of this subset, materialized on first access.
+        """
+        return self._materialize().challenges
+
+    @challenges.setter
+    def challenges(self, val):
+        self._materialize().challenges = val
+
+    @property
+    def responses(self) -> ndarray:
+        """
+        The responses of this subset, materialized on first access.
+        """
+        return self._materialize().responses
+
+    @responses.setter
+    def responses(self, val):
+        self._materialize().responses = val
+
+
 class TrainingSet(ChallengeResponseSet):
     """
     Basic data structure to hold a collection of challenge response pairs.
@@ -432,6 +804,34 @@ class TrainingSet(ChallengeResponseSet):
         )
 
 
+def store_training_set(instance, N, path, random_instance=RandomState(), block_size=10**6):
+    """
+    Generates a training set like TrainingSet, but writes it block by block to disk instead of holding it in memory.
+    The files are written in the format of ChallengeResponseSet.save. Note that the challenges will differ from
+    the ones TrainingSet generates for the same PRNG.
+    :param instance: pypuf.simulation.base.Simulation
+                     Instance which is used to generate responses for random challenges.
+    :param N: int
+              Number of desired challenges
+    :param path: Path prefix of the files to be written.
+    :param random_instance: numpy.random.RandomState
+                            PRNG which is used to draft challenges.
+    :param block_size: Number of challenge response pairs that are generated at once.
+    :return: A memory-mapped ChallengeResponseSet as given by ChallengeResponseSet.load.
+    """
+    n = instance.challenge_length()
+    challenges = open_memmap(path + '.challenges.npy', mode='w+', dtype=BIT_TYPE, shape=(N, n))
+    responses = open_memmap(path + '.responses.npy', mode='w+', dtype=BIT_TYPE, shape=(N,))
+    for start in range(0, N, block_size):
+        block_challenges = random_inputs(n, min(block_size, N - start), random_instance)
+        challenges[start:start + block_size] = block_challenges
+        responses[start:start + block_size] = instance.eval(block_challenges)
+    challenges.flush()
+    responses.flush()
+    del challenges, responses
+    return ChallengeResponseSet.load(path)
+
+
 class GoldreichLevin:
     """
     Probabilistic algorithm that with probability 1 - `delta` returns a list of sets for the `instance` Boolean function
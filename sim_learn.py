@@ -7,7 +7,8 @@ import sys
 import argparse
 from pypuf.experiments.experimenter import Experimenter
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
-from pypuf.experiments.experiment.logistic_regression import ExperimentLogisticRegression, Parameters
+from pypuf.experiments.experiment.logistic_regression import ExperimentLogisticRegression, Parameters, \
+    ExperimentMultiStartLogisticRegression, MultiStartParameters
 
 
 def main(args):
@@ -34,7 +35,7 @@ def main(args):
     )
     parser.add_argument(
         'combiner',
-        help='used to combine the output bits to a single bit. Currently available: "ip_mod2", "xor"',
+        help='used to combine the output bits to a single bit. Currently available: "ip_mod2", "majority", "xor"',
         type=str,
     )
     parser.add_argument('N', help='number of challenge response pairs in the training set', type=int)
@@ -60,6 +61,11 @@ def main(args):
         type=str,
     )
     parser.add_argument('--seed_distance', help='random seed used to calculate the accuracy', type=str)
+    parser.add_argument(
+        '--multi_start',
+        help='train all restarts of an instance at once, sharing each pass over the training set',
+        action='store_true',
+    )
 
     args = parser.parse_args(args)
 
@@ -107,6 +113,26 @@ def main(args):
     # create different experiment instances
     experimenter = Experimenter(log_name)
     for j in range(instances):
+        if args.multi_start:
+            experimenter.queue(ExperimentMultiStartLogisticRegression(
+                progress_log_prefix='%s_%i' % (log_name, j),
+                parameters=MultiStartParameters(
+                    n=n,
+                    k=k,
+                    N=N,
+                    seed_instance=seed_instance + j,
+                    seed_model=seed_model + j,
+                    transformation=transformation,
+                    combiner=combiner,
+                    seed_challenge=seed_challenges,
+                    seed_distance=seed_distance,
+                    convergence_decimals=2,
+                    mini_batch_size=0,
+                    shuffle=False,
+                    restarts=restarts,
+                )
+            ))
+            continue
         for start_number in range(restarts):
             l_name = '%s_%i_%i' % (log_name, j, start_number)
             experiment = ExperimentLogisticRegression(
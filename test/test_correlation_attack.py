@@ -0,0 +1,83 @@
+"""This module tests the correlation attack learner."""
+import logging
+import unittest
+from itertools import permutations
+from numpy import zeros
+from numpy.random import RandomState
+from numpy.testing import assert_array_equal
+from scipy.io import loadmat
+from pypuf.learner.regression.correlation_attack import CorrelationAttack
+from pypuf.simulation.arbiter_based.ltfarray import LTFArray
+from pypuf.tools import TrainingSet
+
+
+class TestCorrelationAttack(unittest.TestCase):
+    """
+    This class tests the correlation attack learner.
+    """
+
+    def test_find_high_accuracy_weight_permutations(self):
+        """
+        The permutation search yields the same permutations and accuracies as evaluating each permuted model.
+        """
+        n, k = 64, 5
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)),
+                            LTFArray.transform_lightweight_secure, LTFArray.combiner_xor, bias=0.0)
+        attack = CorrelationAttack(
+            n=n,
+            k=k,
+            training_set=TrainingSet(instance=instance, N=1000, random_instance=RandomState(2)),
+            validation_set=TrainingSet(instance=instance, N=2000, random_instance=RandomState(3)),
+            logger=logging.getLogger('test_correlation_attack'),
+        )
+        weights = instance.weight_array + RandomState(4).normal(scale=.5, size=instance.weight_array.shape)
+
+        def evaluate_all(threshold):
+            model = LTFArray(zeros((k, n)), LTFArray.transform_lightweight_secure, LTFArray.combiner_xor)
+            result = []
+            for permutation in list(permutations(range(k)))[1:]:
+                model.weight_array = attack.adopt_weights(weights, permutation)
+                accuracy = attack.approx_accuracy(model)
+                if accuracy >= threshold:
+                    result.append((permutation, accuracy))
+            result.sort(key=lambda x: -x[1])
+            return result[:5 * k]
+
+        for threshold in [0, .52, .6]:
+            self.assertEqual(
+                [tuple(perm_data) for perm_data in attack.find_high_accuracy_weight_permutations(weights, threshold)],
+                evaluate_all(threshold),
+            )
+
+    def test_learn_processes(self):
+        """
+        Re-learning the permuted models in worker processes yields the same result as re-learning them in turn.
+        """
+        n, k = 64, 4
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(6)),
+                            LTFArray.transform_lightweight_secure, LTFArray.combiner_xor, bias=0.0)
+        training_set = TrainingSet(instance=instance, N=11000, random_instance=RandomState(1))
+        validation_set = TrainingSet(instance=instance, N=1090, random_instance=RandomState(2))
+
+        def attack_with(processes):
+            return CorrelationAttack(n, k, training_set, validation_set, weights_prng=RandomState(6),
+                                     lr_iteration_limit=12, logger=logging.getLogger('test_correlation_attack'),
+                                     processes=processes)
+
+        attack, parallel_attack = attack_with(1), attack_with(3)
+        model, parallel_model = attack.learn(), parallel_attack.learn()
+        self.assertGreater(attack.total_permutation_iterations, 0)
+        self.assertEqual(attack.total_permutation_iterations, parallel_attack.total_permutation_iterations)
+        self.assertEqual(attack.total_lr_iterations, parallel_attack.total_lr_iterations)
+        self.assertEqual(attack.best_accuracy, parallel_attack.best_accuracy)
+        assert_array_equal(model.weight_array, parallel_model.weight_array)
+
+    def test_correlation_shifts(self):
+        """
+        The correlation shifts match the tables obtained for 64 and 128 bit.
+        """
+        for n in [64, 128]:
+            assert_array_equal(
+                CorrelationAttack.correlation_shifts(n, 10),
+                loadmat('data/correlation_permutations_lightweight_secure_%i_10.mat' % n)['shiftOverviewData'][:, :, 0],
+            )
@@ -1,14 +1,21 @@
 """This module test the experimenter class which is used to distribute experiments over several cores."""
 import unittest
 import glob
+from os.path import join, exists
+from tempfile import TemporaryDirectory
+from numpy.testing import assert_array_almost_equal
 from test.utility import remove_test_logs, LOG_PATH, mute
 from pypuf.simulation.arbiter_based.ltfarray import NoisyLTFArray
 from pypuf.experiments.experiment.base import Experiment
+from pypuf.experiments.experiment.correlation_attack import ExperimentCorrelationAttack
+from pypuf.experiments.experiment.correlation_attack import Parameters as CAParameters
 from pypuf.experiments.experiment.logistic_regression import ExperimentLogisticRegression
 from pypuf.experiments.experiment.logistic_regression import Parameters as LRParameters
 from pypuf.experiments.experiment.majority_vote import ExperimentMajorityVoteFindVotes
 from pypuf.experiments.experiment.majority_vote import Parameters as MVParameters
 from pypuf.experiments.experimenter import Experimenter, FailedExperimentsException
+from pypuf.studies.ipuf.split import SplitAttack
+from pypuf.studies.ipuf.split import Parameters as SplitParameters
 
 
 class TestExperimenter(unittest.TestCase):
@@ -39,6 +46,159 @@ class TestExperimenter(unittest.TestCase):
             )
         experimenter.run()
 
+    @mute
+    def test_lr_experiments_batched(self):
+        """This method runs logistic regression experiments in batches and checks that the results are unchanged."""
+        accuracies = []
+        for batch_size in [1, 3]:
+            experimenter = Experimenter(LOG_PATH+'test_lr_experiments_batched')
+            for i in range(5):
+                experimenter.queue(
+                    ExperimentLogisticRegression(LOG_PATH + 'test_lr_experiments_batched{}'.format(i+1),
+                                                 LRParameters(
+                                                     n=8, k=2, N=2 ** 7, seed_model=i, seed_distance=i,
+                                                     seed_instance=i, seed_challenge=i,
+                                                     transformation='id', combiner='xor',
+                                                     mini_batch_size=0, shuffle=False, convergence_decimals=2
+                                                 ))
+                )
+            experimenter.run(batch_size=batch_size)
+            self.assertEqual(len(experimenter.results), 5)
+            accuracies.append(experimenter.results.sort_values('seed_model')['accuracy'].values)
+        assert_array_almost_equal(accuracies[0], accuracies[1])
+
+    @mute
+    def test_lr_experiment_resume(self):
+        """This method interrupts a logistic regression experiment and checks that resuming yields the same result."""
+        def experiment():
+            return ExperimentLogisticRegression(LOG_PATH + 'test_lr_experiment_resume', LRParameters(
+                n=8, k=2, N=2 ** 8, seed_model=1, seed_distance=1, seed_instance=1, seed_challenge=1,
+                transformation='id', combiner='xor', mini_batch_size=64, shuffle=True, convergence_decimals=2
+            ))
+
+        experimenter = Experimenter(LOG_PATH + 'test_lr_experiment_resume')
+        experimenter.queue(experiment())
+        experimenter.run()
+        expected = experimenter.results.iloc[0]
+
+        with TemporaryDirectory() as directory:
+            interrupted = experiment()
+            interrupted.checkpoint_path = join(directory, interrupted.hash + '.pickle')
+
+            def interrupt():
+                Experiment.checkpoint(interrupted, force=True)
+                if interrupted.learner.epoch_count == 3:
+                    raise InterruptedError()
+
+            interrupted.checkpoint = interrupt
+            with self.assertRaises(InterruptedError):
+                interrupted.execute(None, LOG_PATH + 'test_lr_experiment_resume')
+            self.assertTrue(exists(interrupted.checkpoint_path))
+
+            experimenter = Experimenter(LOG_PATH + 'test_lr_experiment_resume', checkpoint_dir=directory)
+            experimenter.queue(experiment())
+            experimenter.run()
+            self.assertFalse(exists(interrupted.checkpoint_path))
+
+        result = experimenter.results.iloc[0]
+        self.assertEqual(result['epoch_count'], expected['epoch_count'])
+        self.assertEqual(result['iteration_count'], expected['iteration_count'])
+        self.assertEqual(result['accuracy'], expected['accuracy'])
+
+    def assert_resumes(self, experiment, interrupt_when, columns):
+        """
+        Interrupts an experiment as soon as interrupt_when returns True at a checkpoint, resumes it through the
+        experimenter and checks that the result equals the result of an uninterrupted run in the given columns.
+        :param experiment: callable that returns a fresh experiment
+        :param interrupt_when: callable that receives the interrupted experiment
+        :param columns: list of str
+        """
+        experimenter = Experimenter(LOG_PATH + 'test_experiment_resume')
+        experimenter.queue(experiment())
+        experimenter.run()
+        expected = experimenter.results.iloc[0]
+
+        with TemporaryDirectory() as directory:
+            interrupted = experiment()
+            interrupted.checkpoint_path = join(directory, interrupted.hash + '.pickle')
+
+            def interrupt(force=False):  # pylint: disable=unused-argument
+                if interrupt_when(interrupted):
+                    Experiment.checkpoint(interrupted, force=True)
+                    raise InterruptedError()
+
+            interrupted.checkpoint = interrupt
+            with self.assertRaises(InterruptedError):
+                interrupted.execute(None, LOG_PATH + 'test_experiment_resume')
+            self.assertTrue(exists(interrupted.checkpoint_path))
+            progress_log_path = 'logs/%s.log' % interrupted.progress_log_name
+            with open(progress_log_path) as progress_log:
+                interrupted_log = progress_log.read()
+
+            experimenter = Experimenter(LOG_PATH + 'test_experiment_resume', checkpoint_dir=directory)
+            experimenter.queue(experiment())
+            experimenter.run()
+            self.assertFalse(exists(interrupted.checkpoint_path))
+            with open(progress_log_path) as progress_log:
+                resumed_log = progress_log.read()
+            self.assertTrue(interrupted_log)
+            self.assertTrue(resumed_log.startswith(interrupted_log))
+            self.assertGreater(len(resumed_log), len(interrupted_log))
+
+        result = experimenter.results.iloc[0]
+        for column in columns:
+            self.assertEqual(result[column], expected[column])
+
+    @mute
+    def test_correlation_attack_experiment_resume(self):
+        """
+        This method interrupts a correlation attack experiment while it re-learns a permuted model and checks that
+        resuming yields the same result.
+        """
+        self.assert_resumes(
+            experiment=lambda: ExperimentCorrelationAttack(LOG_PATH + 'test_experiment_resume', CAParameters(
+                seed_instance=1, seed_model=1, seed_challenge=1, seed_distance=2, n=64, k=4, N=12000,
+                lr_iteration_limit=15, mini_batch_size=0, convergence_decimals=2, shuffle=False,
+            )),
+            interrupt_when=lambda interrupted: (interrupted.learner.permutation_index == 1
+                                                and interrupted.learner.lr_learner.learning),
+            columns=['total_permutation_iterations', 'total_lr_iterations', 'best_permutation', 'accuracy'],
+        )
+
+    @mute
+    def test_split_attack_resume(self):
+        """
+        This method interrupts a split attack while it learns the second down model and checks that resuming yields
+        the same result.
+        """
+        self.assert_resumes(
+            experiment=lambda: SplitAttack(LOG_PATH + 'test_split_attack_resume', SplitParameters(
+                n=32, k_up=2, k_down=2, N=10000, seed=1, noisiness=0, batch_size=1000,
+            )),
+            interrupt_when=lambda interrupted: (interrupted.step == 'down' and interrupted.learner_down.learning
+                                                and interrupted.learner_down.epoch_count > 2),
+            columns=['rounds', 'iterations', 'accuracies', 'accuracy'],
+        )
+
+    @mute
+    def test_correlation_attack_experiment_processes(self):
+        """
+        This method runs a correlation attack experiment that re-learns permuted models in several processes through
+        the experimenter and checks that the result equals the result of re-learning them in turn.
+        """
+        results = []
+        for experiment_class in [ExperimentCorrelationAttack, ExperimentCorrelationAttackProcesses]:
+            experimenter = Experimenter(LOG_PATH + 'test_correlation_attack_experiment_processes')
+            experimenter.queue(experiment_class(LOG_PATH + 'test_correlation_attack_experiment_processes', CAParameters(
+                seed_instance=1, seed_model=1, seed_challenge=1, seed_distance=2, n=64, k=4, N=12000,
+                lr_iteration_limit=15, mini_batch_size=0, convergence_decimals=2, shuffle=False,
+            )))
+            experimenter.run()
+            results.append(experimenter.results.iloc[0])
+        self.assertGreater(results[0]['total_permutation_iterations'], 0)
+        for column in ['total_permutation_iterations', 'total_lr_iterations', 'best_permutation', 'accuracy']:
+            self.assertEqual(results[0][column], results[1][column])
+
     @mute
     def test_mv_experiments(self):
         """This method runs the experimenter with five ExperimentMajorityVoteFindVotes experiments."""
@@ -149,8 +309,8 @@ class TestExperimenter(unittest.TestCase):
         Verify the experimenter handles experiments that raise exceptions correctly.
         """
         experimenter = Experimenter(LOG_PATH + 'test_broken_experiments')
-        experimenter.queue(ExperimentBroken('foobar', {}))
-        experimenter.queue(ExperimentBroken('foobaz', {}))
+        experimenter.queue(ExperimentBroken(LOG_PATH + 'foobar', {}))
+        experimenter.queue(ExperimentBroken(LOG_PATH + 'foobaz', {}))
         with self.assertRaises(FailedExperimentsException):
             experimenter.run()
 
@@ -167,6 +327,13 @@ class ExperimentDummy(Experiment):
         pass
 
 
+class ExperimentCorrelationAttackProcesses(ExperimentCorrelationAttack):
+    """
+    This experiment re-learns the permuted models of the correlation attack in two processes.
+    """
+    PROCESSES = 2
+
+
 class ExperimentBroken(ExperimentDummy):
     """
     This experiment always raises an exception.
@@ -1,9 +1,31 @@
 """This module tests the logistic regression learner."""
+import logging
 import unittest
+from multiprocessing import active_children, get_context
+from tempfile import TemporaryDirectory
+from numpy import array, dot, exp, clip, zeros, full, sign, amin, amax, count_nonzero, isnan
+from numpy.linalg import norm
 from numpy.random import RandomState
+from numpy.testing import assert_array_equal, assert_array_almost_equal
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
-from pypuf.learner.regression.logistic_regression import LogisticRegression
-from pypuf.tools import TrainingSet
+from pypuf.learner.training_trace import TrainingTrace
+from pypuf.learner.regression.logistic_regression import LogisticRegression, MultiStartLogisticRegression, \
+    BatchedLogisticRegression
+from pypuf.tools import TrainingSet, ChallengeResponseSet, store_training_set, approx_dist_nonrandom, approx_dist
+
+
+def learn_with_processes(processes):
+    """
+    Learns a fixed 16-bit 2-XOR Arbiter PUF, computing the gradient in the given number of processes.
+    :return: array of float, the weights of the learned model
+    """
+    n, k, N = 16, 2, 2000
+    instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                        LTFArray.combiner_xor)
+    return LogisticRegression(TrainingSet(instance=instance, N=N, random_instance=RandomState(2)), n, k,
+                              transformation=LTFArray.transform_atf, weights_prng=RandomState(3), bias=True,
+                              minibatch_size=500, iteration_limit=10, block_size=128,
+                              processes=processes).learn().weight_array
 
 
 class TestLogisticRegression(unittest.TestCase):
@@ -69,3 +91,559 @@ class TestLogisticRegression(unittest.TestCase):
             weights_prng=model_prng,
         )
         lr_learner.learn()
+
+    def test_learn_out_of_core(self):
+        """
+        Learning out of core from a memory-mapped training set yields the same model as learning in memory.
+        """
+        instance = LTFArray(
+            weight_array=LTFArray.normal_weights(
+                TestLogisticRegression.n,
+                TestLogisticRegression.k,
+                random_instance=RandomState(seed=TestLogisticRegression.seed_instance)
+            ),
+            transform=LTFArray.transform_atf,
+            combiner=LTFArray.combiner_xor,
+        )
+        with TemporaryDirectory() as tmp_dir:
+            stored_set = store_training_set(instance, TestLogisticRegression.N, tmp_dir + '/crps',
+                                            RandomState(0xC0FFEE), block_size=100)
+            models = [
+                LogisticRegression(
+                    t_set=t_set,
+                    n=TestLogisticRegression.n,
+                    k=TestLogisticRegression.k,
+                    transformation=LTFArray.transform_atf,
+                    combiner=LTFArray.combiner_xor,
+                    weights_prng=RandomState(seed=TestLogisticRegression.seed_model),
+                    bias=True,
+                    out_of_core=out_of_core,
+                    block_size=50,
+                ).learn()
+                for t_set, out_of_core in [(ChallengeResponseSet.load(tmp_dir + '/crps', None), False),
+                                           (stored_set, True)]
+            ]
+        assert_array_equal(models[0].weight_array, models[1].weight_array)
+
+    def test_gradient_xor(self):
+        """
+        The vectorized XOR gradient matches the gradient computed chain by chain.
+        """
+        n, k, N = 16, 4, 1000
+        t_set = TrainingSet(
+            instance=LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                              LTFArray.combiner_xor),
+            N=N,
+            random_instance=RandomState(2),
+        )
+        model = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(3)), LTFArray.transform_atf,
+                         LTFArray.combiner_xor)
+        features = LTFArray.transform_atf(t_set.challenges, k)
+
+        model_responses = model.core_eval(features)
+        combined_model_responses = clip(LTFArray.combiner_xor(model_responses), -50, 50)
+        sigmoid_derivative = .5 * (2 / (1 + exp(-combined_model_responses)) - 1 - t_set.responses)
+        expected = array([
+            dot(sigmoid_derivative * combined_model_responses / model_responses[:, l], features[:, l])
+            for l in range(k)
+        ])
+
+        for float_type, decimal in [('float64', 10), ('float32', 3)]:
+            learner = LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf, block_size=300,
+                                         float_type=float_type)
+            assert_array_almost_equal(learner.gradient(model, features, t_set.responses), expected, decimal=decimal)
+
+    def test_gradient_ip_mod2(self):
+        """
+        The vectorized ip_mod2 gradient matches the gradient computed challenge by challenge.
+        """
+        n, k, N = 8, 4, 2**8
+        t_set = TrainingSet(
+            instance=LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_id,
+                              LTFArray.combiner_ip_mod2),
+            N=N,
+            random_instance=RandomState(2),
+        )
+        model = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(3)), LTFArray.transform_id,
+                         LTFArray.combiner_ip_mod2)
+        features = LTFArray.transform_id(t_set.challenges, k)
+
+        model_responses = model.core_eval(features)
+        combined_model_responses = clip(LTFArray.combiner_ip_mod2(model_responses), -50, 50)
+        sigmoid_derivative = .5 * (2 / (1 + exp(-combined_model_responses)) - 1 - t_set.responses)
+        expected = zeros((k, n))
+        for l in range(k):
+            neighbor = model_responses[:, l + 1 if l % 2 == 0 else l - 1]
+            for i in range(N):
+                if max(model_responses[i, l], neighbor[i]) != neighbor[i]:
+                    expected[l] += sigmoid_derivative[i] * combined_model_responses[i] / model_responses[i, l] \
+                        * features[i, l]
+
+        learner = LogisticRegression(t_set, n, k, combiner=LTFArray.combiner_ip_mod2)
+        assert_array_almost_equal(learner.gradient(model, features, t_set.responses), expected)
+
+    def test_rprop_update(self):
+        """
+        The vectorized RPROP update is bit-identical to the chain-by-chain reference implementation.
+        """
+        n, k = 16, 4
+        model = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_id,
+                         LTFArray.combiner_xor)
+        updater = LogisticRegression.RPropModelUpdate(model, bias=True)
+        last_gradient, last_step_size = full((k, n + 1), 1.0), full((k, n + 1), 0.0)
+        step_size, step = full((k, n + 1), 1.0), full((k, n + 1), 0.0)
+        prng = RandomState(2)
+        for _ in range(50):
+            gradient = prng.normal(size=(k, n + 1))
+            gradient[prng.uniform(size=(k, n + 1)) < .1] = 0
+            for l, grad_l in enumerate(gradient):
+                step_indicator = sign(grad_l * last_gradient[l])
+                step_size[l][step_indicator > 0] *= updater.eta_plus
+                step_size[l][step_indicator < 0] *= updater.eta_minus
+                step_size[l] = amin((step_size[l], updater.step_size_max), 0)
+                step_size[l] = amax((step_size[l], updater.step_size_min), 0)
+                step[l][step_indicator > 0] = -(step_size[l][step_indicator > 0] * sign(grad_l[step_indicator > 0]))
+                step[l][step_indicator < 0] = -last_step_size[l][step_indicator < 0]
+                step[l][step_indicator == 0] = -step_size[l][step_indicator == 0] * sign(grad_l[step_indicator == 0])
+                last_gradient[l] = grad_l
+                last_gradient[l][step_indicator < 0] = 0
+                last_step_size[l] = step[l]
+            assert_array_equal(updater.update(gradient), step)
+            assert_array_equal(updater.step_size, step_size)
+
+    def test_feature_modes(self):
+        """
+        Learning with shared or lazily transformed features yields the same model as learning with eager features.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        models = [
+            LogisticRegression(
+                t_set=t_set,
+                n=n,
+                k=k,
+                transformation=LTFArray.transform_atf,
+                weights_prng=RandomState(3),
+                bias=True,
+                minibatch_size=500,
+                iteration_limit=20,
+                block_size=300,
+                feature_mode=feature_mode,
+            ).learn()
+            for feature_mode in ['eager', 'shared', 'lazy']
+        ]
+        assert_array_equal(models[0].weight_array, models[1].weight_array)
+        assert_array_equal(models[0].weight_array, models[2].weight_array)
+
+    def test_chain_major(self):
+        """
+        Learning on features in chain-major layout yields the same model as learning on the default layout.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        models = [
+            LogisticRegression(
+                t_set=TrainingSet(instance=instance, N=N, random_instance=RandomState(2)),
+                n=n,
+                k=k,
+                transformation=LTFArray.transform_atf,
+                weights_prng=RandomState(3),
+                bias=True,
+                minibatch_size=500,
+                shuffle=True,
+                iteration_limit=20,
+                block_size=300,
+                chain_major=chain_major,
+            ).learn()
+            for chain_major in [False, True]
+        ]
+        assert_array_almost_equal(models[0].weight_array, models[1].weight_array)
+
+    def test_shuffle_keeps_training_set(self):
+        """
+        Learning with shuffled minibatches does not change the order of the given training set.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        challenges, responses = t_set.challenges.copy(), t_set.responses.copy()
+        LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf, weights_prng=RandomState(3),
+                           minibatch_size=300, shuffle=True, iteration_limit=5, block_size=128).learn()
+        assert_array_equal(t_set.challenges, challenges)
+        assert_array_equal(t_set.responses, responses)
+
+    def test_learn_after_abort(self):
+        """
+        After an aborted call of learn, learning on a newly assigned training set does not use the features of the
+        previous training set.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_sets = [TrainingSet(instance=instance, N=N, random_instance=RandomState(seed)) for seed in [2, 3]]
+
+        def abort():
+            raise InterruptedError()
+
+        learner = LogisticRegression(t_sets[0], n, k, transformation=LTFArray.transform_atf,
+                                     weights_prng=RandomState(4), iteration_limit=5, checkpoint=abort)
+        with self.assertRaises(InterruptedError):
+            learner.learn()
+        learner.training_set, learner.checkpoint, learner.weights_prng = t_sets[1], None, RandomState(4)
+        expected = LogisticRegression(t_sets[1], n, k, transformation=LTFArray.transform_atf,
+                                      weights_prng=RandomState(4), iteration_limit=5).learn()
+        assert_array_equal(learner.learn().weight_array, expected.weight_array)
+
+    def test_test_set_cadence(self):
+        """
+        The test set accuracy computed on cached features matches approx_dist_nonrandom, also when it is evaluated
+        only every few steps.
+        """
+        n, k = 16, 2
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        for test_every_steps in [1, 4]:
+            learner = LogisticRegression(
+                t_set=TrainingSet(instance=instance, N=2000, random_instance=RandomState(2)),
+                n=n,
+                k=k,
+                transformation=LTFArray.transform_atf,
+                weights_prng=RandomState(3),
+                bias=True,
+                test_set=TrainingSet(instance=instance, N=500, random_instance=RandomState(4)),
+                iteration_limit=12,
+                convergence_decimals=10,
+                test_every_steps=test_every_steps,
+            )
+            model = learner.learn()
+            self.assertEqual(learner.test_set_dist, approx_dist_nonrandom(model, learner.test_set))
+
+    def test_test_set_cadence_target(self):
+        """
+        The target test accuracy only stops learning on steps that evaluated the test set.
+        """
+        n, k = 16, 2
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        for test_every_steps in [1, 4]:
+            learner = LogisticRegression(
+                t_set=TrainingSet(instance=instance, N=2000, random_instance=RandomState(2)),
+                n=n,
+                k=k,
+                transformation=LTFArray.transform_atf,
+                weights_prng=RandomState(3),
+                test_set=TrainingSet(instance=instance, N=500, random_instance=RandomState(4)),
+                target_test_accuracy=.9,
+                convergence_decimals=10,
+                test_every_steps=test_every_steps,
+            )
+            learner.learn()
+            self.assertTrue(learner.converged)
+            self.assertGreater(learner.iteration_count, 1)
+            self.assertGreater(1 - learner.test_set_dist, .9)
+            self.assertEqual(learner.gradient_step_count % test_every_steps, 0)
+
+    def test_workers(self):
+        """
+        Computing the gradient with several threads yields the same model as computing it with a single thread.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        for feature_mode in ['eager', 'lazy']:
+            learners = [
+                LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf, weights_prng=RandomState(3),
+                                   bias=True, minibatch_size=500, shuffle=True, iteration_limit=10, block_size=128,
+                                   feature_mode=feature_mode, workers=workers)
+                for workers in [1, 3]
+            ]
+            models = [learner.learn() for learner in learners]
+            assert_array_equal(models[0].weight_array, models[1].weight_array)
+            self.assertEqual(learners[0].training_set_dist_sign, learners[1].training_set_dist_sign)
+
+    def test_workers_buffers(self):
+        """
+        Learning with several workers uses a single thread pool, such that the gather buffers are kept only for the
+        threads of that pool. Pool and buffers are released afterwards.
+        """
+        n, k, N, workers = 16, 2, 2000, 4
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        executors, threads = set(), set()
+
+        def record():
+            executors.add(learner.executor)
+            threads.update(key[2] for key in learner.buffers)
+
+        learner = LogisticRegression(TrainingSet(instance=instance, N=N, random_instance=RandomState(2)), n, k,
+                                     transformation=LTFArray.transform_atf, weights_prng=RandomState(3),
+                                     minibatch_size=500, shuffle=True, iteration_limit=10, block_size=128,
+                                     workers=workers, checkpoint=record)
+        learner.learn()
+        self.assertEqual(len(executors), 1)
+        self.assertIsNotNone(executors.pop())
+        self.assertLessEqual(len(threads), workers)
+        self.assertIsNone(learner.executor)
+        self.assertEqual(learner.buffers, {})
+
+    def test_processes(self):
+        """
+        Computing the gradient in several processes yields the same model as computing it in a single process.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        for shuffle in [False, True]:
+            learners = [
+                LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf, weights_prng=RandomState(3),
+                                   bias=True, minibatch_size=500, shuffle=shuffle, iteration_limit=10,
+                                   block_size=128, processes=processes)
+                for processes in [1, 2]
+            ]
+            models = [learner.learn() for learner in learners]
+            assert_array_equal(models[0].weight_array, models[1].weight_array)
+            self.assertEqual(learners[0].training_set_dist_sign, learners[1].training_set_dist_sign)
+
+    def test_processes_abort(self):
+        """
+        The worker processes are terminated if learning is aborted by an exception.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+
+        def abort():
+            raise InterruptedError()
+
+        learner = LogisticRegression(TrainingSet(instance=instance, N=N, random_instance=RandomState(2)), n, k,
+                                     transformation=LTFArray.transform_atf, weights_prng=RandomState(3),
+                                     iteration_limit=10, processes=2, checkpoint=abort)
+        children = set(active_children())
+        with self.assertRaises(InterruptedError):
+            learner.learn()
+        self.assertLessEqual(set(active_children()), children)
+
+    def test_processes_daemonic(self):
+        """
+        Learning with several processes from a daemonic process, e.g. an Experimenter worker, computes the gradient
+        in that process and yields the same model.
+        """
+        with get_context('fork').Pool(1) as pool:
+            weight_array = pool.apply(learn_with_processes, (2,))
+        assert_array_equal(weight_array, learn_with_processes(1))
+
+    def test_learn_float32(self):
+        """
+        Learning in single precision yields a model as accurate as learning in double precision.
+        """
+        n, k, N = 32, 2, 4000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        accuracies = []
+        for float_type in ['float64', 'float32']:
+            learner = LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf,
+                                         weights_prng=RandomState(3), float_type=float_type)
+            accuracies.append(1 - approx_dist(instance, learner.learn(), 10000, RandomState(4)))
+        self.assertGreater(accuracies[0], .95)
+        self.assertAlmostEqual(accuracies[0], accuracies[1], delta=.01)
+
+    def test_trace(self):
+        """
+        The training trace records every gradient step and the sampled weights, across several flushes.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        test_set = TrainingSet(instance=instance, N=500, random_instance=RandomState(3))
+        with TemporaryDirectory() as directory:
+            trace = TrainingTrace(directory + '/trace.npz', capacity=7, weights_every=3)
+            learner = LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf, minibatch_size=500,
+                                         test_set=test_set, test_every_steps=2, weights_prng=RandomState(4),
+                                         trace=trace, log_every_steps=None)
+            model = learner.learn()
+            records = TrainingTrace.load(directory + '/trace.npz')
+
+        steps = learner.gradient_step_count
+        assert_array_equal(records['step'], range(1, steps + 1))
+        self.assertEqual(records['epoch'][-1], learner.iteration_count)
+        self.assertEqual(records['training_accuracy'][-1], learner.training_set_dist_sign)
+        self.assertEqual(count_nonzero(~isnan(records['test_accuracy'])), steps // 2)
+        assert_array_equal(records['weights_step'], range(3, steps + 1, 3))
+        self.assertEqual(records['weights'].shape, (steps // 3, k, n + 1))
+        if steps % 3 == 0:
+            assert_array_equal(records['weights'][-1], model.weight_array)
+
+    def test_log_format(self):
+        """
+        The progress log lists the state of the learner and, by default, the model weights after each step.
+        """
+        n, k, N = 16, 2, 2000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        for log_weights, columns in [(True, 6), (False, 5)]:
+            logger = logging.getLogger('test_log_format')
+            with self.assertLogs(logger, level='DEBUG') as logs:
+                kwargs = {} if log_weights else dict(log_weights=False)
+                model = LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf, logger=logger,
+                                           weights_prng=RandomState(3), iteration_limit=3, **kwargs).learn()
+            last_state = [line for line in logs.output if line.count('\t') >= 4][-1].split(':', 2)[2].split('\t')
+            self.assertEqual(len(last_state), columns)
+            if log_weights:
+                self.assertEqual(last_state[-1], ','.join(map(str, model.weight_array.flatten())))
+
+    def test_learn_majority(self):
+        """
+        Learning a majority Arbiter PUF uses the derivative provided by the combiner.
+        """
+        n, k, N = 32, 3, 20000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_majority)
+        learner = LogisticRegression(
+            TrainingSet(instance=instance, N=N, random_instance=RandomState(2)), n, k,
+            transformation=LTFArray.transform_atf, combiner=LTFArray.combiner_majority,
+            weights_prng=RandomState(3), iteration_limit=100,
+        )
+        self.assertGreater(1 - approx_dist(instance, learner.learn(), 10000, RandomState(4)), .95)
+
+    def test_loss(self):
+        """
+        The gradient is the derivative of the training set loss that is recorded during the gradient computation.
+        """
+        n, k, N = 16, 2, 1000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        # small model weights, such that no combined response is capped in the gradient computation
+        model = LTFArray(LTFArray.normal_weights(n, k, sigma=.5, random_instance=RandomState(3)),
+                         LTFArray.transform_atf, LTFArray.combiner_xor)
+        features = LTFArray.transform_atf(t_set.challenges, k)
+        learner = LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf, block_size=300)
+
+        gradient = learner.gradient(model, features, t_set.responses)
+        loss = learner.training_set_loss
+        direction = RandomState(4).normal(size=(k, n))
+        epsilon = 10**-6
+        model.weight_array[:, :-1] += epsilon * direction
+        learner.gradient(model, features, t_set.responses)
+        self.assertAlmostEqual((learner.training_set_loss - loss) / epsilon, (gradient * direction).sum(), delta=.1)
+
+    def test_learn_lbfgs(self):
+        """
+        Learning with the L-BFGS updater yields an accurate model.
+        """
+        n, k, N = 32, 4, 20000
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        learner = LogisticRegression(
+            TrainingSet(instance=instance, N=N, random_instance=RandomState(2)), n, k,
+            transformation=LTFArray.transform_atf, weights_sigma=n**-.5, weights_prng=RandomState(3),
+            optimizer='lbfgs',
+        )
+        model = learner.learn()
+        self.assertGreater(1 - approx_dist(instance, model, 10000, RandomState(4)), .95)
+
+    def test_lbfgs_backtracking(self):
+        """
+        Backtracking shortens the L-BFGS step, but keeps the norm of the search direction used to detect convergence.
+        """
+        n, k = 8, 2
+        losses = iter([1.0, 2.0, 2.0])
+        updater = LogisticRegression.LBFGSModelUpdate(
+            LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_id,
+                     LTFArray.combiner_xor),
+            loss=lambda: next(losses),
+        )
+        gradient = RandomState(2).normal(size=(k, n))
+        direction_norm = norm(updater.update(gradient))
+        self.assertEqual(updater.direction_norm, direction_norm)
+        for _ in range(2):
+            updater.update(gradient)
+            self.assertLess(norm(updater.step), direction_norm)
+            self.assertEqual(updater.direction_norm, direction_norm)
+
+
+class TestMultiStartLogisticRegression(unittest.TestCase):
+    """
+    This module tests the multi-start logistic regression learner.
+    """
+
+    def test_learn(self):
+        """
+        Each restart of the multi-start learner follows the same trajectory as a single learner started from the
+        same initial model.
+        """
+        n, k, N, restarts = 16, 2, 2000, 3
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_atf,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=N, random_instance=RandomState(2))
+        learner = MultiStartLogisticRegression(t_set, n, k, restarts, transformation=LTFArray.transform_atf,
+                                               weights_prng=RandomState(3), minibatch_size=500, shuffle=True,
+                                               iteration_limit=10, convergence_decimals=10, block_size=300)
+        best_model = learner.learn()
+        self.assertEqual(len(learner.models), restarts)
+        self.assertIn(best_model, learner.models)
+
+        weights_prng = RandomState(3)
+        for model in learner.models:
+            single_model = LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf,
+                                              weights_prng=weights_prng, minibatch_size=500, shuffle=True,
+                                              iteration_limit=10, convergence_decimals=10, block_size=300).learn()
+            assert_array_almost_equal(model.weight_array, single_model.weight_array)
+
+    def test_unsupported_options(self):
+        """
+        Options that the multi-start learner does not support are rejected instead of being ignored.
+        """
+        n, k = 8, 2
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_id,
+                            LTFArray.combiner_xor)
+        t_set = TrainingSet(instance=instance, N=100, random_instance=RandomState(2))
+        for option in [dict(test_set=t_set), dict(trace=object()), dict(checkpoint=lambda: None), dict(workers=2),
+                       dict(processes=2)]:
+            with self.assertRaises(ValueError):
+                MultiStartLogisticRegression(t_set, n, k, 2, **option)
+
+
+class TestBatchedLogisticRegression(unittest.TestCase):
+    """
+    This module tests the batched logistic regression learner.
+    """
+
+    def test_learn(self):
+        """
+        Each problem of the batched learner follows the same trajectory as a single learner on its training set and
+        stops after the same number of iterations.
+        """
+        n, k, N, B = 16, 2, 1000, 4
+        t_sets = [
+            TrainingSet(
+                instance=LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(b)),
+                                  LTFArray.transform_atf, LTFArray.combiner_xor),
+                N=N,
+                random_instance=RandomState(10 + b),
+            )
+            for b in range(B)
+        ]
+        learner = BatchedLogisticRegression(t_sets, n, k, transformation=LTFArray.transform_atf,
+                                            weights_prngs=[RandomState(20 + b) for b in range(B)], minibatch_size=250,
+                                            shuffle=True)
+        models = learner.learn()
+        self.assertEqual(len(models), B)
+
+        for b, t_set in enumerate(t_sets):
+            single_learner = LogisticRegression(t_set, n, k, transformation=LTFArray.transform_atf,
+                                                weights_prng=RandomState(20 + b), minibatch_size=250, shuffle=True)
+            single_model = single_learner.learn()
+            assert_array_almost_equal(models[b].weight_array, single_model.weight_array)
+            self.assertEqual(learner.problem_iteration_counts[b], single_learner.iteration_count)
+            self.assertEqual(learner.problem_gradient_step_counts[b], single_learner.gradient_step_count)
+            self.assertEqual(learner.problem_converged[b], single_learner.converged)
@@ -35,6 +35,12 @@ class TestSimLearn(unittest.TestCase):
         """This tests the atf transformation and xor combiner."""
         sim_learn.main(["8", "2", "atf", "xor", "20", "1", "2", "1234", "1234", self.log_parameter("test_atf")])
 
+    @mute
+    def test_multi_start(self):
+        """This tests learning all restarts at once."""
+        sim_learn.main(["8", "2", "atf", "xor", "20", "3", "2", "1234", "1234", "--multi_start",
+                        self.log_parameter("test_multi_start")])
+
     @mute
     def test_lightweight_secure(self):
         """This tests the lightweight secure transformation and xor combiner."""
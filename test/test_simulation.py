@@ -5,9 +5,10 @@ This module is used to test the different simulation models.
 import unittest
 from test.utility import get_functions_with_prefix
 from numpy.testing import assert_array_equal
-from numpy import shape, dot, array, around, array_equal, reshape, zeros
+from numpy import shape, dot, array, around, array_equal, reshape, zeros, sign
 from numpy.random import RandomState
-from pypuf.simulation.arbiter_based.ltfarray import LTFArray, NoisyLTFArray, SimulationMajorityLTFArray
+from pypuf.simulation.arbiter_based.ltfarray import LTFArray, NoisyLTFArray, SimulationMajorityLTFArray, \
+    ThresholdCombiner
 from pypuf import tools
 
 
@@ -61,6 +62,44 @@ class TestCombiner(unittest.TestCase):
             ]
         )
 
+    def test_combine_majority(self):
+        """This function tests the majority combiner function for odd and even k."""
+        assert_array_equal(
+            LTFArray.combiner_majority(
+                array([
+                    [1., 1., -3.],
+                    [-1., 2., -1.],
+                    [-2., -2., .5]
+                ])
+            ),
+            [
+                1.,
+                -1.,
+                -2.
+            ]
+        )
+        # for even k, a tie yields -1
+        assert_array_equal(sign(LTFArray.combiner_majority(array([[1, -1, 1, -1], [1, 1, 1, -1]]))), [-1, 1])
+
+    def test_combine_threshold(self):
+        """This function tests the threshold combiner function and its derivative against their definitions."""
+        responses = RandomState(1).normal(size=(100, 5))
+        for threshold in range(1, 6):
+            combiner = ThresholdCombiner(threshold)
+            combined = combiner(responses)
+            assert_array_equal(sign(combined), 2 * ((responses > 0).sum(axis=1) >= threshold) - 1)
+            derivative = combiner.derivative(combined, responses)
+            assert_array_equal(derivative.sum(axis=1), 1)
+            assert_array_equal((derivative * responses).sum(axis=1), combined)
+
+    def test_combiner_name(self):
+        """Combiners are named like the LTFArray attribute and can be given to LTFArray by this name."""
+        for combiner in [LTFArray.combiner_xor, LTFArray.combiner_ip_mod2, LTFArray.combiner_majority]:
+            instance = LTFArray(LTFArray.normal_weights(4, 2, random_instance=RandomState(1)),
+                                LTFArray.transform_id, combiner=combiner.__name__)
+            self.assertIs(instance.combiner, combiner)
+        self.assertEqual(LTFArray.combiner_xor.__name__, 'combiner_xor')
+
 
 class TestInputTransformation(unittest.TestCase):
     """This class tests the different functions used to transform the input of a LTFArray simulation."""
@@ -247,6 +286,20 @@ class TestInputTransformation(unittest.TestCase):
             ]]
         )
 
+    def test_chain_major(self):
+        """Test that ATT and core_eval give the same results on sub-challenges in chain-major layout."""
+        n, k, N = 8, 3, 20
+        instance = LTFArray(LTFArray.normal_weights(n, k, random_instance=RandomState(1)), LTFArray.transform_id,
+                            LTFArray.combiner_xor, bias=LTFArray.normal_weights(1, k, random_instance=RandomState(2)))
+        sub_challenges = LTFArray.transform_id(tools.random_inputs(n, N, random_instance=RandomState(3)), k).copy()
+        chain_major = sub_challenges.transpose(1, 0, 2).copy()
+        assert_array_equal(LTFArray.att(chain_major), LTFArray.att(sub_challenges).transpose(1, 0, 2))
+        efba_sub_challenges = LTFArray.efba_bit(sub_challenges)
+        assert_array_equal(
+            instance.core_eval(efba_sub_challenges.transpose(1, 0, 2).copy(), chain_major=True),
+            instance.core_eval(efba_sub_challenges),
+        )
+
     def test_generate_stacked_transform(self):
         """
         This method tests the stacked transformation generation of identity and shift with predefined input and output.
@@ -1,13 +1,17 @@
 """This module is used to test the functions which are implemented in pypuf.tools."""
 import unittest
-from numpy import zeros, dtype, array_equal, array, column_stack
+from itertools import product
+from random import seed, sample
+from numpy import zeros, dtype, array_equal, array, column_stack, shares_memory, concatenate, packbits, uint8, \
+    uint64, count_nonzero, average
 from numpy.random import RandomState
 from numpy.testing import assert_array_equal
 from tempfile import NamedTemporaryFile
 from pypuf.simulation.arbiter_based.ltfarray import LTFArray
-from pypuf.tools import random_input, all_inputs, random_inputs, sample_inputs, chi_vectorized, append_last, \
-    TrainingSet, BIT_TYPE, transform_challenge_11_to_01, transform_challenge_01_to_11, poly_mult_div, \
-    parse_file
+from pypuf.tools import random_input, all_inputs, all_inputs_blocks, random_inputs, sample_inputs, chi_vectorized, \
+    append_last, TrainingSet, BIT_TYPE, transform_challenge_11_to_01, transform_challenge_01_to_11, poly_mult_div, \
+    parse_file, ChallengeResponseSet, pack_responses, unpack_responses, popcount, packed_dist, packed_bias, \
+    EvaluationCache, approx_dist, approx_dist_sequential
 
 
 class TestAppendLast(unittest.TestCase):
@@ -99,6 +103,21 @@ class TestInputFunctions(unittest.TestCase):
         arr = all_inputs(n)
         self.check_multi_dimensional_array(arr, N, n, BIT_TYPE)
 
+    def test_all_inputs_blocks(self):
+        """The block-wise enumeration matches all_inputs, also in packed form."""
+        n = 10
+        expected = array(list(product((-1, +1), repeat=n)), dtype=BIT_TYPE)
+        blocks = list(all_inputs_blocks(n, block_size=300))
+        self.assertEqual([len(block) for block in blocks], [300, 300, 300, 124])
+        assert_array_equal(concatenate(blocks), expected)
+        assert_array_equal(all_inputs(n), expected)
+        assert_array_equal(
+            concatenate(list(all_inputs_blocks(n, block_size=300, packed=True))),
+            packbits(transform_challenge_11_to_01(expected), axis=1),
+        )
+        with self.assertRaises(AssertionError):
+            next(all_inputs_blocks(64))
+
     def test_random_inputs(self):
         """This checks the shape and type of the returned multidimensional array."""
         n = 8
@@ -184,3 +203,126 @@ class TestInputFunctions(unittest.TestCase):
             self.assertEqual(len(arr[i]), sub_arr_size,
                              'The sub array does not match the length of {0}.'.format(sub_arr_size))
             self.assertEqual(arr.dtype, arr_type, 'The array must be of type {0}'.format(arr_type))
+
+
+class TestChallengeResponseSetView(unittest.TestCase):
+    """This class tests the subsets of challenge response sets."""
+
+    def setUp(self):
+        self.crp_set = ChallengeResponseSet(
+            challenges=random_inputs(16, 100, RandomState(1)),
+            responses=random_inputs(1, 100, RandomState(2))[:, 0],
+        )
+
+    def test_block_subset(self):
+        """Block subsets are views into the original arrays."""
+        subset = self.crp_set.block_subset(1, 4)
+        self.assertEqual(subset.N, 25)
+        assert_array_equal(subset.challenges, self.crp_set.challenges[25:50])
+        self.assertTrue(shares_memory(subset.challenges, self.crp_set.challenges))
+
+    def test_nested_subset(self):
+        """Subsets of subsets select the correct examples without materializing the intermediate set."""
+        intermediate = self.crp_set.subset(slice(10, 90, 2))
+        nested = intermediate.subset(slice(5, 15))
+        assert_array_equal(nested.responses, self.crp_set.responses[10:90:2][5:15])
+        self.assertIsNone(intermediate.materialized)
+        indexed = intermediate.subset(array([3, 1, 4]))
+        assert_array_equal(indexed.challenges, self.crp_set.challenges[10:90:2][[3, 1, 4]])
+
+    def test_nested_index_subset(self):
+        """Subsets of subsets defined by lists, index arrays or masks select the correct examples."""
+        for index in [[1, 2, 5, 7], array([1, 2, 5, 7])]:
+            for inner in [[0, 2], array([0, 2]), array([True, False, True, False]), slice(1, 3)]:
+                nested = self.crp_set.subset(index).subset(inner)
+                assert_array_equal(nested.challenges, self.crp_set.challenges[array(index)][inner])
+                assert_array_equal(nested.responses, self.crp_set.responses[array(index)][inner])
+
+    def test_random_subset(self):
+        """Random subsets contain distinct examples of the original set."""
+        subset = self.crp_set.random_subset(.3, RandomState(3))
+        self.assertEqual(subset.N, 30)
+        self.assertEqual(len(set(subset.index)), 30)
+        assert_array_equal(subset.responses, self.crp_set.responses[subset.index])
+
+    def test_random_subset_python_random(self):
+        """Without a given PRNG, random subsets are drawn reproducibly from python's random module."""
+        seed(4)
+        expected = sample(range(self.crp_set.N), 30)
+        seed(4)
+        assert_array_equal(self.crp_set.random_subset(.3).index, expected)
+
+    def test_split(self):
+        """Splitting gives two consecutive parts that cover the whole set."""
+        first, second = self.crp_set.split(.8)
+        self.assertEqual((first.N, second.N), (80, 20))
+        assert_array_equal(second.challenges, self.crp_set.challenges[80:])
+
+
+class TestPackedResponses(unittest.TestCase):
+    """This class tests the packed response representation."""
+
+    def test_pack_unpack(self):
+        """Packing and unpacking responses gives the original responses, for all supported packed types."""
+        responses = random_inputs(1, 1001, RandomState(1))[:, 0]
+        for packed_type in [uint8, uint64]:
+            packed = pack_responses(responses, packed_type)
+            self.assertEqual(packed.dtype, dtype(packed_type))
+            assert_array_equal(unpack_responses(packed, len(responses)), responses)
+            self.assertEqual(popcount(packed), count_nonzero(responses == -1))
+
+    def test_packed_dist(self):
+        """The distance of packed responses equals the ratio of unequal responses."""
+        n, N = 16, 1000
+        instances = [LTFArray(LTFArray.normal_weights(n, 2, random_instance=RandomState(seed)), LTFArray.transform_atf,
+                              LTFArray.combiner_xor) for seed in [1, 2]]
+        challenges = random_inputs(n, N, RandomState(3))
+        self.assertEqual(
+            packed_dist(instances[0].eval_packed(challenges, uint64), instances[1].eval_packed(challenges, uint64), N),
+            count_nonzero(instances[0].eval(challenges) != instances[1].eval(challenges)) / N,
+        )
+        self.assertAlmostEqual(packed_bias(instances[0].eval_packed(challenges), N),
+                               average(instances[0].eval(challenges)))
+
+
+class TestEvaluationCache(unittest.TestCase):
+    """This class tests cached distance approximation."""
+
+    def test_approx_dist_cached(self):
+        """Cached distance approximation gives the same results and advances the PRNG in the same way."""
+        n, num = 16, 1000
+        reference = LTFArray(LTFArray.normal_weights(n, 2, random_instance=RandomState(1)), LTFArray.transform_atf,
+                             LTFArray.combiner_xor)
+        model = LTFArray(LTFArray.normal_weights(n, 2, random_instance=RandomState(2)), LTFArray.transform_atf,
+                         LTFArray.combiner_xor)
+        cache = EvaluationCache(max_entries=2)
+        for _ in range(3):
+            prng, prng_cached = RandomState(3), RandomState(3)
+            self.assertEqual(
+                approx_dist(model, reference, num, prng),
+                approx_dist(model, reference, num, prng_cached, cache),
+            )
+            self.assertEqual(prng.randint(2**16), prng_cached.randint(2**16))
+            model.weight_array[0] += 1
+        self.assertEqual(len(cache.challenges), 1)
+        self.assertEqual(len(cache.responses), 1)
+
+
+class TestApproxDistSequential(unittest.TestCase):
+    """This class tests the sequential distance approximation."""
+
+    def test_approx_dist_sequential(self):
+        """The sequential approximation stops early for threshold questions and is close to the true distance."""
+        n = 16
+        instances = [LTFArray(LTFArray.normal_weights(n, 1, random_instance=RandomState(seed)), LTFArray.transform_atf,
+                              LTFArray.combiner_xor) for seed in [1, 2]]
+        exact = approx_dist(instances[0], instances[1], 2 ** n, RandomState(3))
+        for interval in ['wilson', 'hoeffding']:
+            estimate, num = approx_dist_sequential(instances[0], instances[1], tolerance=.02, interval=interval,
+                                                   random_instance=RandomState(4))
+            self.assertLess(abs(estimate - exact), .02)
+            decided_estimate, decided_num = approx_dist_sequential(instances[0], instances[1], tolerance=.02,
+                                                                   threshold=exact + .2, interval=interval,
+                                                                   random_instance=RandomState(4))
+            self.assertLess(decided_estimate, exact + .2)
+            self.assertLess(decided_num, num)